@@ -0,0 +1,455 @@
+# api.py
+# Serviço HTTP assíncrono (aiohttp) com as funções do app, para atender vários
+# clientes (o app Streamlit com API_URL, um bot de WhatsApp...) a partir de um
+# único processo que compartilha o índice, o LLM e a fila de tarefas:
+#   python api.py [--host 0.0.0.0] [--porta 8000]
+#
+#   POST /chat                 {"pergunta", "history", "mensagens"} -> NDJSON: {"trecho"}... {"info"}
+#                              (?stream=0 devolve {"resposta", "info"} de uma vez)
+#   POST /delegacias           {"endereco"} -> {"delegacias"} (base local)
+#   POST /delegacias/mensagem  {"endereco", "delegacias"} -> {"mensagem"}
+#   POST /delegacias/internet  {"endereco"} -> {"resultado"} (crew com o Serper)
+#   POST /relatorios           {"chat_history"} -> 202 {"id"}
+#   POST /denuncias            {"victim_name", "conversation_text"} -> 202 {"id"}
+#   GET  /tarefas/{id}         estado e progresso da tarefa
+#   GET  /tarefas/{id}/pdf     PDF gerado
+#   POST /tarefas/{id}/baixado libera o PDF da memória
+#   GET  /documentos, GET /saude
+#
+# O trabalho bloqueante (chain, crews, PDF) roda em um pool de threads.
+# Requisições idênticas em andamento são agrupadas em uma única execução, e
+# acima dos limites de concorrência a resposta é 503 com Retry-After.
+
+import os
+import sys
+import json
+import asyncio
+import hashlib
+import argparse
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from aiohttp import web
+
+API_HOST = os.environ.get("API_HOST", "127.0.0.1")
+API_PORTA = int(os.environ.get("API_PORTA", "8000"))
+# Threads para o trabalho bloqueante
+API_MAX_WORKERS = int(os.environ.get("API_MAX_WORKERS", "16"))
+# Execuções simultâneas de cada tipo e quantas podem esperar na fila antes do 503
+API_MAX_CHAT = int(os.environ.get("API_MAX_CHAT", "8"))
+API_MAX_CREWS = int(os.environ.get("API_MAX_CREWS", "2"))
+API_MAX_ESPERA = int(os.environ.get("API_MAX_ESPERA", "32"))
+# Segundos sugeridos ao cliente no Retry-After
+RETRY_AFTER = 5
+
+class Sobrecarga(Exception):
+    pass
+
+class Limitador:
+    """
+    Limita as execuções simultâneas e o tamanho da fila de espera; quando a fila
+    está cheia, usar() levanta Sobrecarga em vez de acumular requisições.
+
+    Parâmetros:
+    max_simultaneos (int): Execuções ao mesmo tempo.
+    max_espera (int): Requisições aguardando uma vaga.
+    """
+
+    def __init__(self, max_simultaneos, max_espera=API_MAX_ESPERA):
+        self.max_simultaneos = max_simultaneos
+        self.max_espera = max_espera
+        self._semaforo = asyncio.Semaphore(max_simultaneos)
+        self.em_execucao = 0
+        self.esperando = 0
+        self.recusadas = 0
+
+    def cheio(self):
+        return self._semaforo.locked() and self.esperando >= self.max_espera
+
+    # Reserva um lugar na fila sem esperar; usado antes de agendar a task que chamará usar()
+    def reservar(self):
+        if self.cheio():
+            self.recusadas += 1
+            raise Sobrecarga("Servidor ocupado. Tente novamente em alguns segundos.")
+        self.esperando += 1
+
+    @contextlib.asynccontextmanager
+    async def usar(self, reservado=False):
+        if not reservado:
+            self.reservar()
+        try:
+            await self._semaforo.acquire()
+        finally:
+            self.esperando -= 1
+        self.em_execucao += 1
+        try:
+            yield
+        finally:
+            self.em_execucao -= 1
+            self._semaforo.release()
+
+    def estatisticas(self):
+        return {"em_execucao": self.em_execucao, "esperando": self.esperando, "recusadas": self.recusadas,
+                "max_simultaneos": self.max_simultaneos, "max_espera": self.max_espera}
+
+class Agrupador:
+    """Requisições idênticas em andamento esperam a mesma execução em vez de repeti-la."""
+
+    def __init__(self):
+        self._em_andamento = {}
+        self.agrupadas = 0
+
+    async def executar(self, chave, fabrica):
+        tarefa = self._em_andamento.get(chave)
+        if tarefa is None:
+            tarefa = asyncio.ensure_future(fabrica())
+            self._em_andamento[chave] = tarefa
+            tarefa.add_done_callback(lambda _: self._em_andamento.pop(chave, None))
+        else:
+            self.agrupadas += 1
+        # shield: se o primeiro cliente desconectar, a execução continua para os outros
+        return await asyncio.shield(tarefa)
+
+class Transmissao:
+    """
+    Resposta do chat sendo gerada, que pode ser lida por vários clientes: quem
+    chega depois recebe os trechos já gerados e acompanha os próximos.
+    """
+
+    def __init__(self):
+        self.trechos = []
+        self.info = None
+        self.erro = None
+        self.fim = False
+        self._evento = asyncio.Event()
+
+    def _acordar(self):
+        evento, self._evento = self._evento, asyncio.Event()
+        evento.set()
+
+    # publicar() e encerrar() rodam no loop (via call_soon_threadsafe)
+    def publicar(self, trecho):
+        self.trechos.append(trecho)
+        self._acordar()
+
+    def encerrar(self, info, erro=None):
+        self.info = info
+        self.erro = erro
+        self.fim = True
+        self._acordar()
+
+    async def ler(self):
+        posicao = 0
+        while True:
+            evento = self._evento
+            while posicao < len(self.trechos):
+                yield self.trechos[posicao]
+                posicao += 1
+            if self.fim:
+                if self.erro is not None:
+                    raise self.erro
+                return
+            await evento.wait()
+
+def chave_requisicao(*partes):
+    return hashlib.sha256(json.dumps(partes, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def _erro(status, mensagem, **cabecalhos):
+    return web.json_response({"erro": mensagem}, status=status, headers=cabecalhos or None)
+
+def _sobrecarga(mensagem):
+    return _erro(503, mensagem, **{"Retry-After": str(RETRY_AFTER)})
+
+async def _corpo(request, *campos):
+    try:
+        dados = await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise web.HTTPBadRequest(text="JSON inválido")
+    # JSON válido mas não um objeto ([], "x", 1) também é erro do cliente
+    if not isinstance(dados, dict):
+        raise web.HTTPBadRequest(text="JSON inválido")
+    faltando = [c for c in campos if not dados.get(c)]
+    if faltando:
+        raise web.HTTPBadRequest(text=f"Campos obrigatórios: {', '.join(faltando)}")
+    return dados
+
+class Servico:
+    """
+    Estado compartilhado pelas requisições: chain do chat, limitadores e agrupadores.
+
+    Parâmetros:
+    obter_chain (callable): Devolve a retrieval chain; por padrão a do app (índice dos PDFs em pdfs/).
+    pasta_pdfs (str): Pasta dos PDFs do índice.
+    max_chat (int): Respostas do chat geradas ao mesmo tempo.
+    max_crews (int): Buscas de delegacias na internet em andamento; acima disso, e com a fila cheia,
+        responde 503. Os crews em si ainda esperam uma vaga de utils.MAX_CREWS_SIMULTANEOS.
+    max_espera (int): Requisições que podem aguardar cada limite antes do 503.
+    """
+
+    def __init__(self, obter_chain=None, pasta_pdfs="pdfs", max_chat=API_MAX_CHAT, max_crews=API_MAX_CREWS, max_espera=API_MAX_ESPERA):
+        self.pasta_pdfs = pasta_pdfs
+        self._obter_chain = obter_chain or self._chain_do_app
+        self._chain = None
+        self.limite_chat = Limitador(max_chat, max_espera)
+        self.limite_crews = Limitador(max_crews, max_espera)
+        self.agrupador = Agrupador()
+        self._transmissoes = {}
+        self._tarefas_por_chave = {}
+        self.requisicoes_chat = 0
+        self.chats_agrupados = 0
+
+    def arquivos_pdf(self):
+        if not os.path.isdir(self.pasta_pdfs):
+            return []
+        return sorted(os.path.join(self.pasta_pdfs, f) for f in os.listdir(self.pasta_pdfs) if f.lower().endswith(".pdf"))
+
+    def _chain_do_app(self):
+        from assistente import get_retrieval_chain
+        return get_retrieval_chain(self.arquivos_pdf())
+
+    # A chain é montada uma vez (no primeiro chat ou no aquecimento) e compartilhada
+    async def chain(self):
+        if self._chain is None:
+            self._chain = await self.agrupador.executar("chain", lambda: asyncio.to_thread(self._obter_chain))
+        return self._chain
+
+    # Gera a resposta em uma thread, publicando os trechos na transmissão
+    async def _gerar_resposta(self, transmissao, pergunta, history, mensagens):
+        from assistente import responder_pergunta_stream
+
+        loop = asyncio.get_running_loop()
+
+        def gerar():
+            gerador, info = responder_pergunta_stream(chain, pergunta, history, mensagens)
+            for trecho in gerador:
+                loop.call_soon_threadsafe(transmissao.publicar, trecho)
+            return info
+
+        try:
+            async with self.limite_chat.usar(reservado=True):
+                chain = await self.chain()
+                info = await loop.run_in_executor(None, gerar)
+            transmissao.encerrar(info)
+        except Exception as e:
+            transmissao.encerrar(None, e)
+
+    # Devolve a transmissão da resposta, reaproveitando uma idêntica em andamento
+    def transmissao_chat(self, pergunta, history, mensagens):
+        self.requisicoes_chat += 1
+        chave = chave_requisicao("chat", pergunta, history, mensagens)
+        transmissao = self._transmissoes.get(chave)
+        if transmissao is not None:
+            self.chats_agrupados += 1
+            return transmissao
+        self.limite_chat.reservar()
+        transmissao = Transmissao()
+        self._transmissoes[chave] = transmissao
+        tarefa = asyncio.ensure_future(self._gerar_resposta(transmissao, pergunta, history, mensagens))
+        tarefa.add_done_callback(lambda _: self._transmissoes.pop(chave, None))
+        return transmissao
+
+    # Submete um relatório/denúncia; a mesma submissão ainda disponível devolve o mesmo ID
+    def submeter_tarefa(self, chave, submeter):
+        from tarefas import get_gerenciador_tarefas
+
+        id_tarefa = self._tarefas_por_chave.get(chave)
+        if id_tarefa is not None:
+            status = get_gerenciador_tarefas().status(id_tarefa)
+            if status is not None and status["status"] != "erro" and not status["baixado"]:
+                return id_tarefa
+        id_tarefa = submeter()
+        self._tarefas_por_chave[chave] = id_tarefa
+        # Não guarda chaves de tarefas que o gerenciador já descartou
+        for antiga in [c for c, i in self._tarefas_por_chave.items() if get_gerenciador_tarefas().status(i) is None]:
+            del self._tarefas_por_chave[antiga]
+        return id_tarefa
+
+    def estatisticas(self):
+        from tarefas import get_gerenciador_tarefas
+
+        estatisticas = {
+            "chat": dict(self.limite_chat.estatisticas(), requisicoes=self.requisicoes_chat,
+                         agrupadas=self.chats_agrupados, em_andamento=len(self._transmissoes)),
+            "crews": self.limite_crews.estatisticas(),
+            "agrupadas": self.agrupador.agrupadas,
+            "tarefas": get_gerenciador_tarefas().pendentes(),
+            "chain_carregada": self._chain is not None
+        }
+        if "cache_llm" in sys.modules:
+            estatisticas["cache_llm"] = sys.modules["cache_llm"].get_cache_llm().estatisticas()
+        return estatisticas
+
+rotas = web.RouteTableDef()
+
+@rotas.post("/chat")
+async def chat(request):
+    servico = request.app["servico"]
+    dados = await _corpo(request, "pergunta")
+    try:
+        transmissao = servico.transmissao_chat(dados["pergunta"], dados.get("history", ""), dados.get("mensagens", []))
+    except Sobrecarga as e:
+        return _sobrecarga(str(e))
+
+    if request.query.get("stream", "1") == "0":
+        try:
+            resposta = "".join([trecho async for trecho in transmissao.ler()])
+        except Sobrecarga as e:
+            return _sobrecarga(str(e))
+        except Exception as e:
+            return _erro(500, str(e))
+        return web.json_response({"resposta": resposta, "info": transmissao.info})
+
+    resposta = web.StreamResponse(headers={"Content-Type": "application/x-ndjson; charset=utf-8"})
+    await resposta.prepare(request)
+    try:
+        async for trecho in transmissao.ler():
+            await resposta.write((json.dumps({"trecho": trecho}, ensure_ascii=False) + "\n").encode("utf-8"))
+        final = {"info": transmissao.info}
+    except Exception as e:
+        # O status já foi enviado; o erro vai como última linha
+        final = {"erro": str(e)}
+    await resposta.write((json.dumps(final, ensure_ascii=False) + "\n").encode("utf-8"))
+    await resposta.write_eof()
+    return resposta
+
+@rotas.post("/delegacias")
+async def delegacias(request):
+    from delegacias import buscar_delegacias_offline
+    dados = await _corpo(request, "endereco")
+    encontradas = await request.app["servico"].agrupador.executar(
+        chave_requisicao("delegacias", dados["endereco"]),
+        lambda: asyncio.to_thread(buscar_delegacias_offline, dados["endereco"])
+    )
+    return web.json_response({"delegacias": encontradas or []})
+
+@rotas.post("/delegacias/mensagem")
+async def mensagem_delegacias(request):
+    from delegacias import escrever_mensagem_delegacias
+    servico = request.app["servico"]
+    dados = await _corpo(request, "endereco", "delegacias")
+
+    async def escrever():
+        async with servico.limite_chat.usar():
+            return await asyncio.to_thread(escrever_mensagem_delegacias, dados["endereco"], dados["delegacias"])
+
+    try:
+        mensagem = await servico.agrupador.executar(chave_requisicao("mensagem", dados["endereco"], dados["delegacias"]), escrever)
+    except Sobrecarga as e:
+        return _sobrecarga(str(e))
+    return web.json_response({"mensagem": mensagem})
+
+# Resumo do histórico do chat (HistoricoConversa.compactar), para o app em modo
+# cliente não chamar o LLM por conta própria
+@rotas.post("/historico/resumo")
+async def resumo_historico(request):
+    from historico import resumir_com_llm
+    servico = request.app["servico"]
+    dados = await _corpo(request, "mensagens", "limite_tokens")
+    try:
+        async with servico.limite_chat.usar():
+            resumo = await asyncio.to_thread(resumir_com_llm, dados.get("resumo", ""), dados["mensagens"], int(dados["limite_tokens"]))
+    except Sobrecarga as e:
+        return _sobrecarga(str(e))
+    return web.json_response({"resumo": resumo})
+
+@rotas.post("/delegacias/internet")
+async def delegacias_internet(request):
+    from utils import executar_crew_localizacao
+    servico = request.app["servico"]
+    dados = await _corpo(request, "endereco")
+
+    async def executar():
+        async with servico.limite_crews.usar():
+            return str(await asyncio.to_thread(executar_crew_localizacao, dados["endereco"]))
+
+    try:
+        resultado = await servico.agrupador.executar(chave_requisicao("localizacao", dados["endereco"]), executar)
+    except Sobrecarga as e:
+        return _sobrecarga(str(e))
+    return web.json_response({"resultado": resultado})
+
+async def _submeter(request, tipo, campos, submeter):
+    from tarefas import FilaCheia
+    dados = await _corpo(request, *campos)
+    try:
+        id_tarefa = request.app["servico"].submeter_tarefa(
+            chave_requisicao(tipo, *(dados[c] for c in campos)), lambda: submeter(*(dados[c] for c in campos))
+        )
+    except FilaCheia as e:
+        return _sobrecarga(str(e))
+    return web.json_response({"id": id_tarefa}, status=202)
+
+@rotas.post("/relatorios")
+async def relatorios(request):
+    from tarefas import submeter_relatorio
+    return await _submeter(request, "relatorio", ["chat_history"], submeter_relatorio)
+
+@rotas.post("/denuncias")
+async def denuncias(request):
+    from tarefas import submeter_denuncia
+    return await _submeter(request, "denuncia", ["victim_name", "conversation_text"], submeter_denuncia)
+
+@rotas.get("/tarefas/{id}")
+async def tarefa(request):
+    from tarefas import get_gerenciador_tarefas
+    gerenciador = get_gerenciador_tarefas()
+    status = gerenciador.status(request.match_info["id"])
+    if status is None:
+        return _erro(404, "Tarefa não encontrada ou expirada.")
+    return web.json_response(dict(status, progresso=gerenciador.progresso(request.match_info["id"])))
+
+@rotas.get("/tarefas/{id}/pdf")
+async def tarefa_pdf(request):
+    from tarefas import get_gerenciador_tarefas
+    pdf = get_gerenciador_tarefas().resultado(request.match_info["id"])
+    if pdf is None:
+        return _erro(404, "PDF não disponível.")
+    return web.Response(body=pdf, content_type="application/pdf")
+
+@rotas.post("/tarefas/{id}/baixado")
+async def tarefa_baixada(request):
+    from tarefas import get_gerenciador_tarefas
+    get_gerenciador_tarefas().marcar_baixado(request.match_info["id"])
+    return web.json_response({"ok": True})
+
+@rotas.get("/documentos")
+async def documentos(request):
+    return web.json_response({"documentos": [os.path.basename(a) for a in request.app["servico"].arquivos_pdf()]})
+
+@rotas.get("/saude")
+async def saude(request):
+    return web.json_response(dict(status="ok", **request.app["servico"].estatisticas()))
+
+# Monta a chain em segundo plano ao iniciar, para o primeiro chat não esperar o índice
+async def _aquecer(app):
+    servico = app["servico"]
+
+    async def aquecer():
+        try:
+            await servico.chain()
+        except Exception as e:
+            print(f"Falha ao carregar o índice: {e}", file=sys.stderr)
+
+    app["aquecimento"] = asyncio.ensure_future(aquecer())
+
+async def _configurar_executor(app):
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=API_MAX_WORKERS, thread_name_prefix="api"))
+
+def criar_app(servico=None, aquecer=True):
+    app = web.Application(client_max_size=4 * 1024 * 1024)
+    app["servico"] = servico or Servico()
+    app.add_routes(rotas)
+    app.on_startup.append(_configurar_executor)
+    if aquecer:
+        app.on_startup.append(_aquecer)
+    return app
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="API HTTP do assistente (chat, delegacias, relatórios e denúncias).")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--porta", type=int, default=API_PORTA)
+    args = parser.parse_args(argv)
+    web.run_app(criar_app(), host=args.host, port=args.porta)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
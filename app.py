@@ -1,37 +1,22 @@
 # app.py
 import os
-import requests
-import tempfile
-from datetime import datetime
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
-from reportlab.platypus import Paragraph, Frame
-from dotenv import load_dotenv
-from crewai import Agent, Task, Crew
-from langchain_groq import ChatGroq
-from crewai_tools import tool
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_core.prompts import ChatPromptTemplate
-from langchain.chains import create_retrieval_chain
-from langchain_community.vectorstores import FAISS
 import streamlit as st
-import streamlit as st
-from utils import (
-    carregar_pdfs,
-    get_llm,
-    buscar_delegacias_proximas,
-    executar_crew_localizacao,
-    executar_crew_denuncia,
-    executar_crew_relatorio,
-    gerar_pdf_conteudo
-)
-import os
-import time
+from sessoes import get_armazem_sessoes
+from delegacias import formatar_delegacias
+from tarefas import ETAPAS, FilaCheia
+from aquecimento import aquecer_chat
+
+# Com API_URL o app é só a interface: chat, delegacias e documentos vêm da API (api.py)
+USAR_API = bool(os.environ.get("API_URL"))
+if USAR_API:
+    from cliente_api import buscar_delegacias_offline, escrever_mensagem_delegacias
+    from cliente_api import get_gerenciador_tarefas, submeter_relatorio, submeter_denuncia
+    # O resumo do histórico também é feito no servidor: o app não chama o LLM
+    from cliente_api import resumir_historico
+else:
+    from delegacias import buscar_delegacias_offline, escrever_mensagem_delegacias
+    from tarefas import get_gerenciador_tarefas, submeter_relatorio, submeter_denuncia
+    from historico import resumir_com_llm as resumir_historico
 
 # Configuração da página
 st.set_page_config(
@@ -57,10 +42,47 @@ st.markdown("""
 if "page" not in st.session_state:
     st.session_state["page"] = "Assistente Lei Maria da Penha"
 
+# A conversa fica no armazém de sessões (memória limitada, ociosas vão para o disco);
+# o st.session_state guarda só o id
+sessao = get_armazem_sessoes().obter(st.session_state.get("id_sessao"))
+st.session_state["id_sessao"] = sessao.id
+
 # Função para definir a página atual com base no botão clicado
 def set_page(page_name):
     st.session_state["page"] = page_name
 
+# Libera o PDF da memória do servidor quando o usuário o baixa
+def baixar_tarefa(chave, id_tarefa):
+    get_gerenciador_tarefas().marcar_baixado(id_tarefa)
+    st.session_state.pop(chave, None)
+
+# Mostra o progresso de uma tarefa em segundo plano, atualizando a cada 2 segundos
+@st.fragment(run_every=2)
+def mostrar_tarefa(chave, rotulo_download, nome_arquivo):
+    id_tarefa = st.session_state.get(chave)
+    if not id_tarefa:
+        return
+    gerenciador = get_gerenciador_tarefas()
+    status = gerenciador.status(id_tarefa)
+    if status is None:
+        st.warning("O documento expirou. Gere novamente.")
+        return
+    st.progress(gerenciador.progresso(id_tarefa))
+    for etapa, rotulo in ETAPAS.items():
+        st.write(("✅ " if status["etapas"][etapa] else "⏳ ") + rotulo)
+    if status["status"] == "erro":
+        st.error(f"Erro na geração do documento: {status['erro']}")
+    elif status["status"] == "concluido":
+        st.success("Documento gerado com sucesso!")
+        st.download_button(
+            label=rotulo_download,
+            data=gerenciador.resultado(id_tarefa),
+            file_name=nome_arquivo,
+            mime="application/pdf",
+            on_click=baixar_tarefa,
+            args=(chave, id_tarefa)
+        )
+
 # Botões para navegar entre as páginas
 st.sidebar.title("maria.ai")
 st.sidebar.button("Falar com Maria", on_click=set_page, args=("Assistente Lei Maria da Penha",), use_container_width=True)
@@ -73,19 +95,34 @@ if st.session_state["page"] == "Localizar Delegacias":
     st.markdown("### Encontre delegacias próximas à sua localização")
     with st.form("busca_form"):
         endereco = st.text_input("Digite seu endereço", placeholder="Ex: Rua MMDC, 80, Butantã, São Paulo")
+        # Desligada enquanto dados/ tiver só a amostra de delegacias de São Paulo
+        busca_rapida = st.checkbox("Busca rápida (base local de delegacias)", value=False)
+        mensagem_ia = st.checkbox("Incluir mensagem escrita pela assistente", value=False)
         submitted_localizacao = st.form_submit_button("Buscar Delegacias", type="primary")
     if submitted_localizacao and endereco:
         with st.spinner('Buscando delegacias próximas...'):
             try:
-                resultado = executar_crew_localizacao(endereco)
-                st.success("Busca realizada com sucesso!")
-                st.markdown("### Resultado da Busca")
-                st.write(resultado)
+                delegacias = buscar_delegacias_offline(endereco) if busca_rapida else None
+                if delegacias:
+                    st.success("Busca realizada com sucesso!")
+                    st.markdown("### Resultado da Busca")
+                    if mensagem_ia:
+                        st.write(escrever_mensagem_delegacias(endereco, delegacias))
+                    st.markdown(formatar_delegacias(delegacias))
+                else:
+                    if busca_rapida:
+                        st.info("Endereço não encontrado na base local. Buscando na internet...")
+                    if USAR_API:
+                        from cliente_api import executar_crew_localizacao
+                    else:
+                        from utils import executar_crew_localizacao
+                    resultado = executar_crew_localizacao(endereco)
+                    st.success("Busca realizada com sucesso!")
+                    st.markdown("### Resultado da Busca")
+                    st.write(resultado)
             except Exception as e:
                 st.error(f"Ocorreu um erro durante a busca: {str(e)}")
 
-import streamlit as st
-
 # Página de criação de denúncia
 if st.session_state["page"] == "Criar Denúncia":
     # Título da Página
@@ -112,26 +149,18 @@ if st.session_state["page"] == "Criar Denúncia":
             )
         with col2:
             if st.button("Gerar Relatório da Conversa"):
-                if "messages" in st.session_state and len(st.session_state.messages) > 1:
-                    with st.spinner('Gerando o relatório...'):
-                        try:
-                            chat_history = "\n".join([
-                                f"{msg['role'].upper()}: {msg['content']}"
-                                for msg in st.session_state.messages
-                            ])
-                            resultado = executar_crew_relatorio(chat_history)
-                            pdf_data = gerar_pdf_conteudo(resultado)
-                            st.success("Relatório gerado com sucesso!")
-                            st.download_button(
-                                label="📥 Baixar Relatório (PDF)",
-                                data=pdf_data,
-                                file_name="Relatorio_da_Conversa.pdf",
-                                mime="application/pdf"
-                            )
-                        except Exception as e:
-                            st.error(f"Erro na geração do relatório: {str(e)}")
+                if len(sessao.mensagens) > 1:
+                    try:
+                        chat_history = "\n".join([
+                            f"{papel.upper()}: {texto}"
+                            for papel, texto in sessao.mensagens
+                        ])
+                        st.session_state["tarefa_relatorio"] = submeter_relatorio(chat_history)
+                    except FilaCheia as e:
+                        st.warning(str(e))
                 else:
                     st.warning("Histórico de conversa não disponível. Use o Assistente Virtual primeiro.")
+            mostrar_tarefa("tarefa_relatorio", "📥 Baixar Relatório (PDF)", "Relatorio_da_Conversa.pdf")
 
     # Seção 2: Formulário para novo relato
     st.markdown("<hr style='border:1px solid #f0f2f6;'>", unsafe_allow_html=True)
@@ -152,9 +181,6 @@ if st.session_state["page"] == "Criar Denúncia":
             "Preencha todos os campos abaixo para gerar o documento de denúncia com as informações necessárias."
         )
 
-        # Variável para armazenar o PDF gerado
-        pdf_data = None
-
         # Formulário
         with st.form("denuncia_form"):
             victim_name = st.text_input("Nome da Vítima", placeholder="Digite seu nome completo")
@@ -168,98 +194,68 @@ if st.session_state["page"] == "Criar Denúncia":
         # Processamento do formulário fora do bloco st.form
         if submitted_denuncia:
             if victim_name and conversation_text:
-                with st.spinner('Gerando documento de denúncia...'):
-                    try:
-                        resultado = executar_crew_denuncia(victim_name, conversation_text)
-                        pdf_data = gerar_pdf_conteudo(resultado)
-                        st.success("Documento de denúncia gerado com sucesso!")
-                    except Exception as e:
-                        st.error(f"Erro na geração do documento: {str(e)}")
+                try:
+                    st.session_state["tarefa_denuncia"] = submeter_denuncia(victim_name, conversation_text)
+                except FilaCheia as e:
+                    st.warning(str(e))
             else:
                 st.warning("Por favor, preencha todos os campos necessários.")
         
-        # Exibir botão de download fora do formulário após o PDF ser gerado
-        if pdf_data:
-            st.download_button(
-                label="📥 Baixar Documento de Denúncia (PDF)",
-                data=pdf_data,
-                file_name="Documento_de_Denuncia.pdf",
-                mime="application/pdf"
-            )
+        # Progresso e botão de download fora do formulário
+        mostrar_tarefa("tarefa_denuncia", "📥 Baixar Documento de Denúncia (PDF)", "Documento_de_Denuncia.pdf")
 elif st.session_state["page"] == "Assistente Lei Maria da Penha":
     st.title("Suporte Virtual - Fale com Maria")
-    
-    if "messages" not in st.session_state:
-        st.session_state.messages = [{"role": "assistant", "content": "Olá! Sou Maria, sua assistente virtual, aqui para apoiar na luta contra a violência contra a mulher. Em que posso ajudar você?"}]
+    if USAR_API:
+        from cliente_api import carregar_pdfs, get_retrieval_chain, responder_pergunta_stream
+    else:
+        from utils import carregar_pdfs
+        from assistente import get_retrieval_chain, responder_pergunta_stream
     
     arquivos_pdf = carregar_pdfs()
     
     if arquivos_pdf:
         try:
-            if "chat_initialized" not in st.session_state:
+            # A sessão guarda só uma referência à chain compartilhada por todas as sessões
+            if sessao.chain is None:
                 with st.spinner("Inicializando o assistente..."):
-                    model_name = "sentence-transformers/all-MiniLM-L6-v2"
-                    embeddings = HuggingFaceEmbeddings(model_name=model_name, model_kwargs={'device': 'cpu'})
-                    
-                    final_documents = []
-                    for arquivo_pdf in arquivos_pdf:
-                        loader = PyPDFLoader(arquivo_pdf)
-                        docs = loader.load()
-                        
-                        text_splitter = RecursiveCharacterTextSplitter(
-                            chunk_size=1000,
-                            chunk_overlap=200,
-                            separators=["\n\n", "\n", ".", "!", "?", ";", ",", " "]
-                        )
-                        final_documents.extend(text_splitter.split_documents(docs))
-                    
-                    vectors = FAISS.from_documents(final_documents, embeddings)
-                    
-                    llm = get_llm()
-                    prompt = ChatPromptTemplate.from_template("""
-                        Você é uma assistente especializada na Lei Maria da Penha (Lei nº 11.340/2006) e deseja entender o máximo de detalhes sobre a situação da pessoa que está em contato com você.
-                        Responda à pergunta de maneira empática e faça perguntas que ajudem a entender melhor a situação da vítima, sempre buscando obter mais detalhes e mostrando compreensão.
-
-                        Algumas diretrizes para sua resposta:
-                        - Use linguagem acessível, evitando jargões jurídicos complexos
-                        - Se a situação envolver risco, pergunte se a pessoa já buscou ajuda e ofereça informações sobre canais de apoio
-                        - Mantenha-se estritamente dentro do conteúdo da lei fornecido no contexto
-                        - Finalize cada resposta com uma pergunta, incentivando a continuidade da conversa e a obtenção de mais detalhes sobre a situação. Faça apenas uma pergunta por mensagem.
-                        - Antes de perguntar, ajude ela com as medidas legais com base na lei maria da penha.
-                        Caso você identifique que há necessidade de acionar as autoridades, fale para o usuário sobre a existencia da aba "localizar delegacias" e "criar denúncia" para que ele possa ir ao local e ter os documentos necessários para isso.
-                        <contexto>
-                        {context}
-                        </contexto>
-                        Pergunta: {input}
-                        Histórico da Conversa: {history}""")
-
-                    document_chain = create_stuff_documents_chain(llm, prompt)
-                    retriever = vectors.as_retriever(search_kwargs={"k": 4})
-                    st.session_state.retrieval_chain = create_retrieval_chain(retriever, document_chain)
-                    st.session_state.chat_initialized = True
+                    sessao.chain = get_retrieval_chain(arquivos_pdf)
 
-            for message in st.session_state.messages:
-                with st.chat_message(message["role"]):
-                    st.write(message["content"])
+            for papel, texto in sessao.mensagens:
+                with st.chat_message(papel):
+                    st.write(texto)
 
             if pergunta := st.chat_input("Digite sua pergunta sobre a Lei Maria da Penha"):
-                st.session_state.messages.append({"role": "user", "content": pergunta})
+                sessao.adicionar("user", pergunta)
                 with st.chat_message("user"):
                     st.write(pergunta)
 
-                history = "\n".join([f"{msg['role']}: {msg['content']}" for msg in st.session_state.messages])
-                st.session_state['history'] = history
+                historico = sessao.historico(resumidor=resumir_historico)
+                history = historico.texto()
                 
                 with st.chat_message("assistant"):
-                    with st.spinner("Analisando sua pergunta..."):
-                        start = time.time()
-                        response = st.session_state.retrieval_chain.invoke({"input": pergunta, "history": history})
-                        tempo = time.time() - start
-                        
-                        st.write(response['answer'])
-                        st.caption(f"Tempo de resposta: {tempo:.2f} segundos")
+                    gerador, info = responder_pergunta_stream(
+                        sessao.chain, pergunta, history, sessao.mensagens_dict(fim=-1)
+                    )
+                    resposta = st.write_stream(gerador)
+                    if info["cache"]:
+                        st.caption(f"Tempo de resposta: {info['tempo_total']:.2f} segundos (cache)")
+                    else:
+                        st.caption(
+                            f"Primeiro token: {info['tempo_primeiro_token']:.2f}s | "
+                            f"Tempo total: {info['tempo_total']:.2f}s "
+                            f"(busca: {info['tempo_recuperacao']:.2f}s, geração: {info['tempo_geracao']:.2f}s) | "
+                            f"Prompt: ~{info['tokens_prompt']} tokens (histórico: ~{historico.tokens()})"
+                        )
                 
-                st.session_state.messages.append({"role": "assistant", "content": response['answer']})
+                sessao.adicionar("assistant", resposta)
+                historico.adicionar("assistant", resposta)
+                historico.compactar()
+                sessao.atualizar_historico(historico)
+                get_armazem_sessoes().salvar(sessao)
 
         except Exception as e:
             st.error(f"Ocorreu um erro ao processar sua solicitação: {str(e)}")
+
+# Depois que a página já foi enviada ao navegador, carrega o chat em segundo plano
+if not USAR_API:
+    aquecer_chat()
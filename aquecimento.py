@@ -0,0 +1,46 @@
+# aquecimento.py
+# Carrega a pilha do chat (LangChain, FAISS, modelo de embeddings) em uma thread
+# depois que a primeira página já foi exibida, para que a primeira pergunta não
+# pague o custo de importação. Desligado com AQUECIMENTO_CHAT=0.
+
+import os
+import time
+import logging
+import threading
+
+AQUECIMENTO_ATIVO = os.environ.get("AQUECIMENTO_CHAT", "1") == "1"
+
+logger = logging.getLogger(__name__)
+
+_thread = None
+_lock = threading.Lock()
+# Segundos gastos em cada etapa do último aquecimento
+duracoes = {}
+
+def _aquecer():
+    inicio = time.perf_counter()
+    try:
+        import assistente  # noqa: F401  (langchain, faiss, langchain_community)
+        duracoes["importacao_chat"] = time.perf_counter() - inicio
+
+        etapa = time.perf_counter()
+        from servico_embeddings import get_servico_embeddings
+        get_servico_embeddings().embeddings
+        duracoes["modelo_embeddings"] = time.perf_counter() - etapa
+
+        etapa = time.perf_counter()
+        import langchain_groq  # noqa: F401
+        duracoes["importacao_llm"] = time.perf_counter() - etapa
+    except Exception:
+        # O chat mostra o erro quando for usado; aqui só não se adianta o trabalho
+        logger.exception("Falha no aquecimento do chat")
+
+# Inicia o aquecimento uma única vez por processo; chamadas seguintes não fazem nada
+def aquecer_chat():
+    global _thread
+    if not AQUECIMENTO_ATIVO or _thread is not None:
+        return
+    with _lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_aquecer, name="aquecimento-chat", daemon=True)
+            _thread.start()
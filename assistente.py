@@ -0,0 +1,121 @@
+# assistente.py
+
+import os
+import time
+import streamlit as st
+from langchain.chains.combine_documents import create_stuff_documents_chain
+from langchain_core.prompts import ChatPromptTemplate
+from langchain.chains import create_retrieval_chain
+from indice import calcular_hash_pdfs, carregar_indice, get_embeddings
+from busca_hibrida import RetrieverHibrido, carregar_busca_hibrida
+from contexto import ORCAMENTO_TOKENS as ORCAMENTO_CONTEXTO
+from cache_respostas import CacheSemantico, independe_do_historico, pergunta_generica
+from historico import contar_tokens
+from rastreamento import callbacks as callbacks_rastreamento
+from utils import get_llm
+
+BUSCA_HIBRIDA = os.environ.get("BUSCA_HIBRIDA", "1") == "1"
+
+PROMPT_ASSISTENTE = """
+    Você é uma assistente especializada na Lei Maria da Penha (Lei nº 11.340/2006) e deseja entender o máximo de detalhes sobre a situação da pessoa que está em contato com você.
+    Responda à pergunta de maneira empática e faça perguntas que ajudem a entender melhor a situação da vítima, sempre buscando obter mais detalhes e mostrando compreensão.
+
+    Algumas diretrizes para sua resposta:
+    - Use linguagem acessível, evitando jargões jurídicos complexos
+    - Se a situação envolver risco, pergunte se a pessoa já buscou ajuda e ofereça informações sobre canais de apoio
+    - Mantenha-se estritamente dentro do conteúdo da lei fornecido no contexto
+    - Finalize cada resposta com uma pergunta, incentivando a continuidade da conversa e a obtenção de mais detalhes sobre a situação. Faça apenas uma pergunta por mensagem.
+    - Antes de perguntar, ajude ela com as medidas legais com base na lei maria da penha.
+    Caso você identifique que há necessidade de acionar as autoridades, fale para o usuário sobre a existencia da aba "localizar delegacias" e "criar denúncia" para que ele possa ir ao local e ter os documentos necessários para isso.
+    <contexto>
+    {context}
+    </contexto>
+    Pergunta: {input}
+    Histórico da Conversa: {history}"""
+
+def criar_retrieval_chain(retriever, llm):
+    prompt = ChatPromptTemplate.from_template(PROMPT_ASSISTENTE)
+    document_chain = create_stuff_documents_chain(llm, prompt)
+    return create_retrieval_chain(retriever, document_chain)
+
+# Busca híbrida (BM25 + HNSW) por padrão, com os trechos empacotados no orçamento
+# CONTEXTO_ORCAMENTO_TOKENS; BUSCA_HIBRIDA=0 volta ao índice FAISS exato com k trechos
+def get_retriever(arquivos_pdf, k=4, orcamento_tokens=ORCAMENTO_CONTEXTO):
+    if BUSCA_HIBRIDA:
+        return RetrieverHibrido(busca=carregar_busca_hibrida(arquivos_pdf), k=k, orcamento_tokens=orcamento_tokens or None)
+    return carregar_indice(arquivos_pdf).as_retriever(search_kwargs={"k": k})
+
+# Chain de recuperação compartilhada por todas as sessões (não guarda estado da conversa)
+@st.cache_resource(show_spinner=False)
+def _criar_retrieval_chain(hash_pdfs, arquivos_pdf):
+    return criar_retrieval_chain(get_retriever(list(arquivos_pdf)), get_llm())
+
+def get_retrieval_chain(arquivos_pdf):
+    return _criar_retrieval_chain(calcular_hash_pdfs(arquivos_pdf), tuple(sorted(arquivos_pdf)))
+
+# Cache semântico de respostas compartilhado por todas as sessões: só recebe
+# perguntas sem dados pessoais (cache_respostas.pergunta_generica)
+@st.cache_resource(show_spinner=False)
+def get_cache_respostas():
+    return CacheSemantico(get_embeddings())
+
+# Tamanho estimado do prompt enviado ao LLM em um turno
+def tokens_prompt(pergunta, history, documentos):
+    return (
+        contar_tokens(PROMPT_ASSISTENTE)
+        + contar_tokens(pergunta)
+        + contar_tokens(history)
+        + sum(contar_tokens(doc.page_content) for doc in documentos)
+    )
+
+# Responde a pergunta em streaming, consultando antes o cache semântico.
+# Devolve (gerador de trechos da resposta, info). O dicionário info é preenchido
+# durante o consumo do gerador com: cache, tokens_prompt, tempo_recuperacao,
+# tempo_primeiro_token, tempo_geracao e tempo_total (em segundos).
+def responder_pergunta_stream(retrieval_chain, pergunta, history, mensagens_anteriores):
+    info = {"cache": False, "tokens_prompt": 0, "tempo_recuperacao": 0.0,
+            "tempo_primeiro_token": 0.0, "tempo_geracao": 0.0, "tempo_total": 0.0}
+
+    def gerar():
+        inicio = time.perf_counter()
+        cache = get_cache_respostas()
+        primeira_pergunta = not any(m["role"] == "user" for m in mensagens_anteriores)
+        # Relatos pessoais não são respondidos nem guardados pelo cache, que é de todas as sessões
+        generica = pergunta_generica(pergunta)
+        vetor = None
+        if generica and independe_do_historico(pergunta, mensagens_anteriores):
+            resposta, vetor = cache.buscar(pergunta)
+            if resposta is not None:
+                info["cache"] = True
+                info["tempo_primeiro_token"] = info["tempo_total"] = time.perf_counter() - inicio
+                yield resposta
+                return
+
+        partes = []
+        fim_recuperacao = None
+        config = {"callbacks": callbacks_rastreamento()}
+        for chunk in retrieval_chain.stream({"input": pergunta, "history": history}, config=config):
+            if "context" in chunk:
+                fim_recuperacao = time.perf_counter()
+                info["tempo_recuperacao"] = fim_recuperacao - inicio
+                info["tokens_prompt"] = tokens_prompt(pergunta, history, chunk["context"])
+            if chunk.get("answer"):
+                if not partes:
+                    info["tempo_primeiro_token"] = time.perf_counter() - inicio
+                partes.append(chunk["answer"])
+                yield chunk["answer"]
+        fim = time.perf_counter()
+        info["tempo_total"] = fim - inicio
+        info["tempo_geracao"] = fim - (fim_recuperacao or inicio)
+
+        # Só respostas geradas sem histórico anterior, para perguntas sem dados pessoais,
+        # são genéricas o suficiente para reutilizar
+        if primeira_pergunta and generica:
+            cache.guardar(pergunta, "".join(partes), vetor)
+
+    return gerar(), info
+
+# Versão sem streaming: devolve (resposta, info)
+def responder_pergunta(retrieval_chain, pergunta, history, mensagens_anteriores):
+    gerador, info = responder_pergunta_stream(retrieval_chain, pergunta, history, mensagens_anteriores)
+    return "".join(gerador), info
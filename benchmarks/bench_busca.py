@@ -0,0 +1,137 @@
+# benchmarks/bench_busca.py
+# Compara a busca vetorial exata (como o índice FAISS flat atual) com HNSW,
+# IVF, BM25 e a busca híbrida, em um conjunto fixo de perguntas:
+#   python -m benchmarks.bench_busca [--pdfs pdfs] [--distratores 50000] [--saida resultado.json]
+#
+# Perguntas: consultas_busca.json (padrão) serve para ajustar pesos e parâmetros;
+# consultas_busca_avaliacao.json tem perguntas diferentes, sobre outros artigos, e
+# serve para conferir o ajuste (--consultas benchmarks/consultas_busca_avaliacao.json).
+#
+# Métricas por configuração:
+#   recall@k   fração do top-k da busca exata que a busca vetorial aproximada recupera
+#   acerto@k   fração das perguntas em que algum chunk recuperado é do artigo esperado
+#   latência   p50/p95 da busca em ms (o embedding da pergunta é calculado antes)
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+
+ARQUIVO_CONSULTAS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "consultas_busca.json")
+CONFIGURACOES = [
+    ("flat (atual)", "flat", "vetorial"),
+    ("hnsw", "hnsw", "vetorial"),
+    ("ivf", "ivf", "vetorial"),
+    ("bm25", "flat", "lexical"),
+    ("híbrida bm25+hnsw", "hnsw", "hibrido"),
+    ("híbrida bm25+ivf", "ivf", "hibrido")
+]
+
+class EmbeddingsPrecalculados:
+    """Devolve os vetores já calculados das perguntas, para medir só a busca."""
+
+    def __init__(self, vetores):
+        self.vetores = vetores
+
+    def embed_query(self, text):
+        return self.vetores[text]
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(int(p / 100 * len(ordenados)), len(ordenados) - 1)]
+
+# Vetores aleatórios normalizados, sem texto, para simular um acervo maior
+def gerar_distratores(quantidade, dimensao, semente=0):
+    vetores = np.random.default_rng(semente).standard_normal((quantidade, dimensao)).astype("float32")
+    return vetores / np.linalg.norm(vetores, axis=1, keepdims=True)
+
+def avaliar(busca, consultas, k, modo, exatos=None):
+    tempos, recalls, acertos, resultados = [], [], [], []
+    for consulta in consultas:
+        inicio = time.perf_counter()
+        posicoes = busca.buscar_posicoes(consulta["pergunta"], k, modo=modo)
+        tempos.append(time.perf_counter() - inicio)
+        resultados.append(posicoes)
+        artigos = {a for p in posicoes for a in busca.metadados[p].get("artigos") or []}
+        acertos.append(any(a in artigos for a in consulta["artigos"]))
+        if exatos is not None:
+            recalls.append(len(set(posicoes) & set(exatos[len(resultados) - 1])) / k)
+    return {
+        "recall_k": sum(recalls) / len(recalls) if recalls else None,
+        "acerto_k": sum(acertos) / len(acertos),
+        "p50_ms": _percentil(tempos, 50) * 1000,
+        "p95_ms": _percentil(tempos, 95) * 1000
+    }, resultados
+
+def executar(pasta_pdfs="pdfs", arquivo_consultas=ARQUIVO_CONSULTAS, k=4, distratores=0, embeddings_falsos=False):
+    from indice import atualizar_indice, ler_manifesto
+    from busca_hibrida import BuscaHibrida, ler_chunks
+    from servico_embeddings import ServicoEmbeddings
+
+    if embeddings_falsos:
+        from benchmarks.falsos import EmbeddingsFalsos
+        embeddings = ServicoEmbeddings(embeddings=EmbeddingsFalsos())
+    else:
+        embeddings = ServicoEmbeddings()
+    with open(arquivo_consultas, encoding="utf-8") as f:
+        consultas = json.load(f)
+    arquivos_pdf = [os.path.join(pasta_pdfs, a) for a in sorted(os.listdir(pasta_pdfs)) if a.lower().endswith(".pdf")]
+
+    pasta = tempfile.mkdtemp(prefix="bench_busca_")
+    try:
+        atualizar_indice(arquivos_pdf, pasta, embeddings)
+        textos, metadados, vetores = ler_chunks(ler_manifesto(pasta), pasta)
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+    if distratores:
+        extras = gerar_distratores(distratores, vetores.shape[1])
+        vetores = np.vstack([vetores, extras])
+        textos = textos + [""] * distratores
+        metadados = metadados + [{} for _ in range(distratores)]
+
+    consulta_vetores = EmbeddingsPrecalculados({c["pergunta"]: embeddings.embed_query(c["pergunta"]) for c in consultas})
+    resultados = []
+    exatos = None
+    buscas = {}
+    for nome, tipo_ann, modo in CONFIGURACOES:
+        if tipo_ann not in buscas:
+            inicio = time.perf_counter()
+            buscas[tipo_ann] = (BuscaHibrida(textos, metadados, vetores, consulta_vetores, tipo_ann), time.perf_counter() - inicio)
+        busca, tempo_construcao = buscas[tipo_ann]
+        metricas, posicoes = avaliar(busca, consultas, k, modo, exatos if modo == "vetorial" else None)
+        if exatos is None:
+            # A primeira configuração é a busca exata, referência do recall
+            exatos = posicoes
+            metricas["recall_k"] = 1.0
+        resultados.append(dict(configuracao=nome, chunks=len(textos), construcao_s=tempo_construcao, **metricas))
+    return resultados
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recall e latência da busca híbrida contra o índice flat.")
+    parser.add_argument("--pdfs", default="pdfs")
+    parser.add_argument("--consultas", default=ARQUIVO_CONSULTAS)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--distratores", type=int, default=0, help="Vetores aleatórios extras para simular um acervo maior")
+    parser.add_argument("--embeddings-falsos", action="store_true", help="Usa embeddings de hashing em vez do MiniLM")
+    parser.add_argument("--saida", help="Arquivo JSON para salvar os resultados")
+    args = parser.parse_args(argv)
+
+    resultados = executar(args.pdfs, args.consultas, args.k, args.distratores, args.embeddings_falsos)
+    print(f"{'configuração':<20} {'chunks':>8} {'recall@k':>9} {'acerto@k':>9} {'p50 (ms)':>9} {'p95 (ms)':>9} {'construção (s)':>15}")
+    for r in resultados:
+        recall = f"{r['recall_k']:.2f}" if r["recall_k"] is not None else "-"
+        print(
+            f"{r['configuracao']:<20} {r['chunks']:>8} {recall:>9} {r['acerto_k']:>9.2f} "
+            f"{r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['construcao_s']:>15.2f}"
+        )
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+# benchmarks/bench_contexto.py
+# Compara o contexto que vai no prompt do chat antes e depois da divisão por
+# artigos e do empacotamento por orçamento de tokens:
+#   python -m benchmarks.bench_contexto [--pdfs pdfs] [--latencia-token-entrada 0.0005]
+#
+#   antes   RecursiveCharacterTextSplitter (1000/200) + FAISS exato, 4 chunks inteiros
+#   depois  DivisorJuridico + busca híbrida + empacotar() dentro de CONTEXTO_ORCAMENTO_TOKENS
+#
+# Métricas: chunks e caracteres indexados, tokens médios do contexto e do prompt,
+# acerto do artigo esperado (consultas_busca.json) e tempo do turno com o LLM falso,
+# cuja latência cresce com o tamanho do prompt.
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+
+from benchmarks.bench_busca import ARQUIVO_CONSULTAS
+
+def _divisor_antigo():
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    return RecursiveCharacterTextSplitter(
+        chunk_size=1000,
+        chunk_overlap=200,
+        separators=["\n\n", "\n", ".", "!", "?", ";", ",", " "]
+    )
+
+# Busca vetorial exata sobre os chunks da divisão antiga, como o índice FAISS flat de antes
+def montar_busca_antiga(arquivos_pdf, embeddings):
+    from indice import dividir_pdf
+    from busca_hibrida import BuscaHibrida, anotar_metadados
+
+    divisor = _divisor_antigo()
+    chunks = [c for arquivo in arquivos_pdf for c in dividir_pdf(arquivo, divisor)]
+    textos = [c.page_content for c in chunks]
+    metadados = anotar_metadados(textos, [dict(c.metadata) for c in chunks])
+    return BuscaHibrida(textos, metadados, embeddings.embed_documents(textos), embeddings, "flat")
+
+def avaliar(chain, consultas):
+    import assistente
+
+    tokens_contexto, tokens_prompt, acertos, tempos = [], [], [], []
+    for consulta in consultas:
+        inicio = time.perf_counter()
+        resultado = chain.invoke({"input": consulta["pergunta"], "history": ""})
+        tempos.append(time.perf_counter() - inicio)
+        documentos = resultado["context"]
+        tokens_contexto.append(sum(assistente.contar_tokens(d.page_content) for d in documentos))
+        tokens_prompt.append(assistente.tokens_prompt(consulta["pergunta"], "", documentos))
+        artigos = {a for d in documentos for a in d.metadata.get("artigos") or []}
+        acertos.append(any(a in artigos for a in consulta["artigos"]))
+    n = len(consultas)
+    return {
+        "tokens_contexto": sum(tokens_contexto) / n,
+        "tokens_prompt": sum(tokens_prompt) / n,
+        "acerto": sum(acertos) / n,
+        "turno_ms": sum(tempos) / n * 1000
+    }
+
+def executar(pasta_pdfs="pdfs", arquivo_consultas=ARQUIVO_CONSULTAS, latencia_llm=0.05, latencia_token_entrada=0.0005,
+             orcamento_tokens=None):
+    import assistente
+    from indice import atualizar_indice
+    from busca_hibrida import RetrieverHibrido, montar_busca_hibrida
+    from contexto import ORCAMENTO_TOKENS
+    from servico_embeddings import ServicoEmbeddings
+    from benchmarks.falsos import LLMFalso, EmbeddingsFalsos
+
+    orcamento_tokens = orcamento_tokens or ORCAMENTO_TOKENS
+    # Embeddings de hashing: as duas configurações recebem o mesmo modelo, o que importa é a diferença
+    embeddings = ServicoEmbeddings(embeddings=EmbeddingsFalsos())
+    llm = LLMFalso(latencia=latencia_llm, latencia_token_entrada=latencia_token_entrada)
+    with open(arquivo_consultas, encoding="utf-8") as f:
+        consultas = json.load(f)
+    arquivos_pdf = [os.path.join(pasta_pdfs, a) for a in sorted(os.listdir(pasta_pdfs)) if a.lower().endswith(".pdf")]
+
+    pasta = tempfile.mkdtemp(prefix="bench_contexto_")
+    try:
+        atualizar_indice(arquivos_pdf, pasta, embeddings)
+        nova = montar_busca_hibrida(pasta, embeddings)
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+    antiga = montar_busca_antiga(arquivos_pdf, embeddings)
+
+    configuracoes = [
+        ("antes", antiga, RetrieverHibrido(busca=antiga, k=4, modo="vetorial")),
+        ("depois", nova, RetrieverHibrido(busca=nova, k=4, orcamento_tokens=orcamento_tokens))
+    ]
+    resultados = []
+    for nome, busca, retriever in configuracoes:
+        chain = assistente.criar_retrieval_chain(retriever, llm)
+        metricas = avaliar(chain, consultas)
+        resultados.append(dict(
+            configuracao=nome, chunks=len(busca.textos), caracteres=sum(len(t) for t in busca.textos), **metricas
+        ))
+    return resultados
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tokens de contexto e tempo do turno antes e depois do empacotamento.")
+    parser.add_argument("--pdfs", default="pdfs")
+    parser.add_argument("--consultas", default=ARQUIVO_CONSULTAS)
+    parser.add_argument("--latencia-llm", type=float, default=0.05, help="Segundos fixos até o primeiro token do LLM falso")
+    parser.add_argument("--latencia-token-entrada", type=float, default=0.0005, help="Segundos por token do prompt do LLM falso")
+    parser.add_argument("--orcamento", type=int, help="Orçamento de tokens do contexto (padrão: CONTEXTO_ORCAMENTO_TOKENS)")
+    parser.add_argument("--saida", help="Arquivo JSON para salvar os resultados")
+    args = parser.parse_args(argv)
+
+    resultados = executar(args.pdfs, args.consultas, args.latencia_llm, args.latencia_token_entrada, args.orcamento)
+    print(f"{'configuração':<14} {'chunks':>7} {'caracteres':>11} {'tokens contexto':>16} {'tokens prompt':>14} {'acerto':>7} {'turno (ms)':>11}")
+    for r in resultados:
+        print(
+            f"{r['configuracao']:<14} {r['chunks']:>7} {r['caracteres']:>11} {r['tokens_contexto']:>16.0f} "
+            f"{r['tokens_prompt']:>14.0f} {r['acerto']:>7.2f} {r['turno_ms']:>11.1f}"
+        )
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+# benchmarks/bench_pdf.py
+# Tempo e pico de memória da geração de dossiês com 1 a 100 páginas:
+#   python -m benchmarks.bench_pdf [--saida resultado.json]
+
+import re
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+from pdf_dossie import gerar_pdf_conteudo
+
+PAGINAS = (1, 5, 10, 25, 50, 100)
+# Cada parágrafo de ~80 palavras ocupa cerca de 1/6 de página com o estilo padrão
+PARAGRAFOS_POR_PAGINA = 6.3
+
+def gerar_texto(paginas):
+    paragrafo = "Relato dos acontecimentos com datas, locais e pessoas envolvidas. " * 8
+    return "\n\n".join(f"{i + 1}. {paragrafo}" for i in range(max(int(paginas * PARAGRAFOS_POR_PAGINA), 1)))
+
+def contar_paginas(pdf_data):
+    return len(re.findall(rb"/Type /Page[^s]", pdf_data))
+
+def medir(texto, repeticoes=3):
+    gerar_pdf_conteudo(texto)  # aquecimento
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        pdf_data = gerar_pdf_conteudo(texto)
+        tempos.append(time.perf_counter() - inicio)
+    tracemalloc.start()
+    gerar_pdf_conteudo(texto)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "paginas": contar_paginas(pdf_data),
+        "bytes": len(pdf_data),
+        "tempo_s": min(tempos),
+        "pico_memoria_mb": pico / (1024 * 1024)
+    }
+
+def executar(paginas=PAGINAS, repeticoes=3):
+    return [dict(alvo_paginas=p, **medir(gerar_texto(p), repeticoes)) for p in paginas]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark da geração de PDFs de dossiê.")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--saida", help="Arquivo JSON para salvar os resultados")
+    args = parser.parse_args(argv)
+
+    resultados = executar(repeticoes=args.repeticoes)
+    print(f"{'páginas':>8} {'tempo (ms)':>11} {'pico (MB)':>10} {'tamanho (KB)':>13}")
+    for r in resultados:
+        print(f"{r['paginas']:>8} {r['tempo_s'] * 1000:>11.1f} {r['pico_memoria_mb']:>10.2f} {r['bytes'] / 1024:>13.1f}")
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
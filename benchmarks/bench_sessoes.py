@@ -0,0 +1,147 @@
+# benchmarks/bench_sessoes.py
+# Memória por sessão do chat antes e depois do armazém de sessões (sessoes.py):
+#   python -m benchmarks.bench_sessoes [--sessoes 2000] [--turnos 10]
+#
+#   antes     st.session_state de cada sessão: messages (um dicionário por
+#             mensagem) + HistoricoConversa, com deque e dicionários próprios
+#   depois    ArmazemSessoes com todas as sessões em memória (tuplas (papel, texto))
+#   limitado  ArmazemSessoes com SESSOES_MAX_MEMORIA = 10% das sessões; o resto
+#             vai para o SQLite cifrado
+#
+# A memória é medida com tracemalloc (não inclui o cache de páginas do SQLite,
+# que tem tamanho fixo). Para o limitado, mede também o tempo de retomar uma
+# sessão que estava em disco. A retrieval chain é a mesma para todas as sessões
+# nas três configurações e não entra na conta.
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+
+from benchmarks.suite import resumir
+
+PALAVRAS = ("medida", "protetiva", "agressor", "delegacia", "violência", "psicológica", "patrimonial", "juiz",
+            "afastamento", "lar", "boletim", "ocorrência", "filhos", "ameaça", "denúncia", "apoio", "rede", "atendimento")
+
+# Textos diferentes em cada sessão, como em conversas reais (nada é compartilhado entre sessões).
+# As conversas são geradas dentro da medição: só o que a sessão guarda continua alocado.
+def gerar_conversa(semente, turnos, caracteres_pergunta=120, caracteres_resposta=700):
+    aleatorio = random.Random(semente)
+
+    def texto(tamanho):
+        partes = []
+        while sum(len(p) + 1 for p in partes) < tamanho:
+            partes.append(aleatorio.choice(PALAVRAS))
+        return " ".join(partes)
+
+    mensagens = []
+    for _ in range(turnos):
+        mensagens.append(("user", texto(caracteres_pergunta)))
+        mensagens.append(("assistant", texto(caracteres_resposta)))
+    return mensagens
+
+def _medir(construir):
+    tracemalloc.start()
+    inicio = tracemalloc.get_traced_memory()[0]
+    objetos = construir()
+    usado = tracemalloc.get_traced_memory()[0] - inicio
+    tracemalloc.stop()
+    return objetos, usado
+
+def montar_antes(sessoes, turnos):
+    from historico import HistoricoConversa, resumir_por_corte
+    from sessoes import MENSAGEM_INICIAL
+
+    estados = []
+    for i in range(sessoes):
+        estado = {"messages": [{"role": MENSAGEM_INICIAL[0], "content": MENSAGEM_INICIAL[1]}]}
+        estado["historico"] = HistoricoConversa(estado["messages"], resumidor=resumir_por_corte)
+        for papel, texto in gerar_conversa(i, turnos):
+            estado["messages"].append({"role": papel, "content": texto})
+            estado["historico"].adicionar(papel, texto)
+            if papel == "assistant":
+                estado["historico"].compactar()
+        estado["chat_initialized"] = True
+        estados.append(estado)
+    return estados
+
+def montar_depois(armazem, sessoes, turnos):
+    from historico import resumir_por_corte
+
+    for i in range(sessoes):
+        sessao = armazem.obter(f"sessao-{i}")
+        historico = sessao.historico(resumidor=resumir_por_corte)
+        for papel, texto in gerar_conversa(i, turnos):
+            sessao.adicionar(papel, texto)
+            historico.adicionar(papel, texto)
+            if papel == "assistant":
+                historico.compactar()
+        sessao.atualizar_historico(historico)
+        armazem.salvar(sessao)
+    return armazem
+
+def executar(sessoes=2000, turnos=10, fracao_memoria=0.1):
+    from sessoes import ArmazemSessoes
+
+    resultados = []
+    _, usado = _medir(lambda: montar_antes(sessoes, turnos))
+    resultados.append({"configuracao": "antes", "em_memoria": sessoes, "bytes_por_sessao": usado / sessoes})
+
+    pasta = tempfile.mkdtemp(prefix="bench_sessoes_")
+    try:
+        for nome, max_sessoes in (("depois", sessoes), ("limitado", max(int(sessoes * fracao_memoria), 1))):
+            armazem = ArmazemSessoes(max_sessoes=max_sessoes, arquivo=os.path.join(pasta, f"{nome}.sqlite"))
+            _, usado = _medir(lambda: montar_depois(armazem, sessoes, turnos))
+            estatisticas = armazem.estatisticas()
+            resultado = {
+                "configuracao": nome,
+                "em_memoria": estatisticas["em_memoria"],
+                "bytes_por_sessao": usado / sessoes,
+                "estimativa_por_sessao": estatisticas["bytes_por_sessao"],
+                "em_disco": estatisticas["em_disco"],
+                "bytes_disco_por_sessao": estatisticas["bytes_disco"] / estatisticas["em_disco"] if estatisticas["em_disco"] else 0.0
+            }
+            if estatisticas["em_disco"]:
+                # Retoma as sessões mais antigas, que estão em disco
+                tempos = []
+                for i in range(min(200, estatisticas["em_disco"])):
+                    inicio = time.perf_counter()
+                    armazem.obter(f"sessao-{i}")
+                    tempos.append(time.perf_counter() - inicio)
+                resultado["retomada"] = resumir(tempos)
+            armazem.fechar()
+            resultados.append(resultado)
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+    return resultados
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memória por sessão do chat antes e depois do armazém de sessões.")
+    parser.add_argument("--sessoes", type=int, default=2000)
+    parser.add_argument("--turnos", type=int, default=10, help="Perguntas e respostas por sessão")
+    parser.add_argument("--fracao-memoria", type=float, default=0.1, help="Fração das sessões mantida em memória no limitado")
+    parser.add_argument("--saida", help="Arquivo JSON para salvar os resultados")
+    args = parser.parse_args(argv)
+
+    resultados = executar(args.sessoes, args.turnos, args.fracao_memoria)
+    print(f"{args.sessoes} sessões, {args.turnos} turnos cada")
+    print(f"{'configuração':<12} {'em memória':>11} {'KB/sessão':>10} {'estimativa KB':>14} {'em disco':>9} {'KB disco':>9} {'retomada p50':>13}")
+    for r in resultados:
+        retomada = f"{r['retomada']['p50_ms']:.2f} ms" if r.get("retomada") else "-"
+        estimativa = f"{r['estimativa_por_sessao'] / 1024:.1f}" if "estimativa_por_sessao" in r else "-"
+        print(
+            f"{r['configuracao']:<12} {r['em_memoria']:>11} {r['bytes_por_sessao'] / 1024:>10.1f} {estimativa:>14} "
+            f"{r.get('em_disco', 0):>9} {r.get('bytes_disco_por_sessao', 0) / 1024:>9.1f} {retomada:>13}"
+        )
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
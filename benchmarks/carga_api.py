@@ -0,0 +1,162 @@
+# benchmarks/carga_api.py
+# Teste de carga da API (api.py) com o LLM, os embeddings e o Serper falsos
+# de benchmarks/falsos.py, sem rede:
+#   python -m benchmarks.carga_api [--clientes 50] [--duracao 10] [--cenario chat]
+#
+# Cenários:
+#   chat         cada cliente faz perguntas diferentes de todas as outras
+#   chat_unico   todos perguntam a mesma coisa: mostra o agrupamento de requisições
+#   delegacias   busca na base local de delegacias
+#   misto        chat, delegacias e consulta de status alternados
+#
+# Mede requisições por segundo concluídas, latência p50/p95 e respostas 503
+# (backpressure). O cache semântico é desligado para cada pergunta chegar ao LLM.
+
+import sys
+import json
+import time
+import asyncio
+import argparse
+import threading
+
+from benchmarks.suite import Ambiente, PERGUNTAS, ENDERECO, bench_indexacao, criar_retriever, resumir
+
+CENARIOS = ("chat", "chat_unico", "delegacias", "misto")
+
+class ServidorEmThread:
+    """Roda a API em um loop próprio, em outra thread, para o cliente de carga não disputar o mesmo loop."""
+
+    def __init__(self, app):
+        self.app = app
+        self.url = None
+        self._pronto = threading.Event()
+        self._loop = None
+        self._runner = None
+
+    def _executar(self):
+        from aiohttp import web
+
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._runner = web.AppRunner(self.app)
+        self._loop.run_until_complete(self._runner.setup())
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        self._loop.run_until_complete(site.start())
+        porta = self._runner.addresses[0][1]
+        self.url = f"http://127.0.0.1:{porta}"
+        self._pronto.set()
+        self._loop.run_forever()
+
+    def __enter__(self):
+        threading.Thread(target=self._executar, name="api-carga", daemon=True).start()
+        self._pronto.wait()
+        return self
+
+    def __exit__(self, *exc):
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        return False
+
+async def _requisicao(sessao, url, cenario, cliente, i):
+    if cenario == "misto":
+        cenario = ("chat", "delegacias", "saude")[i % 3]
+    if cenario in ("chat", "chat_unico"):
+        pergunta = PERGUNTAS[0] if cenario == "chat_unico" else f"{PERGUNTAS[(cliente + i) % len(PERGUNTAS)]} ({cliente}.{i})"
+        async with sessao.post(url + "/chat", json={"pergunta": pergunta, "history": "", "mensagens": []}) as resposta:
+            linhas = [json.loads(l) async for l in resposta.content if l.strip()]
+            if resposta.status == 200 and any("erro" in l for l in linhas):
+                return 500
+            return resposta.status
+    if cenario == "delegacias":
+        async with sessao.post(url + "/delegacias", json={"endereco": ENDERECO}) as resposta:
+            await resposta.read()
+            return resposta.status
+    async with sessao.get(url + "/saude") as resposta:
+        await resposta.read()
+        return resposta.status
+
+async def _carga(url, clientes, duracao, cenario):
+    import aiohttp
+
+    tempos, status = [], {}
+    fim = time.perf_counter() + duracao
+
+    async def cliente(numero, sessao):
+        i = 0
+        while time.perf_counter() < fim:
+            inicio = time.perf_counter()
+            codigo = await _requisicao(sessao, url, cenario, numero, i)
+            status[codigo] = status.get(codigo, 0) + 1
+            if codigo == 200:
+                tempos.append(time.perf_counter() - inicio)
+            elif codigo == 503:
+                # Backpressure: o cliente espera um pouco antes de tentar de novo
+                await asyncio.sleep(0.05)
+            i += 1
+
+    conector = aiohttp.TCPConnector(limit=clientes)
+    timeout = aiohttp.ClientTimeout(total=120)
+    async with aiohttp.ClientSession(connector=conector, timeout=timeout) as sessao:
+        inicio = time.perf_counter()
+        await asyncio.gather(*(cliente(n, sessao) for n in range(clientes)))
+        decorrido = time.perf_counter() - inicio
+        async with sessao.get(url + "/saude") as resposta:
+            saude = await resposta.json()
+    return tempos, status, decorrido, saude
+
+def executar(clientes=50, duracao=10.0, cenario="misto", latencia_llm=0.2, latencia_token=0.002, tokens_saida=120, max_chat=None):
+    import assistente
+    from api import API_MAX_CHAT, Servico, criar_app
+    from cache_respostas import CacheSemantico
+
+    with Ambiente(latencia_llm, latencia_token, tokens_saida, 0.01) as ambiente:
+        bench_indexacao(ambiente, 1)
+        chain = assistente.criar_retrieval_chain(criar_retriever(ambiente), ambiente.llm)
+        original = assistente.get_cache_respostas
+        # Limiar acima de 1: o cache semântico nunca acerta
+        cache = CacheSemantico(ambiente.embeddings, limiar=2.0)
+        assistente.get_cache_respostas = lambda: cache
+        try:
+            with ServidorEmThread(criar_app(Servico(obter_chain=lambda: chain, max_chat=max_chat or API_MAX_CHAT), aquecer=False)) as servidor:
+                tempos, status, decorrido, saude = asyncio.run(_carga(servidor.url, clientes, duracao, cenario))
+        finally:
+            assistente.get_cache_respostas = original
+
+    return {
+        "cenario": cenario,
+        "clientes": clientes,
+        "requisicoes_por_segundo": len(tempos) / decorrido,
+        "latencia": resumir(tempos) if tempos else None,
+        "status": status,
+        "chat": saude["chat"]
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga da API com LLM e embeddings falsos.")
+    parser.add_argument("--clientes", type=int, default=50)
+    parser.add_argument("--duracao", type=float, default=10.0, help="Segundos de carga")
+    parser.add_argument("--cenario", choices=CENARIOS, default="misto")
+    parser.add_argument("--latencia-llm", type=float, default=0.2)
+    parser.add_argument("--latencia-token", type=float, default=0.002)
+    parser.add_argument("--tokens-saida", type=int, default=120)
+    parser.add_argument("--max-chat", type=int, help="Respostas simultâneas no servidor (padrão: API_MAX_CHAT)")
+    parser.add_argument("--saida", help="Arquivo JSON para salvar o resultado")
+    args = parser.parse_args(argv)
+
+    resultado = executar(args.clientes, args.duracao, args.cenario, args.latencia_llm, args.latencia_token, args.tokens_saida,
+                         args.max_chat)
+    latencia = resultado["latencia"] or {}
+    print(f"cenário {resultado['cenario']}, {resultado['clientes']} clientes")
+    print(f"  requisições/s concluídas: {resultado['requisicoes_por_segundo']:.1f}")
+    if latencia:
+        print(f"  latência p50 {latencia['p50_ms']:.0f} ms, p95 {latencia['p95_ms']:.0f} ms")
+    print(f"  status: {resultado['status']}")
+    print(f"  chat: {resultado['chat']['requisicoes']} requisições, {resultado['chat']['agrupadas']} agrupadas, "
+          f"{resultado['chat']['recusadas']} recusadas (503)")
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
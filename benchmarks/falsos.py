@@ -0,0 +1,117 @@
+# benchmarks/falsos.py
+# Substitutos determinísticos do LLM e do modelo de embeddings, para medir
+# desempenho sem rede e sem baixar modelos.
+
+import re
+import json
+import time
+import hashlib
+from typing import Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from historico import contar_tokens
+
+VOCABULARIO = (
+    "a lei maria da penha prevê medidas protetivas de urgência para a vítima de violência "
+    "doméstica e familiar como o afastamento do agressor do lar e a proibição de contato "
+    "procure a delegacia de defesa da mulher ou ligue 180 para orientação"
+).split()
+
+# Resposta no formato que os agentes do crewai reconhecem como final
+PREFIXO_CREW = "Thought: I now can give a great answer\nFinal Answer: "
+# Resultado de ferramenta já devolvido ao agente (ignora o exemplo das instruções de formato)
+_OBSERVACAO = re.compile(r"Observation:(?! the result of the action)")
+
+class LLMFalso(BaseChatModel):
+    """
+    Chat model determinístico: a mesma entrada sempre gera a mesma saída.
+
+    Parâmetros:
+    latencia (float): Segundos até o primeiro token.
+    latencia_token (float): Segundos entre tokens.
+    latencia_token_entrada (float): Segundos por token do prompt, somados à
+        latência do primeiro token (custo de processar o prompt).
+    tokens_saida (int): Quantidade de palavras na resposta.
+    acao_ferramenta (dict): {"nome": ..., "entrada": {...}} para, quando o agente
+        tiver essa ferramenta, chamá-la uma vez antes da resposta final.
+    """
+
+    latencia: float = 0.05
+    latencia_token: float = 0.0
+    latencia_token_entrada: float = 0.0
+    tokens_saida: int = 120
+    acao_ferramenta: Optional[dict] = None
+
+    @property
+    def _llm_type(self):
+        return "llm-falso"
+
+    def _prompt(self, messages):
+        return "\n".join(str(m.content) for m in messages)
+
+    def _palavras(self, prompt):
+        semente = int.from_bytes(hashlib.sha256(prompt.encode("utf-8")).digest()[:8], "big")
+        return [VOCABULARIO[(semente + i * 7919) % len(VOCABULARIO)] for i in range(self.tokens_saida)]
+
+    # Texto completo da resposta: uma ação de ferramenta (se pendente) ou a resposta final
+    def _resposta(self, prompt):
+        acao = self.acao_ferramenta
+        if acao and f"[{acao['nome']}" in prompt and not _OBSERVACAO.search(prompt):
+            return (
+                "Thought: preciso consultar a ferramenta\n"
+                f"Action: {acao['nome']}\n"
+                f"Action Input: {json.dumps(acao['entrada'], ensure_ascii=False)}"
+            )
+        return PREFIXO_CREW + " ".join(self._palavras(prompt))
+
+    def _latencia_inicial(self, prompt):
+        return self.latencia + self.latencia_token_entrada * contar_tokens(prompt)
+
+    def _uso(self, prompt):
+        entrada = contar_tokens(prompt)
+        return {"input_tokens": entrada, "output_tokens": self.tokens_saida, "total_tokens": entrada + self.tokens_saida}
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt = self._prompt(messages)
+        time.sleep(self._latencia_inicial(prompt) + self.latencia_token * self.tokens_saida)
+        uso = self._uso(prompt)
+        mensagem = AIMessage(content=self._resposta(prompt), usage_metadata=uso)
+        token_usage = {"prompt_tokens": uso["input_tokens"], "completion_tokens": uso["output_tokens"], "total_tokens": uso["total_tokens"]}
+        return ChatResult(generations=[ChatGeneration(message=mensagem)], llm_output={"token_usage": token_usage, "model_name": "llm-falso"})
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt = self._prompt(messages)
+        time.sleep(self._latencia_inicial(prompt))
+        pedacos = re.findall(r"\S+\s*", self._resposta(prompt))
+        for i, pedaco in enumerate(pedacos, start=1):
+            if self.latencia_token:
+                time.sleep(self.latencia_token)
+            # Como o ChatGroq, o uso de tokens vem no último pedaço
+            uso = self._uso(prompt) if i == len(pedacos) else None
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=pedaco, usage_metadata=uso))
+            if run_manager:
+                run_manager.on_llm_new_token(pedaco, chunk=chunk)
+            yield chunk
+
+class EmbeddingsFalsos(Embeddings):
+    """Embeddings por hashing de palavras: determinísticos, normalizados e sem modelo."""
+
+    def __init__(self, dimensao=384):
+        self.dimensao = dimensao
+
+    def _vetor(self, texto):
+        vetor = np.zeros(self.dimensao, dtype="float32")
+        for palavra in re.findall(r"\w+", texto.lower()):
+            h = int.from_bytes(hashlib.md5(palavra.encode("utf-8")).digest()[:4], "little")
+            vetor[h % self.dimensao] += 1.0 if h & (1 << 31) else -1.0
+        norma = np.linalg.norm(vetor)
+        return (vetor / norma if norma else vetor).tolist()
+
+    def embed_documents(self, texts):
+        return [self._vetor(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._vetor(text)
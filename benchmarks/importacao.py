@@ -0,0 +1,112 @@
+# benchmarks/importacao.py
+# Tempo de importação de cada parte do app, medido com `python -X importtime`
+# em processos novos, comparado com o orçamento em orcamento_importacao.json:
+#   python -m benchmarks.importacao                 (termina com código 1 se estourar)
+#   python -m benchmarks.importacao --atualizar     (grava o orçamento a partir da medição)
+#
+# O grupo "app" são os imports do topo de app.py, ou seja, o que a primeira
+# página paga antes de aparecer.
+
+import os
+import re
+import ast
+import sys
+import json
+import argparse
+import subprocess
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ARQUIVO_ORCAMENTO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "orcamento_importacao.json")
+# Folga sobre a medição ao gravar um novo orçamento
+FOLGA = 1.3
+# Folga mínima, para grupos rápidos não falharem por ruído
+FOLGA_MINIMA_MS = 50
+
+GRUPOS = {
+    "localizar": ["delegacias"],
+    "denuncia": ["tarefas", "pdf_dossie"],
+    "chat": ["assistente"],
+    "crews": ["utils", "crewai", "crewai_tools", "langchain_groq"]
+}
+
+_LINHA = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+# Módulos importados no nível de topo de app.py
+def imports_do_app(caminho=os.path.join(RAIZ, "app.py")):
+    with open(caminho, encoding="utf-8") as f:
+        arvore = ast.parse(f.read())
+    modulos = []
+    for no in arvore.body:
+        if isinstance(no, ast.Import):
+            modulos.extend(alias.name for alias in no.names)
+        elif isinstance(no, ast.ImportFrom) and no.module:
+            modulos.append(no.module)
+    return list(dict.fromkeys(modulos))
+
+def _importtime(codigo):
+    processo = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", codigo],
+        cwd=RAIZ, capture_output=True, text=True, env=dict(os.environ, PYTHONPATH=RAIZ)
+    )
+    if processo.returncode != 0:
+        raise RuntimeError(f"Falha ao executar {codigo!r}:\n{processo.stderr[-2000:]}")
+    primeiro_nivel = []
+    for linha in processo.stderr.splitlines():
+        encontrado = _LINHA.match(linha)
+        if encontrado and len(encontrado.group(3)) == 1:
+            primeiro_nivel.append((encontrado.group(4), int(encontrado.group(2)) / 1000))
+    return primeiro_nivel
+
+# Módulos que o próprio interpretador carrega ao iniciar (site, encodings...)
+_INICIALIZACAO = None
+
+# Devolve (total em ms, [(módulo, ms acumulado)] dos imports de primeiro nível)
+def medir(modulos):
+    global _INICIALIZACAO
+    if _INICIALIZACAO is None:
+        _INICIALIZACAO = {modulo for modulo, _ in _importtime("pass")}
+    primeiro_nivel = [(m, ms) for m, ms in _importtime("import " + ", ".join(modulos)) if m not in _INICIALIZACAO]
+    return sum(ms for _, ms in primeiro_nivel), primeiro_nivel
+
+# Menor tempo entre algumas execuções, para reduzir o ruído do disco e do SO
+def medir_grupo(modulos, repeticoes=3):
+    return min((medir(modulos) for _ in range(repeticoes)), key=lambda r: r[0])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Orçamento de tempo de importação do app.")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--orcamento", default=ARQUIVO_ORCAMENTO)
+    parser.add_argument("--atualizar", action="store_true", help="Grava o orçamento a partir desta medição")
+    parser.add_argument("--detalhes", type=int, default=5, help="Quantos módulos mais lentos mostrar por grupo")
+    args = parser.parse_args(argv)
+
+    grupos = dict(app=imports_do_app(), **GRUPOS)
+    orcamento = {}
+    if os.path.exists(args.orcamento):
+        with open(args.orcamento, encoding="utf-8") as f:
+            orcamento = json.load(f)
+
+    medidos = {}
+    estourados = []
+    print(f"{'grupo':<12} {'importação (ms)':>16} {'orçamento (ms)':>15}")
+    for nome, modulos in grupos.items():
+        total, primeiro_nivel = medir_grupo(modulos, args.repeticoes)
+        medidos[nome] = total
+        limite = orcamento.get(nome)
+        estourou = limite is not None and total > limite
+        if estourou:
+            estourados.append(nome)
+        print(f"{nome:<12} {total:>16.0f} {limite if limite is not None else '-':>15}{'  <- acima do orçamento' if estourou else ''}")
+        for modulo, ms in sorted(primeiro_nivel, key=lambda m: -m[1])[:args.detalhes]:
+            print(f"    {modulo:<40} {ms:>8.0f}")
+
+    if args.atualizar:
+        with open(args.orcamento, "w", encoding="utf-8") as f:
+            json.dump({nome: round(max(total * FOLGA, total + FOLGA_MINIMA_MS)) for nome, total in medidos.items()}, f, indent=2)
+            f.write("\n")
+        print(f"Orçamento gravado em {args.orcamento}")
+        return 0
+    return 1 if estourados else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,347 @@
+# benchmarks/suite.py
+# Benchmarks de ponta a ponta sem rede: o Groq é trocado por um LLM falso com
+# latência configurável, o modelo de embeddings por embeddings de hashing e o
+# Serper por um servidor local.
+#
+#   python -m benchmarks.suite --saida base.json
+#   python -m benchmarks.suite --comparar base.json --tolerancia 0.2
+#
+# Com --comparar, o processo termina com código 1 se o p50 de algum caso
+# ficar mais lento que a base além da tolerância.
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+from datetime import datetime
+
+# O crewai tenta enviar telemetria na importação; sem rede isso só atrasa
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+
+PERGUNTAS = [
+    "O que é a Lei Maria da Penha?",
+    "Quais são as medidas protetivas de urgência?",
+    "Como faço para denunciar uma agressão?",
+    "O que caracteriza violência psicológica?",
+    "Quais são as fases de um relacionamento abusivo?",
+    "A vítima pode pedir o afastamento do agressor do lar?",
+    "Onde fica a delegacia de defesa da mulher mais próxima?",
+    "O que acontece depois de registrar o boletim de ocorrência?"
+]
+RELATO = (
+    "Meu companheiro grita comigo todos os dias, controla meu celular e já me empurrou "
+    "contra a parede na frente dos nossos filhos. Tenho medo de sair de casa."
+)
+ENDERECO = "Rua MMDC, 80, Butantã, São Paulo"
+DOCUMENTOS_SINTETICOS = 4
+PAGINAS_POR_DOCUMENTO = 10
+TURNOS_HISTORICO_LONGO = 120
+
+def _percentil(valores_ordenados, p):
+    posicao = max(int(round(p / 100 * len(valores_ordenados) + 0.5)) - 1, 0)
+    return valores_ordenados[min(posicao, len(valores_ordenados) - 1)]
+
+def resumir(tempos):
+    ordenados = sorted(tempos)
+    return {
+        "n": len(ordenados),
+        "p50_ms": _percentil(ordenados, 50) * 1000,
+        "p95_ms": _percentil(ordenados, 95) * 1000,
+        "media_ms": sum(ordenados) / len(ordenados) * 1000,
+        "min_ms": ordenados[0] * 1000
+    }
+
+def cronometrar(funcao, repeticoes, preparar=None):
+    tempos = []
+    for i in range(repeticoes):
+        if preparar:
+            preparar(i)
+        inicio = time.perf_counter()
+        funcao(i)
+        tempos.append(time.perf_counter() - inicio)
+    return tempos
+
+# PDFs com texto jurídico repetido, gerados pelo próprio gerador de dossiês
+def gerar_pdfs_sinteticos(pasta, quantidade=DOCUMENTOS_SINTETICOS, paginas=PAGINAS_POR_DOCUMENTO):
+    from pdf_dossie import gerar_pdf_conteudo
+    from benchmarks.bench_pdf import gerar_texto
+
+    arquivos = []
+    for i in range(quantidade):
+        caminho = os.path.join(pasta, f"documento_{i + 1}.pdf")
+        with open(caminho, "wb") as f:
+            f.write(gerar_pdf_conteudo(f"Art. {i + 1}. " + gerar_texto(paginas), titulo=f"Documento {i + 1}"))
+        arquivos.append(caminho)
+    return arquivos
+
+# Conversa com muitos turnos, acima do limite de tokens de um relatório em uma passada só
+def gerar_historico_longo(turnos=TURNOS_HISTORICO_LONGO):
+    linhas = []
+    for i in range(turnos):
+        linhas.append(f"USER: ({i + 1}) {RELATO}")
+        linhas.append(f"ASSISTANT: Sinto muito pelo que você está passando. {PERGUNTAS[i % len(PERGUNTAS)]}")
+    return "\n".join(linhas)
+
+class Ambiente:
+    """Instala os substitutos nos módulos do app e desfaz tudo ao sair."""
+
+    def __init__(self, latencia_llm, latencia_token, tokens_saida, latencia_serper, latencia_token_entrada=0.0):
+        self.latencia_llm = latencia_llm
+        self.latencia_token = latencia_token
+        self.latencia_token_entrada = latencia_token_entrada
+        self.tokens_saida = tokens_saida
+        self.latencia_serper = latencia_serper
+
+    def __enter__(self):
+        import utils
+        import assistente
+        import servico_embeddings
+        from benchmarks.falsos import LLMFalso, EmbeddingsFalsos
+        from servico_embeddings import ServicoEmbeddings
+        from servidores_locais import ServidorSerperLocal
+
+        self.pasta = tempfile.mkdtemp(prefix="bench_")
+        self.llm = LLMFalso(
+            latencia=self.latencia_llm,
+            latencia_token=self.latencia_token,
+            latencia_token_entrada=self.latencia_token_entrada,
+            tokens_saida=self.tokens_saida,
+            acao_ferramenta={"nome": "buscar_delegacias_proximas", "entrada": {"endereco_busca": ENDERECO}}
+        )
+        self.embeddings = ServicoEmbeddings(embeddings=EmbeddingsFalsos())
+        self.servidor = ServidorSerperLocal(latencia=self.latencia_serper).__enter__()
+
+        self._originais = [
+            (utils, "get_llm", utils.get_llm),
+            (assistente, "get_llm", assistente.get_llm),
+            (servico_embeddings, "_servico", servico_embeddings._servico)
+        ]
+        utils.get_llm = assistente.get_llm = lambda: self.llm
+        servico_embeddings._servico = self.embeddings
+        self._serper_url = os.environ.get("SERPER_URL")
+        os.environ["SERPER_URL"] = self.servidor.url
+        return self
+
+    def __exit__(self, *exc):
+        for modulo, nome, valor in self._originais:
+            setattr(modulo, nome, valor)
+        if self._serper_url is None:
+            os.environ.pop("SERPER_URL", None)
+        else:
+            os.environ["SERPER_URL"] = self._serper_url
+        self.servidor.__exit__(*exc)
+        shutil.rmtree(self.pasta, ignore_errors=True)
+        return False
+
+def bench_indexacao(ambiente, repeticoes):
+    from indice import atualizar_indice
+    from busca_hibrida import montar_busca_hibrida
+
+    pasta_pdfs = os.path.join(ambiente.pasta, "pdfs")
+    os.makedirs(pasta_pdfs, exist_ok=True)
+    arquivos = gerar_pdfs_sinteticos(pasta_pdfs)
+    pasta_indice = lambda i: os.path.join(ambiente.pasta, f"indice_{i}")
+
+    completa = cronometrar(lambda i: atualizar_indice(arquivos, pasta_indice(i), ambiente.embeddings), repeticoes)
+    # Mesmos PDFs de novo: só lê o manifesto e abre o índice salvo
+    sem_mudancas = cronometrar(lambda i: atualizar_indice(arquivos, pasta_indice(0), ambiente.embeddings), repeticoes)
+    ambiente.arquivos_indexados = arquivos
+    ambiente.vectors = atualizar_indice(arquivos, pasta_indice(0), ambiente.embeddings)
+    ambiente.busca = montar_busca_hibrida(pasta_indice(0), ambiente.embeddings)
+    return {"indexacao_completa": completa, "indexacao_sem_mudancas": sem_mudancas}
+
+# O mesmo retriever que o app usa, conforme BUSCA_HIBRIDA
+def criar_retriever(ambiente):
+    import assistente
+    from busca_hibrida import RetrieverHibrido
+    from contexto import ORCAMENTO_TOKENS
+
+    if assistente.BUSCA_HIBRIDA:
+        return RetrieverHibrido(busca=ambiente.busca, k=4, orcamento_tokens=ORCAMENTO_TOKENS or None)
+    return ambiente.vectors.as_retriever(search_kwargs={"k": 4})
+
+def bench_recuperacao(ambiente, repeticoes):
+    from busca_hibrida import RetrieverHibrido
+    from contexto import ORCAMENTO_TOKENS
+
+    resultados = {}
+    retrievers = {
+        "recuperacao_flat": ambiente.vectors.as_retriever(search_kwargs={"k": 4}),
+        "recuperacao_hibrida": RetrieverHibrido(busca=ambiente.busca, k=4),
+        "recuperacao_contexto": RetrieverHibrido(busca=ambiente.busca, k=4, orcamento_tokens=ORCAMENTO_TOKENS or None)
+    }
+    for nome, retriever in retrievers.items():
+        resultados[nome] = cronometrar(lambda i: retriever.invoke(PERGUNTAS[i % len(PERGUNTAS)]), repeticoes * len(PERGUNTAS))
+    return resultados
+
+def bench_chat(ambiente, repeticoes):
+    import assistente
+    from cache_respostas import CacheSemantico
+
+    chain = assistente.criar_retrieval_chain(criar_retriever(ambiente), ambiente.llm)
+    cache = CacheSemantico(ambiente.embeddings)
+    original = assistente.get_cache_respostas
+    assistente.get_cache_respostas = lambda: cache
+    primeiro_token = []
+
+    def turno(pergunta):
+        gerador, info = assistente.responder_pergunta_stream(chain, pergunta, "", [])
+        "".join(gerador)
+        return info
+
+    def turno_sem_cache(i):
+        primeiro_token.append(turno(PERGUNTAS[i % len(PERGUNTAS)])["tempo_primeiro_token"])
+
+    try:
+        sem_cache = cronometrar(turno_sem_cache, repeticoes, preparar=lambda i: cache.limpar())
+        # A mesma pergunta repetida é respondida pelo cache semântico
+        turno(PERGUNTAS[0])
+        com_cache = cronometrar(lambda i: turno(PERGUNTAS[0]), repeticoes)
+    finally:
+        assistente.get_cache_respostas = original
+    return {"chat_turno": sem_cache, "chat_primeiro_token": primeiro_token, "chat_turno_cache": com_cache}
+
+def bench_crews(ambiente, repeticoes):
+    import utils
+    from cache_llm import CacheLLM, LLMComCache
+    from serper import cache_locais
+
+    historico = f"user: {RELATO}\nassistant: Sinto muito pelo que você está passando."
+    historico_longo = gerar_historico_longo()
+
+    # Caminho antigo: o histórico longo inteiro passa pelos dois agentes
+    def relatorio_inteiro(i):
+        limite = utils.LIMITE_TOKENS_HISTORICO
+        utils.LIMITE_TOKENS_HISTORICO = float("inf")
+        try:
+            utils.executar_crew_relatorio(historico_longo)
+        finally:
+            utils.LIMITE_TOKENS_HISTORICO = limite
+
+    # Mesmo relatório gerado de novo (rerun do Streamlit) com o cache em disco do LLM
+    def relatorio_com_cache(i):
+        llm_original = utils.get_llm
+        utils.get_llm = lambda: llm_com_cache
+        try:
+            utils.executar_crew_relatorio(historico)
+        finally:
+            utils.get_llm = llm_original
+
+    llm_com_cache = LLMComCache(modelo=ambiente.llm, cache_disco=CacheLLM(os.path.join(ambiente.pasta, "cache_llm.sqlite")))
+    relatorio_com_cache(0)
+
+    casos = {
+        # O cache do Serper é limpo para cada execução passar pelo servidor local
+        "crew_localizacao": (lambda i: utils.executar_crew_localizacao(ENDERECO), lambda i: cache_locais.limpar()),
+        "crew_denuncia": (lambda i: utils.executar_crew_denuncia("Maria", RELATO), None),
+        "crew_relatorio": (lambda i: utils.executar_crew_relatorio(historico), None),
+        "crew_relatorio_cache_llm": (relatorio_com_cache, None),
+        "crew_relatorio_longo": (lambda i: utils.executar_crew_relatorio(historico_longo), None),
+        "crew_relatorio_longo_inteiro": (relatorio_inteiro, None)
+    }
+    return {nome: cronometrar(funcao, repeticoes, preparar) for nome, (funcao, preparar) in casos.items()}
+
+def bench_pdf(ambiente, repeticoes):
+    from pdf_dossie import gerar_pdf_conteudo
+    from benchmarks.bench_pdf import gerar_texto
+
+    resultados = {}
+    for paginas in (1, 10, 50):
+        texto = gerar_texto(paginas)
+        resultados[f"pdf_{paginas}_paginas"] = cronometrar(lambda i: gerar_pdf_conteudo(texto), repeticoes)
+    return resultados
+
+GRUPOS = {
+    "indexacao": bench_indexacao,
+    "recuperacao": bench_recuperacao,
+    "chat": bench_chat,
+    "crews": bench_crews,
+    "pdf": bench_pdf
+}
+# Recuperação e chat usam o índice montado pela indexação
+DEPENDENCIAS = {"recuperacao": "indexacao", "chat": "indexacao"}
+
+def executar(grupos=tuple(GRUPOS), repeticoes=5, latencia_llm=0.05, latencia_token=0.0, tokens_saida=120, latencia_serper=0.01,
+             latencia_token_entrada=0.0):
+    grupos = list(grupos)
+    for grupo in list(grupos):
+        dependencia = DEPENDENCIAS.get(grupo)
+        if dependencia and dependencia not in grupos:
+            grupos.insert(0, dependencia)
+    parametros = {
+        "repeticoes": repeticoes, "latencia_llm": latencia_llm, "latencia_token": latencia_token,
+        "tokens_saida": tokens_saida, "latencia_serper": latencia_serper, "latencia_token_entrada": latencia_token_entrada
+    }
+    casos = {}
+    with Ambiente(latencia_llm, latencia_token, tokens_saida, latencia_serper, latencia_token_entrada) as ambiente:
+        for grupo in GRUPOS:
+            if grupo in grupos:
+                casos.update({nome: resumir(tempos) for nome, tempos in GRUPOS[grupo](ambiente, repeticoes).items()})
+    return {
+        "meta": {
+            "data": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "parametros": parametros
+        },
+        "casos": casos
+    }
+
+# Devolve [(caso, p50 base, p50 atual, variação)] e a lista de casos que regrediram
+def comparar(base, atual, tolerancia):
+    linhas = []
+    regressoes = []
+    for nome, medida in atual["casos"].items():
+        anterior = base["casos"].get(nome)
+        if anterior is None:
+            continue
+        variacao = medida["p50_ms"] / anterior["p50_ms"] - 1 if anterior["p50_ms"] else 0.0
+        linhas.append((nome, anterior["p50_ms"], medida["p50_ms"], variacao))
+        if variacao > tolerancia:
+            regressoes.append(nome)
+    return linhas, regressoes
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks offline do app (LLM, embeddings e Serper substituídos).")
+    parser.add_argument("--grupos", nargs="+", choices=list(GRUPOS), default=list(GRUPOS))
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--latencia-llm", type=float, default=0.05, help="Segundos até o primeiro token do LLM falso")
+    parser.add_argument("--latencia-token", type=float, default=0.0, help="Segundos entre tokens do LLM falso")
+    parser.add_argument("--latencia-token-entrada", type=float, default=0.0, help="Segundos por token do prompt do LLM falso")
+    parser.add_argument("--tokens-saida", type=int, default=120, help="Tamanho das respostas do LLM falso")
+    parser.add_argument("--latencia-serper", type=float, default=0.01, help="Atraso do Serper local em segundos")
+    parser.add_argument("--saida", help="Arquivo JSON para salvar os resultados")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="Piora máxima aceita no p50 (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    resultado = executar(
+        args.grupos, args.repeticoes, args.latencia_llm, args.latencia_token, args.tokens_saida, args.latencia_serper,
+        args.latencia_token_entrada
+    )
+    print(f"{'caso':<28} {'n':>4} {'p50 (ms)':>10} {'p95 (ms)':>10} {'média (ms)':>11}")
+    for nome, m in resultado["casos"].items():
+        print(f"{nome:<28} {m['n']:>4} {m['p50_ms']:>10.1f} {m['p95_ms']:>10.1f} {m['media_ms']:>11.1f}")
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+
+    if not args.comparar:
+        return 0
+    with open(args.comparar, encoding="utf-8") as f:
+        base = json.load(f)
+    if base["meta"]["parametros"] != resultado["meta"]["parametros"]:
+        print("Aviso: a base foi medida com outros parâmetros; a comparação pode não ser justa.")
+    linhas, regressoes = comparar(base, resultado, args.tolerancia)
+    print(f"\n{'caso':<28} {'base (ms)':>10} {'atual (ms)':>11} {'variação':>9}")
+    for nome, anterior, atual, variacao in linhas:
+        marca = "  <- regressão" if nome in regressoes else ""
+        print(f"{nome:<28} {anterior:>10.1f} {atual:>11.1f} {variacao:>+9.1%}{marca}")
+    return 1 if regressoes else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
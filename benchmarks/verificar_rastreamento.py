@@ -0,0 +1,56 @@
+# benchmarks/verificar_rastreamento.py
+# Confere que um crew executado com o LLM montado como em get_llm() (cache em
+# disco + handler de rastreamento) registra spans de LLM com tokens:
+#   python -m benchmarks.verificar_rastreamento
+#
+# Sai com código 1 se algum crew não registrar chamadas de LLM ou tokens. O
+# crewai mexe nos callbacks do LLM de cada Agent, e foi assim que o
+# rastreamento das chamadas de LLM já se perdeu sem nenhum erro aparente.
+
+import os
+import sys
+
+from benchmarks.suite import Ambiente, RELATO
+
+def executar(execucoes=2):
+    import utils
+    import rastreamento
+    from cache_llm import CacheLLM, com_cache
+
+    resultados = []
+    with Ambiente(latencia_llm=0.0, latencia_token=0.0, tokens_saida=40, latencia_serper=0.0) as ambiente:
+        # Cache vazio: respostas vindas do cache não informam tokens
+        cache = CacheLLM(os.path.join(ambiente.pasta, "cache_llm.sqlite"))
+        llm = com_cache(ambiente.llm, cache=cache, callbacks=[rastreamento.handler()])
+        get_llm = utils.get_llm
+        utils.get_llm = lambda: llm
+        rastreamento.configurar()
+        try:
+            # Mais de uma execução: o handler se perdia a partir da primeira cópia do modelo de crew
+            for i in range(execucoes):
+                antes = rastreamento.metricas().get(f"llm:{llm.model_name}", {"n": 0, "tokens": 0})
+                utils.executar_crew_denuncia("Maria", f"{RELATO} ({i + 1})")
+                depois = rastreamento.metricas().get(f"llm:{llm.model_name}", {"n": 0, "tokens": 0})
+                resultados.append({
+                    "execucao": i + 1,
+                    "chamadas_llm": depois["n"] - antes["n"],
+                    "tokens": depois["tokens"] - antes["tokens"],
+                    "handler_no_llm": rastreamento.handler() in llm.callbacks
+                })
+        finally:
+            rastreamento.desativar()
+            utils.get_llm = get_llm
+    return resultados
+
+def main(argv=None):
+    resultados = executar()
+    falhou = False
+    for r in resultados:
+        ok = r["chamadas_llm"] > 0 and r["tokens"] > 0 and r["handler_no_llm"]
+        falhou = falhou or not ok
+        print(f"execução {r['execucao']}: {r['chamadas_llm']} chamadas de LLM, {r['tokens']} tokens, "
+              f"handler no LLM: {'sim' if r['handler_no_llm'] else 'não'} -> {'ok' if ok else 'FALHOU'}")
+    return 1 if falhou else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,389 @@
+# busca_hibrida.py
+# Busca híbrida: índice invertido BM25 (acerta referências exatas como
+# "art. 22" ou "inciso III") combinado com um índice vetorial aproximado
+# (HNSW ou IVF do FAISS), com fusão por Reciprocal Rank Fusion e filtros
+# por PDF de origem, lei e artigo.
+#
+# É montada a partir das entradas do manifesto do índice incremental (chunks
+# e vetores já calculados) e salva em <pasta do índice>/hibrido. Os vetores
+# ficam só no índice vetorial, no FORMATO_VETORES (float16/int8 ocupam metade
+# ou um quarto), aberto com mmap quando INDICE_MMAP está ligado.
+
+import os
+import re
+import math
+import heapq
+import pickle
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Any, Optional
+import faiss
+import numpy as np
+import streamlit as st
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from contexto import empacotar, ORCAMENTO_TOKENS as ORCAMENTO_CONTEXTO, CANDIDATOS as CANDIDATOS_CONTEXTO
+from divisao import CABECALHO_ARTIGO, CABECALHO_LEI, normalizar_artigo, artigo_do_cabecalho
+from indice import (
+    PASTA_INDICE, FORMATO_VETORES, QUANTIZACAO, INDICE_MMAP, ler_manifesto, ler_entrada, ler_index_faiss,
+    atualizar_indice, calcular_hash_pdfs, get_embeddings
+)
+
+# Índice vetorial: flat (busca exata), hnsw ou ivf
+TIPO_ANN = os.environ.get("BUSCA_ANN", "hnsw")
+HNSW_M = 32
+HNSW_EF_CONSTRUCAO = 80
+HNSW_EF_BUSCA = int(os.environ.get("BUSCA_HNSW_EF", "64"))
+IVF_NPROBE = int(os.environ.get("BUSCA_IVF_NPROBE", "8"))
+# Peso de cada lista na fusão; RRF_K suaviza a diferença entre as primeiras posições.
+# Os padrões são os do RRF sem ajuste (pesos iguais, k=60). Para mudá-los, ajuste com
+# benchmarks/consultas_busca.json e confira em benchmarks/consultas_busca_avaliacao.json,
+# sempre com o modelo de embeddings em uso: pesos escolhidos só pelas consultas de
+# ajuste, ou com os embeddings falsos dos benchmarks, não valem para o MiniLM.
+PESO_VETORIAL = float(os.environ.get("BUSCA_PESO_VETORIAL", "1.0"))
+PESO_LEXICO = float(os.environ.get("BUSCA_PESO_LEXICO", "1.0"))
+RRF_K = int(os.environ.get("BUSCA_RRF_K", "60"))
+# Candidatos de cada lista antes da fusão
+CANDIDATOS = 20
+# Com filtros que deixam poucos chunks, a busca vetorial é exata sobre eles
+LIMITE_BUSCA_EXATA = 5000
+PASTA_HIBRIDO = "hibrido"
+VERSAO = 2
+
+_STOPWORDS = set(
+    "a o as os de da do das dos e em no na nos nas um uma uns umas por para com sem que se ao aos "
+    "ou como mais mas foi ser sao sua seu suas seus pela pelo pelas pelos este esta isso esse essa".split()
+)
+
+# Referências jurídicas viram termos únicos para o BM25 (texto já normalizado)
+_REFERENCIAS = [
+    (re.compile(r"\bart(?:igo)?s?\.?\s*(\d+)\s*o?(?:\s*-\s*([a-z])\b)?"), lambda m: f"art_{m.group(1)}{m.group(2) or ''}"),
+    (re.compile(r"\binciso\s+([ivxlc]+)\b"), lambda m: f"inciso_{m.group(1)}"),
+    (re.compile(r"(?m)^\s*([ivxlc]+)\s+-\s"), lambda m: f"inciso_{m.group(1)}"),
+    (re.compile(r"(?:§|\bparagrafo)\s*(\d+)"), lambda m: f"par_{m.group(1)}"),
+    (re.compile(r"\bparagrafo unico\b"), lambda m: "par_unico"),
+    (re.compile(r"\blei\s*(?:n[o.]*\s*)?(\d{1,2})\.?(\d{3})\b"), lambda m: f"lei_{m.group(1)}{m.group(2)}")
+]
+
+def normalizar_texto(texto):
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+def tokenizar(texto):
+    texto = normalizar_texto(texto)
+    termos = [t for t in re.findall(r"\w+", texto) if t not in _STOPWORDS]
+    for padrao, termo in _REFERENCIAS:
+        termos.extend(termo(m) for m in padrao.finditer(texto))
+    return termos
+
+def normalizar_lei(valor):
+    return re.sub(r"\D", "", str(valor))
+
+# Acrescenta lei e artigos aos metadados dos chunks de um documento (na ordem do documento),
+# quando a divisão ainda não os preencheu. Um chunk que começa no meio de um artigo
+# herda o artigo do chunk anterior.
+def anotar_metadados(textos, metadados):
+    lei = next((m.group(1) for m in map(CABECALHO_LEI.search, textos) if m), None)
+    atual = None
+    anotados = []
+    for texto, meta in zip(textos, metadados):
+        artigos = [atual] if atual else []
+        for cabecalho in CABECALHO_ARTIGO.finditer(texto):
+            atual = artigo_do_cabecalho(cabecalho)
+            if atual not in artigos:
+                artigos.append(atual)
+        novo = dict(meta)
+        if lei:
+            novo.setdefault("lei", lei)
+        novo.setdefault("artigos", artigos)
+        novo.setdefault("artigo", artigos[0] if artigos else None)
+        anotados.append(novo)
+    return anotados
+
+def _termos_metadados(meta):
+    termos = [f"art_{normalizar_artigo(a).replace('-', '').lower()}" for a in meta.get("artigos") or []]
+    if meta.get("lei"):
+        termos.append(f"lei_{normalizar_lei(meta['lei'])}")
+    if meta.get("secao"):
+        termos.extend(tokenizar(meta["secao"]))
+    return termos
+
+class IndiceBM25:
+    """Índice invertido com pontuação Okapi BM25."""
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)  # termo -> [(documento, frequência)]
+        self.tamanhos = []
+        self.tamanho_total = 0
+        self.tamanho_medio = 0.0
+
+    def adicionar(self, termos):
+        documento = len(self.tamanhos)
+        for termo, frequencia in Counter(termos).items():
+            self.postings[termo].append((documento, frequencia))
+        self.tamanhos.append(len(termos))
+        self.tamanho_total += len(termos)
+        self.tamanho_medio = self.tamanho_total / len(self.tamanhos)
+
+    # Devolve [(documento, pontuação)] dos k melhores, opcionalmente só entre os permitidos
+    def buscar(self, termos, k, permitidos=None):
+        total = len(self.tamanhos)
+        pontos = defaultdict(float)
+        for termo in set(termos):
+            lista = self.postings.get(termo)
+            if not lista:
+                continue
+            idf = math.log(1 + (total - len(lista) + 0.5) / (len(lista) + 0.5))
+            for documento, frequencia in lista:
+                if permitidos is not None and documento not in permitidos:
+                    continue
+                normalizacao = self.k1 * (1 - self.b + self.b * self.tamanhos[documento] / self.tamanho_medio)
+                pontos[documento] += idf * frequencia * (self.k1 + 1) / (frequencia + normalizacao)
+        return heapq.nlargest(k, pontos.items(), key=lambda item: item[1])
+
+# Cria e preenche o índice vetorial do tipo pedido, guardando os vetores no formato pedido
+def novo_ann(vetores, tipo=TIPO_ANN, formato=None):
+    formato = formato or FORMATO_VETORES
+    if formato != "float32" and formato not in QUANTIZACAO:
+        raise ValueError(f"Formato de vetores desconhecido: {formato}")
+    quantizacao = QUANTIZACAO.get(formato)
+    quantidade, dimensao = vetores.shape
+    if tipo == "flat":
+        if quantizacao is None:
+            index = faiss.IndexFlatL2(dimensao)
+        else:
+            index = faiss.IndexScalarQuantizer(dimensao, quantizacao, faiss.METRIC_L2)
+    elif tipo == "hnsw":
+        if quantizacao is None:
+            index = faiss.IndexHNSWFlat(dimensao, HNSW_M)
+        else:
+            index = faiss.IndexHNSWSQ(dimensao, quantizacao, HNSW_M)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCAO
+    elif tipo == "ivf":
+        # ~sqrt(n) listas, com pelo menos 39 vetores de treino por lista
+        listas = max(1, min(int(math.sqrt(quantidade)), quantidade // 39))
+        if quantizacao is None:
+            index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dimensao), dimensao, listas)
+        else:
+            index = faiss.IndexIVFScalarQuantizer(faiss.IndexFlatL2(dimensao), dimensao, listas, quantizacao, faiss.METRIC_L2)
+        # Permite reconstruir os vetores pela posição (BuscaHibrida.vetores_chunks)
+        index.make_direct_map()
+    else:
+        raise ValueError(f"Tipo de índice vetorial desconhecido: {tipo}")
+    if not index.is_trained:
+        index.train(vetores)
+    index.add(vetores)
+    return index
+
+def _parametros_busca(index, seletor=None):
+    if isinstance(index, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=seletor, efSearch=HNSW_EF_BUSCA)
+    if isinstance(index, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(sel=seletor, nprobe=min(IVF_NPROBE, index.nlist))
+    return faiss.SearchParameters(sel=seletor) if seletor is not None else None
+
+class BuscaHibrida:
+    """
+    Busca sobre os chunks de todos os documentos do índice.
+
+    Parâmetros:
+    textos (list): Texto de cada chunk.
+    metadados (list): Metadados de cada chunk (source, page, lei, artigo, artigos).
+    vetores (np.ndarray): Embeddings dos chunks, na mesma ordem. Só montam o índice
+        vetorial; depois disso os vetores são lidos do próprio índice.
+    embeddings: Modelo usado para os embeddings das consultas.
+    tipo_ann (str): flat, hnsw ou ivf.
+    formato (str): float32, float16 ou int8 (padrão: FORMATO_VETORES).
+    """
+
+    def __init__(self, textos, metadados, vetores, embeddings, tipo_ann=TIPO_ANN, ann=None, lexico=None, formato=None):
+        self.textos = list(textos)
+        self.metadados = list(metadados)
+        self.embeddings = embeddings
+        self.tipo_ann = tipo_ann
+        if ann is None:
+            ann = novo_ann(np.ascontiguousarray(vetores, dtype="float32"), tipo_ann, formato)
+        self.ann = ann
+        if lexico is None:
+            lexico = IndiceBM25()
+            for texto, meta in zip(self.textos, self.metadados):
+                lexico.adicionar(tokenizar(texto) + _termos_metadados(meta))
+        self.lexico = lexico
+        self._por_valor = self._indexar_metadados()
+
+    # (campo, valor normalizado) -> posições dos chunks, para os filtros
+    def _indexar_metadados(self):
+        por_valor = defaultdict(set)
+        for posicao, meta in enumerate(self.metadados):
+            if meta.get("source"):
+                por_valor[("source", meta["source"])].add(posicao)
+                por_valor[("source", os.path.basename(meta["source"]))].add(posicao)
+            if meta.get("lei"):
+                por_valor[("lei", normalizar_lei(meta["lei"]))].add(posicao)
+            for artigo in meta.get("artigos") or []:
+                por_valor[("artigo", normalizar_artigo(artigo))].add(posicao)
+        return por_valor
+
+    # Filtros: {"source": "lei.pdf", "lei": "11.340", "artigo": ["22", "23"]}; listas aceitam qualquer valor
+    def posicoes_permitidas(self, filtros):
+        if not filtros:
+            return None
+        permitidas = None
+        for campo, valores in filtros.items():
+            if campo not in ("source", "lei", "artigo"):
+                raise ValueError(f"Filtro desconhecido: {campo}")
+            if not isinstance(valores, (list, tuple, set)):
+                valores = [valores]
+            normalizar = {"lei": normalizar_lei, "artigo": normalizar_artigo}.get(campo, str)
+            posicoes = set().union(*(self._por_valor.get((campo, normalizar(v)), set()) for v in valores))
+            permitidas = posicoes if permitidas is None else permitidas & posicoes
+        return permitidas
+
+    # Vetores dos chunks nas posições pedidas, reconstruídos a partir do índice vetorial
+    def vetores_chunks(self, posicoes):
+        return self.ann.reconstruct_batch(np.asarray(posicoes, dtype="int64"))
+
+    def vetor_consulta(self, consulta):
+        return np.asarray([self.embeddings.embed_query(consulta)], dtype="float32")
+
+    # vetor: o da consulta, quando já calculado
+    def buscar_vetorial(self, consulta, k, permitidas=None, vetor=None):
+        if vetor is None:
+            vetor = self.vetor_consulta(consulta)
+        if permitidas is not None:
+            if not permitidas:
+                return []
+            if len(permitidas) <= LIMITE_BUSCA_EXATA:
+                posicoes = np.fromiter(permitidas, dtype="int64")
+                distancias = ((self.vetores_chunks(posicoes) - vetor) ** 2).sum(axis=1)
+                return [int(posicoes[i]) for i in np.argsort(distancias)[:k]]
+            seletor = faiss.IDSelectorBatch(np.fromiter(permitidas, dtype="int64"))
+            _, indices = self.ann.search(vetor, k, params=_parametros_busca(self.ann, seletor))
+        else:
+            _, indices = self.ann.search(vetor, k, params=_parametros_busca(self.ann))
+        return [int(i) for i in indices[0] if i >= 0]
+
+    def buscar_lexical(self, consulta, k, permitidas=None):
+        return [posicao for posicao, _ in self.lexico.buscar(tokenizar(consulta), k, permitidas)]
+
+    # [(posição, pontuação RRF)] dos k melhores chunks; modo: "hibrido", "vetorial" ou "lexical"
+    def buscar_pontuados(self, consulta, k=4, filtros=None, modo="hibrido", candidatos=CANDIDATOS, vetor=None):
+        permitidas = self.posicoes_permitidas(filtros)
+        candidatos = max(candidatos, k)
+        listas = []
+        if modo in ("hibrido", "vetorial"):
+            listas.append((PESO_VETORIAL, self.buscar_vetorial(consulta, candidatos, permitidas, vetor)))
+        if modo in ("hibrido", "lexical"):
+            listas.append((PESO_LEXICO, self.buscar_lexical(consulta, candidatos, permitidas)))
+        pontos = defaultdict(float)
+        for peso, posicoes in listas:
+            for rank, posicao in enumerate(posicoes):
+                pontos[posicao] += peso / (RRF_K + rank + 1)
+        return heapq.nlargest(k, pontos.items(), key=lambda item: item[1])
+
+    def buscar_posicoes(self, consulta, k=4, filtros=None, modo="hibrido", candidatos=CANDIDATOS):
+        return [p for p, _ in self.buscar_pontuados(consulta, k, filtros, modo, candidatos)]
+
+    def _documento(self, posicao):
+        return Document(page_content=self.textos[posicao], metadata=dict(self.metadados[posicao]))
+
+    def buscar(self, consulta, k=4, filtros=None, modo="hibrido"):
+        return [self._documento(p) for p in self.buscar_posicoes(consulta, k, filtros, modo)]
+
+    # Trechos para o prompt: os melhores candidatos empacotados por MMR dentro do orçamento de tokens
+    def buscar_contexto(self, consulta, orcamento_tokens=ORCAMENTO_CONTEXTO, filtros=None, modo="hibrido",
+                        candidatos=CANDIDATOS_CONTEXTO):
+        pontuados = self.buscar_pontuados(consulta, candidatos, filtros, modo)
+        if not pontuados:
+            return []
+        posicoes = [p for p, _ in pontuados]
+        escolhidos = empacotar(
+            [self.textos[p] for p in posicoes], [pontos for _, pontos in pontuados],
+            self.vetores_chunks(posicoes), orcamento_tokens
+        )
+        return [self._documento(posicoes[i]) for i in escolhidos]
+
+    def salvar(self, pasta, chave):
+        os.makedirs(pasta, exist_ok=True)
+        faiss.write_index(self.ann, os.path.join(pasta, "ann.faiss.tmp"))
+        with open(os.path.join(pasta, "dados.pkl.tmp"), "wb") as f:
+            pickle.dump({"chave": chave, "tipo_ann": self.tipo_ann, "textos": self.textos,
+                         "metadados": self.metadados, "lexico": self.lexico}, f)
+        os.replace(os.path.join(pasta, "ann.faiss.tmp"), os.path.join(pasta, "ann.faiss"))
+        os.replace(os.path.join(pasta, "dados.pkl.tmp"), os.path.join(pasta, "dados.pkl"))
+        # Cópia em float32 dos vetores, salva pela versão 1
+        if os.path.exists(os.path.join(pasta, "vetores.npy")):
+            os.remove(os.path.join(pasta, "vetores.npy"))
+
+    # Devolve a busca salva, ou None se ela não existir ou tiver sido montada para outra chave.
+    # Com mmap, os workers que abrem a mesma busca compartilham as páginas do índice vetorial.
+    @classmethod
+    def carregar(cls, pasta, embeddings, chave, mmap=INDICE_MMAP):
+        caminho_dados = os.path.join(pasta, "dados.pkl")
+        if not os.path.exists(caminho_dados):
+            return None
+        with open(caminho_dados, "rb") as f:
+            dados = pickle.load(f)
+        if dados["chave"] != chave:
+            return None
+        return cls(
+            dados["textos"], dados["metadados"], None, embeddings, dados["tipo_ann"],
+            ann=ler_index_faiss(os.path.join(pasta, "ann.faiss"), mmap), lexico=dados["lexico"]
+        )
+
+# Chunks (textos, metadados anotados, vetores) de todos os documentos do manifesto
+def ler_chunks(manifesto, pasta=PASTA_INDICE):
+    textos, metadados, vetores = [], [], []
+    for doc in manifesto["documentos"].values():
+        textos_doc, metadados_doc, vetores_doc = ler_entrada(pasta, doc["chave"])
+        textos.extend(textos_doc)
+        metadados.extend(anotar_metadados(textos_doc, metadados_doc))
+        vetores.extend(vetores_doc)
+    return textos, metadados, np.asarray(vetores, dtype="float32")
+
+# Monta (ou reabre, se os PDFs não mudaram) a busca híbrida a partir do manifesto do índice
+def montar_busca_hibrida(pasta=PASTA_INDICE, embeddings=None, tipo_ann=None):
+    embeddings = embeddings or get_embeddings()
+    tipo_ann = tipo_ann or TIPO_ANN
+    manifesto = ler_manifesto(pasta)
+    chave = f"{manifesto.get('hash')}:{FORMATO_VETORES}:{manifesto.get('divisao')}:{tipo_ann}:{VERSAO}"
+    pasta_hibrido = os.path.join(pasta, PASTA_HIBRIDO)
+    busca = BuscaHibrida.carregar(pasta_hibrido, embeddings, chave)
+    if busca is not None:
+        return busca
+
+    textos, metadados, vetores = ler_chunks(manifesto, pasta)
+    if not textos:
+        return None
+    busca = BuscaHibrida(textos, metadados, vetores, embeddings, tipo_ann)
+    busca.salvar(pasta_hibrido, chave)
+    # Serve do arquivo salvo (com mmap, como as próximas aberturas), e não do índice montado em memória
+    busca.ann = ler_index_faiss(os.path.join(pasta_hibrido, "ann.faiss"), INDICE_MMAP)
+    return busca
+
+class RetrieverHibrido(BaseRetriever):
+    """Retriever do LangChain sobre a busca híbrida, para usar em create_retrieval_chain."""
+
+    busca: Any
+    k: int = 4
+    filtros: Optional[dict] = None
+    modo: str = "hibrido"
+    # Com orçamento, os trechos são escolhidos por empacotar() em vez de serem os k primeiros
+    orcamento_tokens: Optional[int] = None
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        if self.orcamento_tokens:
+            return self.busca.buscar_contexto(query, self.orcamento_tokens, self.filtros, self.modo)
+        return self.busca.buscar(query, self.k, self.filtros, self.modo)
+
+# Cache do processo, com o hash dos PDFs na chave como em carregar_indice
+@st.cache_resource(show_spinner=False)
+def _carregar_busca_cache(hash_pdfs, arquivos_pdf):
+    # Só atualiza as entradas do manifesto; o índice FAISS do chat não é aberto aqui
+    atualizar_indice(list(arquivos_pdf), carregar=False)
+    return montar_busca_hibrida(PASTA_INDICE)
+
+def carregar_busca_hibrida(arquivos_pdf):
+    return _carregar_busca_cache(calcular_hash_pdfs(arquivos_pdf), tuple(sorted(arquivos_pdf)))
@@ -0,0 +1,285 @@
+# cache_llm.py
+# Cache em disco das respostas do LLM. Com temperatura 0 a mesma entrada gera
+# a mesma saída, então gerar de novo o mesmo relatório ou denúncia (um rerun
+# do Streamlit, um clique em download) não precisa chamar o Groq outra vez.
+#
+# A chave é o hash do modelo, dos parâmetros e das mensagens. As respostas
+# ficam em SQLite, com limite de tamanho (as menos usadas saem primeiro) e
+# validade. Os relatos das vítimas são sensíveis: as respostas são sempre
+# cifradas com Fernet e as chaves do cache são HMACs, que não revelam o prompt.
+# A chave vem de CACHE_LLM_CHAVE (gerada com `python cache_llm.py --gerar-chave`).
+# Sem ela, usa uma chave só do processo, como sessoes.py: o cache vale enquanto o
+# processo roda, e o que ficou no arquivo fica ilegível depois que ele termina.
+# Para workers e o lote compartilharem o cache, todos precisam da mesma chave.
+
+import os
+import sys
+import json
+import time
+import hmac
+import sqlite3
+import hashlib
+import threading
+from typing import Any
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, messages_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+CACHE_LLM_ATIVO = os.environ.get("CACHE_LLM", "1") == "1"
+ARQUIVO_CACHE = os.environ.get("CACHE_LLM_ARQUIVO", "cache_llm.sqlite")
+MAX_BYTES = int(float(os.environ.get("CACHE_LLM_MAX_MB", "50")) * 1024 * 1024)
+TTL_SEGUNDOS = float(os.environ.get("CACHE_LLM_TTL", str(30 * 24 * 3600)))
+CHAVE_CIFRA = os.environ.get("CACHE_LLM_CHAVE")
+# Acima dessa temperatura a resposta não é determinística e não é guardada
+TEMPERATURA_MAXIMA = 0.01
+# A limpeza por tamanho remove até ficar nessa fração do limite, para não rodar a cada escrita
+FRACAO_APOS_LIMPEZA = 0.9
+
+class CacheLLM:
+    """
+    Armazena respostas do LLM em SQLite, endereçadas pelo hash da entrada.
+
+    Parâmetros:
+    arquivo (str): Caminho do banco (":memory:" para um cache só do processo).
+    max_bytes (int): Tamanho máximo das respostas guardadas.
+    ttl (float): Segundos até uma resposta expirar.
+    chave_cifra (str): Chave Fernet; sem ela, é gerada uma chave válida só neste processo.
+    """
+
+    def __init__(self, arquivo=ARQUIVO_CACHE, max_bytes=MAX_BYTES, ttl=TTL_SEGUNDOS, chave_cifra=CHAVE_CIFRA):
+        self.arquivo = arquivo
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        from cryptography.fernet import Fernet
+
+        self.chave_propria = not chave_cifra
+        chave_cifra = chave_cifra or Fernet.generate_key()
+        chave_cifra = chave_cifra.encode() if isinstance(chave_cifra, str) else chave_cifra
+        self._fernet = Fernet(chave_cifra)
+        self._segredo = hashlib.sha256(b"cache_llm:" + chave_cifra).digest()
+        self.acertos = 0
+        self.falhas = 0
+        self.remocoes = 0
+        self._lock = threading.Lock()
+        self._conexao = sqlite3.connect(arquivo, check_same_thread=False, isolation_level=None)
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.execute(
+            "CREATE TABLE IF NOT EXISTS respostas ("
+            "chave TEXT PRIMARY KEY, valor BLOB NOT NULL, tamanho INTEGER NOT NULL, "
+            "criado_em REAL NOT NULL, acessado_em REAL NOT NULL, acertos INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._conexao.execute("CREATE INDEX IF NOT EXISTS respostas_acesso ON respostas (acessado_em)")
+        # Respostas em texto puro, gravadas por versões que só cifravam com CACHE_LLM_CHAVE
+        # (um token Fernet nunca começa com "{")
+        self._conexao.execute("DELETE FROM respostas WHERE substr(valor, 1, 1) = X'7B'")
+        self._bytes = self._conexao.execute("SELECT COALESCE(SUM(tamanho), 0) FROM respostas").fetchone()[0]
+
+    # Chave da entrada: HMAC com a chave de cifra, para não permitir confirmar
+    # se um prompt conhecido está no cache
+    def chave(self, conteudo):
+        dados = json.dumps(conteudo, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        return hmac.new(self._segredo, dados, hashlib.sha256).hexdigest()
+
+    def buscar(self, chave):
+        from cryptography.fernet import InvalidToken
+
+        agora = time.time()
+        with self._lock:
+            linha = self._conexao.execute("SELECT valor, criado_em FROM respostas WHERE chave = ?", (chave,)).fetchone()
+            if linha is not None and agora - linha[1] > self.ttl:
+                self._remover([chave])
+                linha = None
+            if linha is None:
+                self.falhas += 1
+                return None
+            try:
+                valor = self._fernet.decrypt(linha[0])
+            except InvalidToken:
+                # Gravada com outra chave
+                self._remover([chave])
+                self.falhas += 1
+                return None
+            self._conexao.execute("UPDATE respostas SET acessado_em = ?, acertos = acertos + 1 WHERE chave = ?", (agora, chave))
+            self.acertos += 1
+        return json.loads(valor.decode("utf-8"))
+
+    def guardar(self, chave, valor):
+        dados = self._fernet.encrypt(json.dumps(valor, ensure_ascii=False).encode("utf-8"))
+        if len(dados) > self.max_bytes:
+            return
+        agora = time.time()
+        with self._lock:
+            anterior = self._conexao.execute("SELECT tamanho FROM respostas WHERE chave = ?", (chave,)).fetchone()
+            self._conexao.execute(
+                "INSERT OR REPLACE INTO respostas (chave, valor, tamanho, criado_em, acessado_em) VALUES (?, ?, ?, ?, ?)",
+                (chave, dados, len(dados), agora, agora)
+            )
+            self._bytes += len(dados) - (anterior[0] if anterior else 0)
+            if self._bytes > self.max_bytes:
+                self._limpar_excesso(agora)
+
+    def _remover(self, chaves):
+        for chave in chaves:
+            linha = self._conexao.execute("SELECT tamanho FROM respostas WHERE chave = ?", (chave,)).fetchone()
+            if linha:
+                self._conexao.execute("DELETE FROM respostas WHERE chave = ?", (chave,))
+                self._bytes -= linha[0]
+                self.remocoes += 1
+
+    # Remove as expiradas e, se ainda precisar, as acessadas há mais tempo
+    def _limpar_excesso(self, agora):
+        self._remover([c for (c,) in self._conexao.execute("SELECT chave FROM respostas WHERE criado_em < ?", (agora - self.ttl,))])
+        alvo = self.max_bytes * FRACAO_APOS_LIMPEZA
+        remover = []
+        liberado = 0
+        for chave, tamanho in self._conexao.execute("SELECT chave, tamanho FROM respostas ORDER BY acessado_em"):
+            if self._bytes - liberado <= alvo:
+                break
+            remover.append(chave)
+            liberado += tamanho
+        self._remover(remover)
+
+    def limpar(self):
+        with self._lock:
+            self._conexao.execute("DELETE FROM respostas")
+            self._bytes = 0
+
+    def estatisticas(self):
+        with self._lock:
+            total = self.acertos + self.falhas
+            itens, acertos_guardados = self._conexao.execute("SELECT COUNT(*), COALESCE(SUM(acertos), 0) FROM respostas").fetchone()
+            return {
+                # Contadores deste processo
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                "taxa_acerto": self.acertos / total if total else 0.0,
+                "remocoes": self.remocoes,
+                # Acertos de todos os processos nas respostas ainda guardadas
+                "acertos_guardados": acertos_guardados,
+                "itens": itens,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "chave_propria": self.chave_propria
+            }
+
+    def fechar(self):
+        with self._lock:
+            self._conexao.close()
+
+class LLMComCache(BaseChatModel):
+    """
+    Envolve um chat model (ChatGroq, ou um modelo local nos testes) consultando
+    o CacheLLM antes de chamá-lo. Respostas vindas do cache não informam uso de tokens.
+
+    Parâmetros:
+    modelo (BaseChatModel): Modelo que gera as respostas que não estão no cache.
+    cache_disco (CacheLLM): Onde as respostas são guardadas.
+    """
+
+    modelo: Any
+    # "cache" já é um campo do BaseChatModel (cache global do LangChain)
+    cache_disco: Any
+
+    @property
+    def _llm_type(self):
+        return f"cache-{self.modelo._llm_type}"
+
+    # O crewai usa model_name para contar tokens; o rastreamento, para nomear os spans
+    @property
+    def model_name(self):
+        return getattr(self.modelo, "model_name", None) or self.modelo._llm_type
+
+    @property
+    def _identifying_params(self):
+        return {"model_name": self.model_name, **self.modelo._identifying_params}
+
+    def _deterministico(self):
+        return (getattr(self.modelo, "temperature", 0) or 0) <= TEMPERATURA_MAXIMA
+
+    def _chave(self, messages, stop, kwargs):
+        return self.cache_disco.chave({
+            "modelo": self.modelo._get_llm_string(stop=stop, **kwargs),
+            "mensagens": messages_to_dict(messages)
+        })
+
+    def _do_cache(self, chave):
+        valor = self.cache_disco.buscar(chave)
+        if valor is None:
+            return None
+        mensagem = messages_from_dict([valor])[0]
+        mensagem.usage_metadata = None
+        return mensagem
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if not self._deterministico():
+            return self.modelo._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        chave = self._chave(messages, stop, kwargs)
+        mensagem = self._do_cache(chave)
+        if mensagem is not None:
+            return ChatResult(generations=[ChatGeneration(message=mensagem)], llm_output={"cache": True, "model_name": self.model_name})
+        resultado = self.modelo._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        if len(resultado.generations) == 1:
+            self.cache_disco.guardar(chave, messages_to_dict([resultado.generations[0].message])[0])
+        return resultado
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        if not self._deterministico():
+            yield from self.modelo._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+            return
+        chave = self._chave(messages, stop, kwargs)
+        mensagem = self._do_cache(chave)
+        if mensagem is not None:
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=mensagem.content))
+            if run_manager:
+                run_manager.on_llm_new_token(mensagem.content, chunk=chunk)
+            yield chunk
+            return
+        completo = None
+        for chunk in self.modelo._stream(messages, stop=stop, run_manager=run_manager, **kwargs):
+            completo = chunk if completo is None else completo + chunk
+            yield chunk
+        if completo is not None:
+            mensagem = AIMessage(content=completo.message.content, additional_kwargs=completo.message.additional_kwargs)
+            self.cache_disco.guardar(chave, messages_to_dict([mensagem])[0])
+
+_cache = None
+_lock_cache = threading.Lock()
+
+# Cache compartilhado pelo processo (app, lote e crews usam o mesmo arquivo)
+def get_cache_llm():
+    global _cache
+    if _cache is None:
+        with _lock_cache:
+            if _cache is None:
+                _cache = CacheLLM()
+    return _cache
+
+# Devolve o modelo envolvido pelo cache em disco, ou o próprio modelo com CACHE_LLM=0.
+# Os callbacks ficam no envoltório, para também registrar as respostas vindas do cache.
+def com_cache(modelo, cache=None, callbacks=None):
+    if not CACHE_LLM_ATIVO and cache is None:
+        if callbacks is not None:
+            modelo.callbacks = callbacks
+        return modelo
+    return LLMComCache(modelo=modelo, cache_disco=cache or get_cache_llm(), callbacks=callbacks)
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Administra o cache em disco das respostas do LLM.")
+    parser.add_argument("--arquivo", default=ARQUIVO_CACHE)
+    parser.add_argument("--gerar-chave", action="store_true", help="Mostra uma nova chave Fernet para CACHE_LLM_CHAVE")
+    parser.add_argument("--limpar", action="store_true", help="Apaga todas as respostas guardadas")
+    args = parser.parse_args(argv)
+
+    if args.gerar_chave:
+        from cryptography.fernet import Fernet
+        print(Fernet.generate_key().decode())
+        return 0
+    cache = CacheLLM(args.arquivo)
+    if args.limpar:
+        cache.limpar()
+    print(json.dumps(cache.estatisticas(), indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
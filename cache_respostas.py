@@ -0,0 +1,133 @@
+# cache_respostas.py
+# Cache semântico de respostas do chat: perguntas parecidas (pelo embedding)
+# recebem a mesma resposta sem uma nova chamada ao LLM. O cache é de todas as
+# sessões, então só guarda respostas a perguntas sem dados pessoais.
+
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+
+LIMIAR_SIMILARIDADE = float(os.environ.get("CACHE_RESPOSTAS_LIMIAR", "0.92"))
+TTL_SEGUNDOS = float(os.environ.get("CACHE_RESPOSTAS_TTL", str(24 * 3600)))
+MAX_ITENS = int(os.environ.get("CACHE_RESPOSTAS_MAX_ITENS", "1000"))
+
+# Palavras que indicam que a pergunta depende do que já foi dito na conversa
+_REFERENCIAS_AO_HISTORICO = re.compile(
+    r"\b(isso|isto|disso|nisso|ele|ela|eles|elas|dele|dela|mesmo|mesma|também|tambem|"
+    r"antes|acima|anterior|você disse|voce disse|e se|e quanto|meu caso|minha situação|minha situacao)\b",
+    re.IGNORECASE
+)
+
+# A pergunta pode ser respondida pelo cache se for a primeira da conversa
+# ou se não fizer referência ao que já foi conversado
+def independe_do_historico(pergunta, mensagens):
+    if not any(m["role"] == "user" for m in mensagens):
+        return True
+    return not _REFERENCIAS_AO_HISTORICO.search(pergunta)
+
+# Sinais de dados pessoais: relato em primeira pessoa, documentos, telefones,
+# e-mails, endereços e nomes próprios
+_PRIMEIRA_PESSOA = re.compile(r"\b(eu|me|mim|comigo|meu|minha|meus|minhas|nós|nosso|nossa|nossos|nossas|conosco)\b", re.IGNORECASE)
+_NUMERO_LONGO = re.compile(r"\d[\d.\-/\s]{6,}\d")
+# Números de leis ("Lei nº 11.340/2006") não são dados pessoais
+_NUMERO_LEI = re.compile(r"\blei\s*(n[º°o.]*\s*)?[\d.]+(/\d{2,4})?", re.IGNORECASE)
+_EMAIL = re.compile(r"\S+@\S+")
+_ENDERECO = re.compile(r"\b(rua|r\.|avenida|av\.|travessa|alameda|estrada|rodovia|bairro|cep)\s", re.IGNORECASE)
+# Palavras com maiúscula que aparecem nas perguntas sobre a lei e não são nomes de pessoas
+_TERMOS_PROPRIOS = {
+    "lei", "maria", "penha", "art", "artigo", "código", "codigo", "penal", "civil", "processo", "constituição",
+    "constituicao", "federal", "ministério", "ministerio", "público", "publico", "defensoria", "pública",
+    "juizado", "juizados", "juiz", "justiça", "justica", "tribunal", "delegacia", "deam", "polícia", "policia",
+    "militar", "estado", "estados", "união", "uniao", "município", "municipio", "brasil", "sus", "cras",
+    "creas", "violência", "violencia", "doméstica", "domestica", "familiar", "mulher", "mulheres", "medida",
+    "medidas", "protetiva", "protetivas", "boletim", "ocorrência", "ocorrencia", "disque", "ligue", "casa",
+    "abrigo", "centro", "referência", "referencia", "vara", "segurança", "seguranca", "saúde", "saude"
+}
+# Perguntas mais longas que isso costumam ser relatos, não dúvidas sobre a lei
+MAX_PALAVRAS_GENERICA = 30
+
+# A resposta à pergunta pode ser compartilhada com outras pessoas pelo cache: a pergunta
+# não tem sinais de dados pessoais. Na dúvida, não é genérica (o custo é só uma chamada ao LLM).
+def pergunta_generica(pergunta):
+    palavras = re.findall(r"\w+", pergunta)
+    if len(palavras) > MAX_PALAVRAS_GENERICA:
+        return False
+    numeros = _NUMERO_LEI.sub(" ", pergunta)
+    if _PRIMEIRA_PESSOA.search(pergunta) or _NUMERO_LONGO.search(numeros) or _EMAIL.search(pergunta) or _ENDERECO.search(pergunta):
+        return False
+    # Nomes próprios: palavras com maiúscula fora do começo de uma frase
+    for frase in re.split(r"[.!?\n]+", pergunta):
+        for palavra in re.findall(r"\w+", frase)[1:]:
+            if palavra[0].isupper() and palavra.lower() not in _TERMOS_PROPRIOS:
+                return False
+    return True
+
+def _normalizar(vetor):
+    vetor = np.asarray(vetor, dtype="float32")
+    norma = np.linalg.norm(vetor)
+    return vetor / norma if norma else vetor
+
+class CacheSemantico:
+    def __init__(self, embeddings, limiar=LIMIAR_SIMILARIDADE, ttl=TTL_SEGUNDOS, max_itens=MAX_ITENS):
+        self.embeddings = embeddings
+        self.limiar = limiar
+        self.ttl = ttl
+        self.max_itens = max_itens
+        self.acertos = 0
+        self.falhas = 0
+        # chave -> (vetor normalizado, pergunta, resposta, criado_em); a ordem é a do LRU
+        self._itens = OrderedDict()
+        self._proxima_chave = 0
+        self._lock = threading.Lock()
+
+    def vetor(self, pergunta):
+        return _normalizar(self.embeddings.embed_query(pergunta))
+
+    # Devolve (resposta, vetor). A resposta é None quando não há item parecido o suficiente;
+    # o vetor pode ser reaproveitado em guardar() para não recalcular o embedding.
+    def buscar(self, pergunta, vetor=None):
+        vetor = self.vetor(pergunta) if vetor is None else vetor
+        agora = time.time()
+        with self._lock:
+            for chave in [c for c, item in self._itens.items() if agora - item[3] > self.ttl]:
+                del self._itens[chave]
+            if self._itens:
+                chaves = list(self._itens)
+                matriz = np.stack([self._itens[c][0] for c in chaves])
+                similaridades = matriz @ vetor
+                melhor = int(np.argmax(similaridades))
+                if similaridades[melhor] >= self.limiar:
+                    chave = chaves[melhor]
+                    self._itens.move_to_end(chave)
+                    self.acertos += 1
+                    return self._itens[chave][2], vetor
+            self.falhas += 1
+            return None, vetor
+
+    def guardar(self, pergunta, resposta, vetor=None):
+        vetor = self.vetor(pergunta) if vetor is None else vetor
+        with self._lock:
+            self._itens[self._proxima_chave] = (vetor, pergunta, resposta, time.time())
+            self._proxima_chave += 1
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+    def estatisticas(self):
+        with self._lock:
+            total = self.acertos + self.falhas
+            return {
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                "taxa_acerto": self.acertos / total if total else 0.0,
+                "itens": len(self._itens),
+                "limiar": self.limiar,
+                "ttl": self.ttl,
+                "max_itens": self.max_itens
+            }
@@ -0,0 +1,118 @@
+# cliente_api.py
+# Cliente da API (api.py) com a mesma interface das funções locais que o app
+# usa, para que app.py vire um cliente fino quando API_URL estiver definida:
+# o índice, o LLM e os crews ficam no servidor.
+
+import os
+import json
+import functools
+from tarefas import FilaCheia
+
+API_URL = os.environ.get("API_URL", "http://127.0.0.1:8000").rstrip("/")
+# Segundos para conectar e para esperar a resposta (crews e LLM podem demorar)
+TIMEOUT = (5, float(os.environ.get("API_TIMEOUT", "300")))
+
+@functools.lru_cache(maxsize=None)
+def _sessao():
+    import requests
+    return requests.Session()
+
+def _verificar(resposta):
+    if resposta.status_code == 503:
+        raise FilaCheia(resposta.json().get("erro", "Servidor ocupado. Tente novamente em alguns segundos."))
+    resposta.raise_for_status()
+    return resposta
+
+def _post(caminho, dados, **kwargs):
+    return _verificar(_sessao().post(API_URL + caminho, json=dados, timeout=TIMEOUT, **kwargs))
+
+def _get(caminho):
+    return _verificar(_sessao().get(API_URL + caminho, timeout=TIMEOUT))
+
+# Chat
+
+class ChainRemota:
+    """Representa a retrieval chain do servidor; o app a guarda como guardaria a local."""
+
+    def __init__(self, url=API_URL):
+        self.url = url
+
+def carregar_pdfs(pasta="pdfs"):
+    return _get("/documentos").json()["documentos"]
+
+def get_retrieval_chain(arquivos_pdf):
+    return ChainRemota()
+
+# Mesmo contrato de assistente.responder_pergunta_stream: devolve (gerador, info),
+# e info é preenchido ao final do consumo com os tempos medidos no servidor
+def responder_pergunta_stream(retrieval_chain, pergunta, history, mensagens_anteriores):
+    info = {"cache": False, "tokens_prompt": 0, "tempo_recuperacao": 0.0,
+            "tempo_primeiro_token": 0.0, "tempo_geracao": 0.0, "tempo_total": 0.0}
+
+    def gerar():
+        dados = {"pergunta": pergunta, "history": history, "mensagens": mensagens_anteriores}
+        with _post("/chat", dados, stream=True) as resposta:
+            for linha in resposta.iter_lines(decode_unicode=True):
+                if not linha:
+                    continue
+                item = json.loads(linha)
+                if "trecho" in item:
+                    yield item["trecho"]
+                elif "erro" in item:
+                    raise RuntimeError(item["erro"])
+                elif item.get("info"):
+                    info.update(item["info"])
+
+    return gerar(), info
+
+# Mesmo contrato de historico.resumir_com_llm, usado como resumidor do HistoricoConversa.
+# Se a API falhar, o HistoricoConversa resume por corte, sem LLM.
+def resumir_historico(resumo, mensagens, limite_tokens):
+    return _post("/historico/resumo", {"resumo": resumo, "mensagens": mensagens, "limite_tokens": limite_tokens}).json()["resumo"]
+
+# Delegacias
+
+def buscar_delegacias_offline(endereco, k=5):
+    return _post("/delegacias", {"endereco": endereco}).json()["delegacias"]
+
+def escrever_mensagem_delegacias(endereco, delegacias):
+    return _post("/delegacias/mensagem", {"endereco": endereco, "delegacias": delegacias}).json()["mensagem"]
+
+def executar_crew_localizacao(endereco):
+    return _post("/delegacias/internet", {"endereco": endereco}).json()["resultado"]
+
+# Relatórios e denúncias
+
+class GerenciadorRemoto:
+    """Consulta as tarefas no servidor com a interface do GerenciadorTarefas."""
+
+    def status(self, id_tarefa):
+        resposta = _sessao().get(f"{API_URL}/tarefas/{id_tarefa}", timeout=TIMEOUT)
+        if resposta.status_code == 404:
+            return None
+        return _verificar(resposta).json()
+
+    def progresso(self, id_tarefa):
+        status = self.status(id_tarefa)
+        if status is None:
+            return 0.0
+        return status["progresso"]
+
+    def resultado(self, id_tarefa):
+        resposta = _sessao().get(f"{API_URL}/tarefas/{id_tarefa}/pdf", timeout=TIMEOUT)
+        if resposta.status_code == 404:
+            return None
+        return _verificar(resposta).content
+
+    def marcar_baixado(self, id_tarefa):
+        _post(f"/tarefas/{id_tarefa}/baixado", {})
+
+@functools.lru_cache(maxsize=None)
+def get_gerenciador_tarefas():
+    return GerenciadorRemoto()
+
+def submeter_relatorio(chat_history):
+    return _post("/relatorios", {"chat_history": chat_history}).json()["id"]
+
+def submeter_denuncia(victim_name, conversation_text):
+    return _post("/denuncias", {"victim_name": victim_name, "conversation_text": conversation_text}).json()["id"]
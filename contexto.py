@@ -0,0 +1,69 @@
+# contexto.py
+# Escolhe quais trechos recuperados entram no prompt: em vez de colar sempre os
+# k primeiros, preenche um orçamento de tokens por MMR (Maximal Marginal
+# Relevance), trocando trechos quase repetidos por outros que acrescentem
+# informação. O trecho mais relevante sempre entra.
+
+import os
+import numpy as np
+from historico import contar_tokens
+
+# Tokens do prompt reservados para os trechos da lei (0 desliga o empacotamento)
+ORCAMENTO_TOKENS = int(os.environ.get("CONTEXTO_ORCAMENTO_TOKENS", "700"))
+# Peso da relevância contra a redundância no MMR (1.0 = só relevância)
+LAMBDA_MMR = float(os.environ.get("CONTEXTO_LAMBDA_MMR", "0.7"))
+# Trechos com similaridade acima disso a um já escolhido são descartados
+LIMITE_REDUNDANCIA = 0.9
+# Candidatos considerados pelo empacotamento
+CANDIDATOS = int(os.environ.get("CONTEXTO_CANDIDATOS", "8"))
+# O stuff chain separa os documentos com uma linha em branco
+TOKENS_SEPARADOR = 1
+
+def _normalizar_linhas(vetores):
+    vetores = np.asarray(vetores, dtype="float32")
+    normas = np.linalg.norm(vetores, axis=1, keepdims=True)
+    return vetores / np.where(normas > 0, normas, 1.0)
+
+def empacotar(textos, relevancias, vetores, orcamento_tokens=ORCAMENTO_TOKENS, lambda_mmr=LAMBDA_MMR,
+              limite_redundancia=LIMITE_REDUNDANCIA):
+    """
+    Seleciona trechos para o prompt dentro do orçamento de tokens.
+
+    Parâmetros:
+    textos (list): Textos dos candidatos, do mais para o menos relevante.
+    relevancias (list): Pontuação de cada candidato (ex.: a da fusão RRF); só a ordem de grandeza importa.
+    vetores (array): Embeddings dos candidatos, usados para medir a redundância.
+    orcamento_tokens (int): Máximo de tokens somados dos trechos escolhidos.
+
+    Retorna:
+    list: Posições (em textos) dos trechos escolhidos, na ordem de escolha.
+    """
+    if not textos:
+        return []
+    relevancias = np.asarray(relevancias, dtype="float32")
+    maior = relevancias.max()
+    relevancias = relevancias / maior if maior > 0 else np.ones_like(relevancias)
+    similaridades = _normalizar_linhas(vetores) @ _normalizar_linhas(vetores).T
+    custos = [contar_tokens(t) + TOKENS_SEPARADOR for t in textos]
+
+    # O mais relevante entra mesmo que sozinho passe do orçamento
+    escolhidos = [0]
+    usados = custos[0]
+    restantes = set(range(1, len(textos)))
+    while restantes:
+        melhor, melhor_pontos = None, None
+        for i in list(restantes):
+            redundancia = similaridades[i, escolhidos].max()
+            if redundancia >= limite_redundancia or usados + custos[i] > orcamento_tokens:
+                # Não cabe agora e não vai caber depois: o orçamento só diminui
+                restantes.discard(i)
+                continue
+            pontos = lambda_mmr * relevancias[i] - (1 - lambda_mmr) * redundancia
+            if melhor_pontos is None or pontos > melhor_pontos:
+                melhor, melhor_pontos = i, pontos
+        if melhor is None:
+            break
+        escolhidos.append(melhor)
+        usados += custos[melhor]
+        restantes.discard(melhor)
+    return escolhidos
@@ -0,0 +1,248 @@
+# delegacias.py
+# Base local de delegacias com índice espacial (KD-tree) para encontrar as mais
+# próximas de um endereço sem chamar LLM nem API de busca.
+#
+# Os arquivos em dados/ são uma amostra inicial com coordenadas aproximadas;
+# devem ser substituídos pela base oficial (ex.: SSP) antes do uso em produção.
+
+import os
+import re
+import csv
+import math
+import heapq
+import functools
+from serper import normalizar_endereco
+
+ARQUIVO_DELEGACIAS = os.environ.get("ARQUIVO_DELEGACIAS", os.path.join("dados", "delegacias.csv"))
+ARQUIVO_BAIRROS = os.environ.get("ARQUIVO_BAIRROS", os.path.join("dados", "bairros.csv"))
+RAIO_TERRA_KM = 6371.0
+# Acima dessa distância a base local não cobre o endereço e a busca online é usada
+DISTANCIA_MAXIMA_KM = float(os.environ.get("DELEGACIAS_DISTANCIA_MAXIMA_KM", "30"))
+
+# Siglas e nomes (normalizados) das UFs
+UFS = {
+    "AC": "acre", "AL": "alagoas", "AP": "amapa", "AM": "amazonas", "BA": "bahia", "CE": "ceara",
+    "DF": "distrito federal", "ES": "espirito santo", "GO": "goias", "MA": "maranhao", "MT": "mato grosso",
+    "MS": "mato grosso do sul", "MG": "minas gerais", "PA": "para", "PB": "paraiba", "PR": "parana",
+    "PE": "pernambuco", "PI": "piaui", "RJ": "rio de janeiro", "RN": "rio grande do norte",
+    "RS": "rio grande do sul", "RO": "rondonia", "RR": "roraima", "SC": "santa catarina",
+    "SP": "sao paulo", "SE": "sergipe", "TO": "tocantins"
+}
+# Capitais e grandes cidades, para reconhecer endereços fora da área coberta pela base
+CIDADES_CONHECIDAS = {
+    "rio branco": "AC", "maceio": "AL", "macapa": "AP", "manaus": "AM", "salvador": "BA", "fortaleza": "CE",
+    "brasilia": "DF", "vitoria": "ES", "goiania": "GO", "sao luis": "MA", "cuiaba": "MT", "campo grande": "MS",
+    "belo horizonte": "MG", "belem": "PA", "joao pessoa": "PB", "curitiba": "PR", "recife": "PE", "teresina": "PI",
+    "rio de janeiro": "RJ", "natal": "RN", "porto alegre": "RS", "porto velho": "RO", "boa vista": "RR",
+    "florianopolis": "SC", "sao paulo": "SP", "aracaju": "SE", "palmas": "TO", "campinas": "SP",
+    "guarulhos": "SP", "santos": "SP", "osasco": "SP", "sao bernardo do campo": "SP", "santo andre": "SP",
+    "niteroi": "RJ", "sao goncalo": "RJ", "duque de caxias": "RJ", "nova iguacu": "RJ", "contagem": "MG",
+    "uberlandia": "MG", "juiz de fora": "MG", "feira de santana": "BA", "jaboatao dos guararapes": "PE",
+    "londrina": "PR", "joinville": "SC", "caxias do sul": "RS", "aparecida de goiania": "GO", "ananindeua": "PA"
+}
+# Sigla da UF no fim do endereço: "..., Belo Horizonte - MG", "Salvador/BA", "Recife, PE, Brasil"
+_UF_NO_FIM = re.compile(r"(?:^|[\s,/-])([A-Z]{2})\s*(?:[,-]\s*brasil\s*)?[.\s]*$", re.IGNORECASE)
+# Bairro logo depois de um tipo de logradouro é parte do nome da rua ("Rua da Liberdade")
+_LOGRADOURO_ANTES = re.compile(r"(?:^| )(?:rua|r|avenida|av|travessa|tv|alameda|al|praca|estrada|rodovia|largo|viela)(?: (?:da|de|do|das|dos))? $")
+
+PROMPT_MENSAGEM = """Você é um agente de suporte a vítimas, muito direto ao ponto.
+Escreva uma mensagem curta recomendando que a pessoa preste queixa e liste as delegacias abaixo,
+priorizando as Delegacias de Defesa da Mulher. Não invente delegacias que não estejam na lista.
+
+Delegacias mais próximas de {endereco}:
+{lista}"""
+
+def distancia_km(lat1, lon1, lat2, lon2):
+    fi1, fi2 = math.radians(lat1), math.radians(lat2)
+    dfi = fi2 - fi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dfi / 2) ** 2 + math.cos(fi1) * math.cos(fi2) * math.sin(dlambda / 2) ** 2
+    return 2 * RAIO_TERRA_KM * math.asin(math.sqrt(a))
+
+class KDTree:
+    """
+    KD-tree em duas dimensões sobre coordenadas projetadas em km
+    (projeção equirretangular local, adequada para distâncias dentro de uma cidade).
+    """
+
+    def __init__(self, pontos):
+        self.lat_referencia = math.radians(sum(p[0] for p in pontos) / len(pontos)) if pontos else 0.0
+        itens = [(self._projetar(lat, lon), i) for i, (lat, lon) in enumerate(pontos)]
+        self.raiz = self._construir(itens, 0)
+
+    def _projetar(self, lat, lon):
+        return (
+            math.radians(lon) * math.cos(self.lat_referencia) * RAIO_TERRA_KM,
+            math.radians(lat) * RAIO_TERRA_KM
+        )
+
+    def _construir(self, itens, eixo):
+        if not itens:
+            return None
+        itens.sort(key=lambda item: item[0][eixo])
+        meio = len(itens) // 2
+        return (
+            itens[meio],
+            eixo,
+            self._construir(itens[:meio], 1 - eixo),
+            self._construir(itens[meio + 1:], 1 - eixo)
+        )
+
+    # Devolve os índices dos k pontos mais próximos, do mais perto para o mais longe
+    def vizinhos(self, lat, lon, k):
+        alvo = self._projetar(lat, lon)
+        melhores = []  # heap de (-distância², índice)
+
+        def visitar(no):
+            if no is None:
+                return
+            (ponto, indice), eixo, esquerda, direita = no
+            d2 = (ponto[0] - alvo[0]) ** 2 + (ponto[1] - alvo[1]) ** 2
+            if len(melhores) < k:
+                heapq.heappush(melhores, (-d2, indice))
+            elif d2 < -melhores[0][0]:
+                heapq.heapreplace(melhores, (-d2, indice))
+            diferenca = alvo[eixo] - ponto[eixo]
+            perto, longe = (esquerda, direita) if diferenca < 0 else (direita, esquerda)
+            visitar(perto)
+            if len(melhores) < k or diferenca ** 2 < -melhores[0][0]:
+                visitar(longe)
+
+        visitar(self.raiz)
+        return [indice for _, indice in sorted(melhores, key=lambda item: -item[0])]
+
+def _ler_csv(caminho):
+    with open(caminho, encoding="utf-8", newline="") as f:
+        return list(csv.DictReader(f))
+
+class BaseDelegacias:
+    def __init__(self, delegacias, bairros):
+        self.delegacias = [
+            {
+                "nome": d["nome"],
+                "endereco": d["endereco"],
+                "bairro": d["bairro"],
+                "cidade": d["cidade"],
+                "uf": d["uf"],
+                "latitude": float(d["latitude"]),
+                "longitude": float(d["longitude"]),
+                "deam": d["deam"] == "1"
+            }
+            for d in delegacias
+        ]
+        self.arvore = KDTree([(d["latitude"], d["longitude"]) for d in self.delegacias])
+        # Bairros normalizados, com a cidade e a UF de cada um
+        self.bairros = [
+            (normalizar_endereco(b["bairro"]), normalizar_endereco(b["cidade"]), b["uf"].upper(), float(b["latitude"]), float(b["longitude"]))
+            for b in bairros
+        ]
+        self.cidades = {(cidade, uf) for _, cidade, uf, _, _ in self.bairros}
+        self.cidades |= {(normalizar_endereco(d["cidade"]), d["uf"].upper()) for d in self.delegacias}
+        self.ufs = {uf for _, uf in self.cidades}
+        self._nomes_bairros = {nome for nome, *_ in self.bairros}
+
+    # UF informada no endereço, pela sigla no final ou pelo nome do estado
+    def _uf(self, endereco, texto):
+        sigla = _UF_NO_FIM.search(endereco.strip())
+        if sigla and sigla.group(1).upper() in UFS and sigla.group(1).isupper():
+            return sigla.group(1).upper()
+        for uf, nome in UFS.items():
+            # "são paulo" e "rio de janeiro" também são cidades; a UF é a mesma
+            if f" {nome} " in texto:
+                return uf
+        return None
+
+    # Cidades citadas no endereço: as da base e as conhecidas de fora dela. Um nome que
+    # também é bairro da base ("Campo Grande") não conta como cidade de fora.
+    def _cidades(self, texto):
+        citadas = {(cidade, uf) for cidade, uf in self.cidades if f" {cidade} " in texto}
+        citadas |= {
+            (cidade, uf) for cidade, uf in CIDADES_CONHECIDAS.items()
+            if f" {cidade} " in texto and cidade not in self._nomes_bairros
+        }
+        return citadas
+
+    # Ocorrência mais à direita do bairro que não seja parte do nome da rua
+    @staticmethod
+    def _posicao_bairro(texto, nome):
+        for ocorrencia in reversed([m.start() for m in re.finditer(f"(?= {re.escape(nome)} )", texto)]):
+            if not _LOGRADOURO_ANTES.search(texto[:ocorrencia + 1]):
+                return ocorrencia
+        return -1
+
+    # Converte o endereço digitado em coordenadas: aceita "lat, lon" ou um bairro conhecido.
+    # Os bairros só são procurados quando o endereço cita uma cidade coberta pela base,
+    # e só dentro dela: "Liberdade, Sorocaba" ou só "Liberdade" não podem virar o bairro
+    # de São Paulo. Nos outros casos devolve None para o chamador buscar online.
+    def localizar(self, endereco):
+        numeros = endereco.replace(";", ",").split(",")
+        if len(numeros) == 2:
+            try:
+                lat, lon = float(numeros[0]), float(numeros[1])
+                if -90 <= lat <= 90 and -180 <= lon <= 180:
+                    return lat, lon
+            except ValueError:
+                pass
+        texto = f" {normalizar_endereco(endereco)} "
+        uf = self._uf(endereco, texto)
+        if uf is not None and uf not in self.ufs:
+            return None
+        cidades = {(cidade, u) for cidade, u in self._cidades(texto) if uf is None or u == uf}
+        cobertas = cidades & self.cidades
+        if not cobertas:
+            return None
+        # Em "Av. Santo Amaro, 100 - Vila Olímpia" o bairro vem depois da rua,
+        # então vale a ocorrência mais à direita
+        melhor = None
+        for nome, cidade, uf_bairro, lat, lon in self.bairros:
+            if (cidade, uf_bairro) not in cobertas:
+                continue
+            posicao = self._posicao_bairro(texto, nome)
+            if posicao >= 0 and (melhor is None or posicao > melhor[0]):
+                melhor = (posicao, lat, lon)
+        return melhor[1:] if melhor else None
+
+    def mais_proximas(self, lat, lon, k=5):
+        resultado = []
+        for indice in self.arvore.vizinhos(lat, lon, k):
+            delegacia = dict(self.delegacias[indice])
+            delegacia["distancia_km"] = distancia_km(lat, lon, delegacia["latitude"], delegacia["longitude"])
+            resultado.append(delegacia)
+        return resultado
+
+@functools.lru_cache(maxsize=1)
+def get_base_delegacias(arquivo_delegacias=ARQUIVO_DELEGACIAS, arquivo_bairros=ARQUIVO_BAIRROS):
+    return BaseDelegacias(_ler_csv(arquivo_delegacias), _ler_csv(arquivo_bairros))
+
+# Busca determinística na base local. Devolve None quando o endereço não é reconhecido
+# ou fica fora da área coberta (nenhuma delegacia a até DISTANCIA_MAXIMA_KM), para que
+# o chamador use a busca online como alternativa.
+def buscar_delegacias_offline(endereco, k=5, distancia_maxima_km=DISTANCIA_MAXIMA_KM):
+    base = get_base_delegacias()
+    coordenadas = base.localizar(endereco)
+    if coordenadas is None:
+        return None
+    delegacias = [d for d in base.mais_proximas(*coordenadas, k=k) if d["distancia_km"] <= distancia_maxima_km]
+    return delegacias or None
+
+def formatar_delegacias(delegacias):
+    linhas = []
+    for d in delegacias:
+        tipo = " (Delegacia de Defesa da Mulher)" if d["deam"] else ""
+        endereco = f"{d['endereco']}, {d['cidade']} - {d['uf']}"
+        google_maps_link = f"https://www.google.com/maps?q={endereco.replace(' ', '+')}"
+        linhas.append(
+            f"**{d['nome']}**{tipo}\n\n"
+            f"Endereço: {endereco} — aprox. {d['distancia_km']:.1f} km\n\n"
+            f"[Abrir no Google Maps]({google_maps_link})"
+        )
+    return "\n\n---\n\n".join(linhas)
+
+# Mensagem opcional escrita pelo LLM a partir da lista já calculada (uma única chamada)
+def escrever_mensagem_delegacias(endereco, delegacias):
+    from utils import get_llm
+    lista = "\n".join(
+        f"- {d['nome']}{' (DDM)' if d['deam'] else ''}: {d['endereco']}, {d['cidade']} ({d['distancia_km']:.1f} km)"
+        for d in delegacias
+    )
+    return get_llm().invoke(PROMPT_MENSAGEM.format(endereco=endereco, lista=lista)).content
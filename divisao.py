@@ -0,0 +1,202 @@
+# divisao.py
+# Divisão dos PDFs em chunks que respeitam a estrutura da lei: cada chunk é um
+# artigo (ou um grupo de artigos curtos), e artigos longos são quebrados entre
+# parágrafos e incisos, nunca no meio de um. Não há sobreposição entre chunks.
+# Textos sem artigos (cartilhas, reportagens) são divididos por parágrafos.
+
+import os
+import re
+import bisect
+import hashlib
+from collections import Counter
+from langchain_core.documents import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+# Muda quando a divisão muda, para o índice reprocessar os PDFs
+VERSAO = 2
+TAMANHO_MAXIMO = int(os.environ.get("DIVISAO_TAMANHO_MAXIMO", "1200"))
+# Artigos menores que isso são agrupados com os seguintes (até TAMANHO_MAXIMO)
+TAMANHO_MINIMO = int(os.environ.get("DIVISAO_TAMANHO_MINIMO", "300"))
+# Linhas presentes em pelo menos essa fração das páginas são cabeçalho/rodapé
+FRACAO_CABECALHO = 0.6
+
+# Cabeçalho de artigo: "Art. 22.", "Art. 1o", "Art. 24 -A."
+CABECALHO_ARTIGO = re.compile(r"(?m)^\s*Art\.\s*(\d+)\s*(?:o|º|°)?\s*(?:-\s*([A-Z])\b)?")
+CABECALHO_LEI = re.compile(r"\bLEI\s+N[º°o.]*\s*(\d{1,2}\.?\d{3})", re.IGNORECASE)
+# "TÍTULO IV", "CAPÍTULO II", "Seção I" seguidos do nome na linha de baixo
+_DIVISAO_ESTRUTURAL = re.compile(r"(?m)^[ \t]*((?:TÍTULO|CAPÍTULO|SEÇÃO|Seção)\s+[IVXLC]+(?:-[A-Z])?)[ \t]*\n(?:[ \t]*(?!Art\.)([^\n]{1,120}?)[ \t]*\n)?")
+# Início de parágrafo ou inciso dentro de um artigo
+_UNIDADE = re.compile(r"(?m)^\s*(?:§\s*\d+|Parágrafo único|[IVXLC]+\s+-)")
+
+# "Art. 24-A", "24 -a", "24" -> "24-A" / "24"
+def normalizar_artigo(valor):
+    encontrado = re.search(r"(\d+)\s*(?:o|º|°)?\s*(?:-\s*([a-zA-Z])\b)?", str(valor))
+    if not encontrado:
+        return str(valor)
+    return encontrado.group(1) + (f"-{encontrado.group(2).upper()}" if encontrado.group(2) else "")
+
+def artigo_do_cabecalho(cabecalho):
+    return normalizar_artigo(cabecalho.group(1) + (f"-{cabecalho.group(2)}" if cabecalho.group(2) else ""))
+
+# Remove linhas repetidas em quase todas as páginas (cabeçalhos e rodapés do site de origem)
+def remover_cabecalhos(textos_paginas):
+    if len(textos_paginas) < 3:
+        return textos_paginas
+    contagem = Counter(l.strip() for texto in textos_paginas for l in set(texto.splitlines()) if l.strip())
+    repetidas = {l for l, n in contagem.items() if n >= FRACAO_CABECALHO * len(textos_paginas)}
+    return ["\n".join(l for l in texto.splitlines() if l.strip() not in repetidas) for texto in textos_paginas]
+
+def _limpar(texto):
+    return "\n".join(l.strip() for l in texto.strip().splitlines() if l.strip())
+
+class DivisorJuridico:
+    """
+    Substitui o RecursiveCharacterTextSplitter: mesma interface split_documents(),
+    mas com chunks alinhados a artigos, parágrafos e incisos e sem sobreposição.
+
+    Parâmetros:
+    tamanho_maximo (int): Tamanho máximo de um chunk, em caracteres.
+    tamanho_minimo (int): Artigos menores que isso são agrupados com os seguintes.
+    """
+
+    def __init__(self, tamanho_maximo=TAMANHO_MAXIMO, tamanho_minimo=TAMANHO_MINIMO):
+        self.tamanho_maximo = tamanho_maximo
+        self.tamanho_minimo = tamanho_minimo
+        self._divisor_paragrafos = RecursiveCharacterTextSplitter(
+            chunk_size=tamanho_maximo,
+            chunk_overlap=0,
+            separators=["\n\n", "\n", ".", "!", "?", ";", ",", " "]
+        )
+
+    # Aceita as páginas de um ou mais PDFs (na ordem do PyPDFLoader)
+    def split_documents(self, paginas):
+        por_origem = {}
+        for pagina in paginas:
+            por_origem.setdefault(pagina.metadata.get("source"), []).append(pagina)
+        chunks = []
+        for origem, paginas_origem in por_origem.items():
+            chunks.extend(self.dividir_documento(paginas_origem))
+        return chunks
+
+    def dividir_documento(self, paginas):
+        textos = remover_cabecalhos([p.page_content for p in paginas])
+        # Texto corrido do documento e a posição onde cada página começa
+        inicios = []
+        partes = []
+        posicao = 0
+        for texto in textos:
+            inicios.append(posicao)
+            partes.append(texto)
+            posicao += len(texto) + 1
+        texto = "\n".join(partes)
+        base = dict(paginas[0].metadata) if paginas else {}
+        base.pop("page", None)
+
+        def pagina_de(posicao):
+            return paginas[max(bisect.bisect_right(inicios, posicao) - 1, 0)].metadata.get("page", 0)
+
+        lei = CABECALHO_LEI.search(texto)
+        if lei:
+            base["lei"] = lei.group(1)
+        cabecalhos = list(CABECALHO_ARTIGO.finditer(texto))
+        if len(cabecalhos) < 2:
+            pedacos = self._dividir_sem_artigos(texto)
+        else:
+            pedacos = self._dividir_artigos(texto, cabecalhos)
+
+        chunks = []
+        vistos = set()
+        for inicio, conteudo, artigos, secao in pedacos:
+            conteudo = _limpar(conteudo)
+            if not conteudo:
+                continue
+            # Trechos repetidos (ex.: o mesmo aviso em várias páginas) entram uma vez só
+            assinatura = hashlib.sha1(re.sub(r"\s+", " ", conteudo.lower()).encode("utf-8")).digest()
+            if assinatura in vistos:
+                continue
+            vistos.add(assinatura)
+            metadados = dict(base, page=pagina_de(inicio), artigos=artigos, artigo=artigos[0] if artigos else None)
+            if secao:
+                metadados["secao"] = secao
+            chunks.append(Document(page_content=conteudo, metadata=metadados))
+        return chunks
+
+    def _dividir_sem_artigos(self, texto):
+        pedacos = []
+        posicao = 0
+        for trecho in self._divisor_paragrafos.split_text(texto):
+            posicao = max(texto.find(trecho[:50], posicao), posicao)
+            pedacos.append((posicao, trecho, [], None))
+        return pedacos
+
+    # Devolve [(posição, texto, artigos, seção)] com artigos inteiros, agrupados ou quebrados
+    def _dividir_artigos(self, texto, cabecalhos):
+        # Títulos e capítulos saem do texto dos artigos e viram a seção dos chunks
+        divisoes = [(m.start(), m.end(), " - ".join(g for g in m.groups() if g)) for m in _DIVISAO_ESTRUTURAL.finditer(texto)]
+        limites = [c.start() for c in cabecalhos] + [len(texto)]
+
+        def sem_divisoes(inicio, fim):
+            trechos = []
+            posicao = inicio
+            for d_inicio, d_fim, _ in divisoes:
+                if d_fim <= inicio or d_inicio >= fim:
+                    continue
+                trechos.append(texto[posicao:max(d_inicio, posicao)])
+                posicao = min(d_fim, fim)
+            trechos.append(texto[posicao:fim])
+            return "".join(trechos)
+
+        def secao_em(posicao):
+            anteriores = [nome for d_inicio, _, nome in divisoes if d_inicio <= posicao]
+            return anteriores[-1] if anteriores else None
+
+        # Preâmbulo (ementa) antes do primeiro artigo
+        unidades = []
+        if sem_divisoes(0, limites[0]).strip():
+            unidades.append((0, sem_divisoes(0, limites[0]), [], None))
+        for cabecalho, inicio, fim in zip(cabecalhos, limites, limites[1:]):
+            unidades.extend(self._quebrar_artigo(inicio, sem_divisoes(inicio, fim), artigo_do_cabecalho(cabecalho), secao_em(inicio)))
+
+        # Junta artigos curtos consecutivos da mesma seção
+        pedacos = []
+        for unidade in unidades:
+            if pedacos:
+                anterior = pedacos[-1]
+                curtos = len(anterior[1]) < self.tamanho_minimo or len(unidade[1]) < self.tamanho_minimo
+                cabe = len(anterior[1]) + len(unidade[1]) <= self.tamanho_maximo
+                if curtos and cabe and anterior[3] == unidade[3] and anterior[2] and unidade[2]:
+                    artigos = anterior[2] + [a for a in unidade[2] if a not in anterior[2]]
+                    pedacos[-1] = (anterior[0], anterior[1].rstrip() + "\n" + unidade[1], artigos, anterior[3])
+                    continue
+            pedacos.append(unidade)
+        return pedacos
+
+    # Artigo longo: quebra entre parágrafos (§) e incisos; as partes seguintes
+    # recebem uma linha "Art. N (continuação)" para não perder a referência
+    def _quebrar_artigo(self, inicio, texto_artigo, artigo, secao):
+        if len(texto_artigo) <= self.tamanho_maximo:
+            return [(inicio, texto_artigo, [artigo], secao)]
+        cortes = [0] + [m.start() for m in _UNIDADE.finditer(texto_artigo) if m.start() > 0] + [len(texto_artigo)]
+        unidades = [texto_artigo[a:b] for a, b in zip(cortes, cortes[1:])]
+        partes = []
+        atual = ""
+        posicao_atual = inicio
+        posicao = inicio
+        for unidade in unidades:
+            if atual and len(atual) + len(unidade) > self.tamanho_maximo:
+                partes.append((posicao_atual, atual))
+                atual = ""
+                posicao_atual = posicao
+            atual += unidade
+            posicao += len(unidade)
+        if atual:
+            partes.append((posicao_atual, atual))
+
+        pedacos = []
+        for numero, (posicao_parte, parte) in enumerate(partes):
+            if numero:
+                parte = f"Art. {artigo} (continuação)\n" + parte
+            # Uma unidade sozinha maior que o limite (inciso muito longo) é quebrada por frases
+            trechos = self._divisor_paragrafos.split_text(parte) if len(parte) > self.tamanho_maximo else [parte]
+            pedacos.extend((posicao_parte, trecho, [artigo], secao) for trecho in trechos)
+        return pedacos
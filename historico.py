@@ -0,0 +1,137 @@
+# historico.py
+# Histórico da conversa com orçamento de tokens: os últimos turnos vão
+# literalmente no prompt e os mais antigos são compactados em um resumo.
+
+import os
+from collections import deque
+
+TURNOS_RECENTES = int(os.environ.get("HISTORICO_TURNOS_RECENTES", "3"))
+ORCAMENTO_TOKENS = int(os.environ.get("HISTORICO_ORCAMENTO_TOKENS", "1500"))
+
+PROMPT_RESUMO = """Você está resumindo uma conversa entre uma pessoa que busca ajuda e Maria, assistente sobre a Lei Maria da Penha.
+Atualize o resumo abaixo incluindo as novas mensagens. Preserve fatos sobre a situação da vítima (pessoas envolvidas,
+tipos de violência, datas, locais, riscos, medidas já orientadas). Escreva no máximo {limite_palavras} palavras.
+
+Resumo atual:
+{resumo}
+
+Novas mensagens:
+{mensagens}
+
+Resumo atualizado:"""
+
+# Estimativa simples de tokens (~4 caracteres por token), suficiente para controlar o orçamento
+def contar_tokens(texto):
+    return (len(texto) + 3) // 4
+
+def formatar_mensagem(mensagem):
+    return f"{mensagem['role']}: {mensagem['content']}"
+
+def _cortar_para_tokens(texto, limite_tokens):
+    limite_caracteres = max(limite_tokens, 0) * 4
+    if len(texto) <= limite_caracteres:
+        return texto
+    # Mantém o final, que tem as informações mais recentes
+    return "..." + texto[len(texto) - limite_caracteres + 3:]
+
+# Divide um texto em trechos de até limite_tokens, sem quebrar linhas (mensagens)
+# que caibam inteiras em um trecho
+def dividir_em_trechos(texto, limite_tokens):
+    limite_caracteres = max(limite_tokens, 1) * 4
+    trechos = []
+    atual = []
+    tamanho = 0
+    for linha in texto.splitlines():
+        # Uma linha sozinha maior que o limite é cortada em pedaços do tamanho máximo
+        pedacos = [linha[i:i + limite_caracteres] for i in range(0, len(linha), limite_caracteres)] or [""]
+        for pedaco in pedacos:
+            if atual and tamanho + len(pedaco) + 1 > limite_caracteres:
+                trechos.append("\n".join(atual))
+                atual, tamanho = [], 0
+            atual.append(pedaco)
+            tamanho += len(pedaco) + 1
+    if any(l.strip() for l in atual):
+        trechos.append("\n".join(atual))
+    return trechos
+
+# Resumidor padrão: pede ao LLM para atualizar o resumo
+def resumir_com_llm(resumo, mensagens, limite_tokens):
+    from utils import get_llm
+    prompt = PROMPT_RESUMO.format(
+        limite_palavras=max(limite_tokens * 3 // 4, 30),
+        resumo=resumo or "(vazio)",
+        mensagens="\n".join(formatar_mensagem(m) for m in mensagens)
+    )
+    return get_llm().invoke(prompt).content.strip()
+
+# Resumidor sem LLM: junta as mensagens e mantém apenas o que cabe no orçamento
+def resumir_por_corte(resumo, mensagens, limite_tokens):
+    texto = "\n".join([resumo] + [formatar_mensagem(m) for m in mensagens]).strip()
+    return _cortar_para_tokens(texto, limite_tokens)
+
+class HistoricoConversa:
+    """
+    Parâmetros:
+    mensagens (list): Mensagens da conversa ({"role", "content"}), da mais antiga à mais nova.
+    resumo (str): Resumo já feito das primeiras mensagens, ao restaurar um histórico salvo.
+    compactadas (int): Quantas das primeiras mensagens já estão no resumo (são ignoradas).
+    """
+
+    def __init__(self, mensagens=(), turnos_recentes=TURNOS_RECENTES, orcamento_tokens=ORCAMENTO_TOKENS, resumidor=resumir_com_llm,
+                 resumo="", compactadas=0):
+        self.max_recentes = turnos_recentes * 2
+        self.orcamento_tokens = orcamento_tokens
+        self.resumidor = resumidor
+        self.resumo = resumo
+        # Mensagens já incorporadas ao resumo; com o resumo, é o que basta guardar para restaurar o histórico
+        self.compactadas = compactadas
+        self.recentes = deque()
+        self._pendentes = []
+        for mensagem in mensagens[compactadas:]:
+            self.adicionar(mensagem["role"], mensagem["content"])
+
+    # Adiciona uma mensagem; as que saem da janela de turnos recentes aguardam compactação
+    def adicionar(self, role, content):
+        self.recentes.append({"role": role, "content": content})
+        while len(self.recentes) > self.max_recentes:
+            self._pendentes.append(self.recentes.popleft())
+
+    def _tokens_recentes(self):
+        return sum(contar_tokens(formatar_mensagem(m)) + 1 for m in self.recentes)
+
+    # Incorpora ao resumo as mensagens que saíram da janela. Chamado depois que a resposta
+    # já foi exibida, para não atrasar o turno atual.
+    def compactar(self):
+        if not self._pendentes:
+            return
+        limite = max(self.orcamento_tokens - self._tokens_recentes(), self.orcamento_tokens // 4)
+        try:
+            resumo = self.resumidor(self.resumo, self._pendentes, limite)
+        except Exception:
+            resumo = resumir_por_corte(self.resumo, self._pendentes, limite)
+        self.resumo = _cortar_para_tokens(resumo, limite)
+        self.compactadas += len(self._pendentes)
+        self._pendentes = []
+
+    # Texto do histórico enviado no prompt, sempre dentro do orçamento de tokens
+    def texto(self):
+        linhas = [formatar_mensagem(m) for m in self.recentes]
+        # Se os turnos recentes sozinhos estouram o orçamento, os mais antigos saem primeiro;
+        # uma última mensagem maior que o orçamento inteiro é cortada, mantendo o final
+        while len(linhas) > 1 and sum(contar_tokens(l) + 1 for l in linhas) > self.orcamento_tokens:
+            linhas.pop(0)
+        if linhas and contar_tokens(linhas[0]) + 1 > self.orcamento_tokens:
+            linhas[0] = _cortar_para_tokens(linhas[0], self.orcamento_tokens - 1)
+        prefixo = "Resumo da conversa anterior: "
+        restante = self.orcamento_tokens - sum(contar_tokens(l) + 1 for l in linhas) - contar_tokens(prefixo) - 1
+        partes = []
+        resumo = self.resumo
+        if self._pendentes:
+            resumo = resumir_por_corte(resumo, self._pendentes, restante)
+        if resumo and restante > 0:
+            partes.append(prefixo + _cortar_para_tokens(resumo, restante))
+        partes.extend(linhas)
+        return "\n".join(partes)
+
+    def tokens(self):
+        return contar_tokens(self.texto())
@@ -0,0 +1,234 @@
+# indice.py
+
+import os
+import json
+import pickle
+import hashlib
+import faiss
+import numpy as np
+import streamlit as st
+from langchain_community.document_loaders import PyPDFLoader
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from servico_embeddings import get_servico_embeddings
+from divisao import DivisorJuridico, VERSAO as VERSAO_DIVISAO
+
+PASTA_INDICE = os.environ.get("PASTA_INDICE", "indice_faiss")
+ARQUIVO_MANIFESTO = "manifesto.json"
+PASTA_VETORES = "documentos"
+# Formato dos vetores no índice: float32, float16 ou int8
+FORMATO_VETORES = os.environ.get("FORMATO_VETORES", "float32")
+# Com mmap, os workers que abrem o mesmo arquivo de índice compartilham as páginas em memória
+INDICE_MMAP = os.environ.get("INDICE_MMAP", "1") == "1"
+# Quantização do FAISS de cada formato compacto (float32 fica sem quantização)
+QUANTIZACAO = {"float16": faiss.ScalarQuantizer.QT_fp16, "int8": faiss.ScalarQuantizer.QT_8bit_uniform}
+
+# Função para calcular o hash do conteúdo de um PDF
+def calcular_hash_arquivo(arquivo_pdf):
+    sha = hashlib.sha256()
+    with open(arquivo_pdf, "rb") as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+# Hash combinado de todos os PDFs (nome + conteúdo)
+def calcular_hash_pdfs(arquivos_pdf):
+    sha = hashlib.sha256()
+    for arquivo_pdf in sorted(arquivos_pdf):
+        sha.update(os.path.basename(arquivo_pdf).encode("utf-8"))
+        sha.update(calcular_hash_arquivo(arquivo_pdf).encode("ascii"))
+    return sha.hexdigest()
+
+# Modelo de embeddings compartilhado por todas as sessões do processo
+def get_embeddings():
+    return get_servico_embeddings()
+
+# Chunks por artigo/parágrafo/inciso, sem sobreposição
+def get_text_splitter():
+    return DivisorJuridico()
+
+# Função para gerar os chunks de um PDF
+def dividir_pdf(arquivo_pdf, text_splitter=None):
+    text_splitter = text_splitter or get_text_splitter()
+    return text_splitter.split_documents(PyPDFLoader(arquivo_pdf).load())
+
+def ler_manifesto(pasta=PASTA_INDICE):
+    caminho = os.path.join(pasta, ARQUIVO_MANIFESTO)
+    if not os.path.exists(caminho):
+        return {"documentos": {}}
+    with open(caminho, encoding="utf-8") as f:
+        return json.load(f)
+
+def salvar_manifesto(manifesto, pasta=PASTA_INDICE):
+    caminho = os.path.join(pasta, ARQUIVO_MANIFESTO)
+    with open(caminho + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, ensure_ascii=False, indent=2)
+    os.replace(caminho + ".tmp", caminho)
+
+# Salva os chunks e vetores de um documento, para remontar o índice sem recalcular embeddings
+def salvar_entrada(pasta, chave, textos, metadados, vetores):
+    pasta_vetores = os.path.join(pasta, PASTA_VETORES)
+    os.makedirs(pasta_vetores, exist_ok=True)
+    np.save(os.path.join(pasta_vetores, f"{chave}.npy"), np.asarray(vetores, dtype="float32"))
+    with open(os.path.join(pasta_vetores, f"{chave}.json"), "w", encoding="utf-8") as f:
+        json.dump({"textos": textos, "metadados": metadados}, f, ensure_ascii=False)
+
+def ler_entrada(pasta, chave):
+    pasta_vetores = os.path.join(pasta, PASTA_VETORES)
+    vetores = np.load(os.path.join(pasta_vetores, f"{chave}.npy"))
+    with open(os.path.join(pasta_vetores, f"{chave}.json"), encoding="utf-8") as f:
+        dados = json.load(f)
+    return dados["textos"], dados["metadados"], vetores
+
+def remover_entrada(pasta, chave):
+    for extensao in (".npy", ".json"):
+        caminho = os.path.join(pasta, PASTA_VETORES, chave + extensao)
+        if os.path.exists(caminho):
+            os.remove(caminho)
+
+# Chave do documento: muda se o nome ou o conteúdo mudar, e não colide entre PDFs iguais
+def chave_documento(nome, hash_arquivo):
+    return hashlib.sha256(f"{nome}:{hash_arquivo}".encode("utf-8")).hexdigest()[:16]
+
+def ids_chunks(chave, quantidade):
+    return [f"{chave}-{i}" for i in range(quantidade)]
+
+# Cria um índice FAISS vazio no formato configurado
+def novo_faiss(embeddings, dimensao, formato=None):
+    formato = formato or FORMATO_VETORES
+    if formato == "float32":
+        index = faiss.IndexFlatL2(dimensao)
+    elif formato in QUANTIZACAO:
+        index = faiss.IndexScalarQuantizer(dimensao, QUANTIZACAO[formato], faiss.METRIC_L2)
+        # Os embeddings do MiniLM são normalizados, então cada componente fica em [-1, 1]
+        index.train(np.array([[-1.0] * dimensao, [1.0] * dimensao], dtype="float32"))
+    else:
+        raise ValueError(f"Formato de vetores desconhecido: {formato}")
+    return FAISS(embeddings, index, InMemoryDocstore(), {})
+
+# Adiciona ao índice os vetores já calculados de um documento
+def adicionar_ao_indice(vectors, embeddings, textos, metadados, vetores, ids):
+    if not textos:
+        return vectors
+    pares = list(zip(textos, [list(map(float, v)) for v in vetores]))
+    if vectors is None:
+        vectors = novo_faiss(embeddings, len(pares[0][1]))
+    vectors.add_embeddings(pares, metadatas=metadados, ids=ids)
+    return vectors
+
+# Salva o índice em arquivos temporários e troca de uma vez, para não corromper
+# o arquivo que outros workers estão lendo via mmap
+def salvar_faiss(vectors, pasta=PASTA_INDICE):
+    caminho_index = os.path.join(pasta, "index.faiss")
+    caminho_pkl = os.path.join(pasta, "index.pkl")
+    faiss.write_index(vectors.index, caminho_index + ".tmp")
+    with open(caminho_pkl + ".tmp", "wb") as f:
+        pickle.dump((vectors.docstore, vectors.index_to_docstore_id), f)
+    os.replace(caminho_index + ".tmp", caminho_index)
+    os.replace(caminho_pkl + ".tmp", caminho_pkl)
+
+# Lê um índice do FAISS; com mmap ele fica somente leitura
+def ler_index_faiss(caminho, mmap=False):
+    if mmap:
+        flag_mmap = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+        return faiss.read_index(caminho, flag_mmap | faiss.IO_FLAG_READ_ONLY)
+    return faiss.read_index(caminho)
+
+# Abre o índice salvo; com mmap ele fica somente leitura
+def carregar_faiss(pasta, embeddings, mmap=False):
+    index = ler_index_faiss(os.path.join(pasta, "index.faiss"), mmap)
+    with open(os.path.join(pasta, "index.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+# Remonta o índice a partir das entradas do manifesto, sem recalcular embeddings
+def remontar_indice(manifesto, embeddings, pasta=PASTA_INDICE):
+    vectors = None
+    for doc in manifesto["documentos"].values():
+        textos, metadados, vetores = ler_entrada(pasta, doc["chave"])
+        vectors = adicionar_ao_indice(vectors, embeddings, textos, metadados, vetores, doc["ids"])
+    return vectors
+
+def _indice_salvo_existe(pasta):
+    return os.path.exists(os.path.join(pasta, "index.faiss")) and os.path.exists(os.path.join(pasta, "index.pkl"))
+
+# Abre o índice salvo para edição ou, se ele não existir ou estiver em outro
+# formato, remonta a partir do manifesto
+def abrir_indice(manifesto, embeddings, pasta=PASTA_INDICE):
+    if _indice_salvo_existe(pasta) and manifesto.get("formato", "float32") == FORMATO_VETORES:
+        return carregar_faiss(pasta, embeddings)
+    return remontar_indice(manifesto, embeddings, pasta)
+
+# Compara os PDFs atuais com o manifesto e devolve (atuais, removidos, alterados).
+# Se a divisão em chunks mudou desde a última indexação, todos contam como alterados.
+def calcular_diferencas(manifesto, arquivos_pdf):
+    documentos = manifesto["documentos"]
+    atuais = {os.path.basename(a): (a, calcular_hash_arquivo(a)) for a in arquivos_pdf}
+    removidos = [nome for nome in documentos if nome not in atuais]
+    if manifesto.get("divisao") != VERSAO_DIVISAO:
+        return atuais, removidos, list(atuais)
+    alterados = [nome for nome, (_, h) in atuais.items() if documentos.get(nome, {}).get("hash") != h]
+    return atuais, removidos, alterados
+
+# Tira do índice e do manifesto os chunks dos documentos informados
+def remover_documentos(vectors, manifesto, nomes, pasta=PASTA_INDICE):
+    documentos = manifesto["documentos"]
+    ids_remover = [i for nome in nomes for i in documentos.get(nome, {}).get("ids", [])]
+    if vectors is not None and ids_remover:
+        vectors.delete(ids_remover)
+    for nome in nomes:
+        if nome in documentos:
+            remover_entrada(pasta, documentos.pop(nome)["chave"])
+
+# Registra no índice e no manifesto um documento já dividido e com embeddings calculados
+def registrar_documento(vectors, embeddings, manifesto, nome, hash_arquivo, textos, metadados, vetores, pasta=PASTA_INDICE):
+    chave = chave_documento(nome, hash_arquivo)
+    ids = ids_chunks(chave, len(textos))
+    salvar_entrada(pasta, chave, textos, metadados, vetores)
+    manifesto["documentos"][nome] = {"hash": hash_arquivo, "chave": chave, "ids": ids}
+    return adicionar_ao_indice(vectors, embeddings, textos, metadados, vetores, ids)
+
+def salvar_indice(vectors, manifesto, arquivos_pdf, pasta=PASTA_INDICE):
+    if vectors is not None:
+        salvar_faiss(vectors, pasta)
+    manifesto["hash"] = calcular_hash_pdfs(arquivos_pdf)
+    manifesto["formato"] = FORMATO_VETORES
+    manifesto["divisao"] = VERSAO_DIVISAO
+    salvar_manifesto(manifesto, pasta)
+
+# Atualiza o índice de forma incremental: só os PDFs novos ou alterados são processados
+# e os chunks de PDFs removidos saem do índice. Com carregar=False só os arquivos são
+# atualizados e nada é aberto (para quem monta a própria busca a partir do manifesto).
+def atualizar_indice(arquivos_pdf, pasta=PASTA_INDICE, embeddings=None, carregar=True):
+    embeddings = embeddings or get_embeddings()
+    os.makedirs(pasta, exist_ok=True)
+    manifesto = ler_manifesto(pasta)
+    atuais, removidos, alterados = calcular_diferencas(manifesto, arquivos_pdf)
+    atualizado = _indice_salvo_existe(pasta) and manifesto.get("formato", "float32") == FORMATO_VETORES
+
+    if not removidos and not alterados and atualizado:
+        return carregar_faiss(pasta, embeddings, mmap=INDICE_MMAP) if carregar else None
+
+    vectors = abrir_indice(manifesto, embeddings, pasta)
+    remover_documentos(vectors, manifesto, removidos + alterados, pasta)
+    text_splitter = get_text_splitter()
+    for nome in alterados:
+        arquivo_pdf, hash_arquivo = atuais[nome]
+        chunks = dividir_pdf(arquivo_pdf, text_splitter)
+        textos = [c.page_content for c in chunks]
+        metadados = [c.metadata for c in chunks]
+        vetores = embeddings.embed_documents(textos)
+        vectors = registrar_documento(vectors, embeddings, manifesto, nome, hash_arquivo, textos, metadados, vetores, pasta)
+
+    salvar_indice(vectors, manifesto, arquivos_pdf, pasta)
+    if vectors is None or not carregar:
+        return None
+    return carregar_faiss(pasta, embeddings, mmap=INDICE_MMAP)
+
+# Cache do processo: o hash faz parte da chave, então uma mudança nos PDFs gera um novo índice
+@st.cache_resource(show_spinner=False)
+def _carregar_indice_cache(hash_pdfs, arquivos_pdf):
+    return atualizar_indice(list(arquivos_pdf))
+
+def carregar_indice(arquivos_pdf):
+    return _carregar_indice_cache(calcular_hash_pdfs(arquivos_pdf), tuple(sorted(arquivos_pdf)))
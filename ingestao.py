@@ -0,0 +1,176 @@
+# ingestao.py
+# Indexação offline dos PDFs, fora do Streamlit:
+#   python ingestao.py --pasta pdfs --indice indice_faiss --workers 4 --lote 64
+
+import os
+import sys
+import time
+import queue
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from langchain_community.document_loaders import PyPDFLoader
+from indice import (
+    PASTA_INDICE,
+    get_embeddings,
+    get_text_splitter,
+    ler_manifesto,
+    calcular_diferencas,
+    abrir_indice,
+    remover_documentos,
+    registrar_documento,
+    salvar_indice
+)
+
+_FIM = object()
+_text_splitter = None
+
+# Cada processo do pool cria o seu splitter uma única vez
+def _inicializar_worker():
+    global _text_splitter
+    _text_splitter = get_text_splitter()
+
+# Executado no pool: lê e divide um PDF, devolvendo só dados serializáveis
+def _processar_pdf(nome, arquivo_pdf, hash_arquivo):
+    paginas = PyPDFLoader(arquivo_pdf).load()
+    chunks = _text_splitter.split_documents(paginas)
+    return nome, hash_arquivo, len(paginas), [c.page_content for c in chunks], [c.metadata for c in chunks]
+
+def listar_pdfs(pasta):
+    return sorted(os.path.join(pasta, f) for f in os.listdir(pasta) if f.lower().endswith(".pdf"))
+
+# Lê os PDFs em paralelo e coloca cada documento dividido na fila.
+# Só `max_em_voo` PDFs ficam em processamento ao mesmo tempo, e a fila é limitada,
+# então a memória não cresce com o tamanho do acervo. Um PDF que não pode ser lido
+# fica registrado em estatisticas["falhas"] e não interrompe os demais.
+def _produzir(pendentes, fila, workers, estatisticas):
+    max_em_voo = workers * 2
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_inicializar_worker) as pool:
+            em_voo = {}
+            while pendentes or em_voo:
+                while pendentes and len(em_voo) < max_em_voo:
+                    nome, (arquivo_pdf, hash_arquivo) = pendentes.pop(0)
+                    em_voo[pool.submit(_processar_pdf, nome, arquivo_pdf, hash_arquivo)] = nome
+                prontos, _ = wait(em_voo, return_when=FIRST_COMPLETED)
+                for futuro in prontos:
+                    nome = em_voo.pop(futuro)
+                    try:
+                        resultado = futuro.result()
+                    except Exception as e:
+                        estatisticas["falhas"].append((nome, f"{type(e).__name__}: {e}"))
+                        continue
+                    estatisticas["paginas"] += resultado[2]
+                    fila.put(resultado)
+    finally:
+        # Sempre avisa o consumidor, senão ele fica esperando na fila para sempre
+        fila.put(_FIM)
+
+# Consome a fila calculando embeddings em lotes de tamanho fixo, misturando documentos
+def _consumir(fila, tamanho_lote, ao_concluir_documento, estatisticas):
+    embeddings = get_embeddings()
+    lote = []
+    documentos = {}
+
+    def processar_lote():
+        if not lote:
+            return
+        inicio = time.time()
+        vetores = embeddings.embed_documents([texto for _, _, texto in lote])
+        estatisticas["tempo_embeddings"] += time.time() - inicio
+        estatisticas["chunks"] += len(lote)
+        for (nome, posicao, _), vetor in zip(lote, vetores):
+            doc = documentos[nome]
+            doc["vetores"][posicao] = vetor
+            doc["faltando"] -= 1
+            if doc["faltando"] == 0:
+                ao_concluir_documento(documentos.pop(nome))
+        lote.clear()
+
+    def adicionar_documento(item):
+        nome, hash_arquivo, _, textos, metadados = item
+        documentos[nome] = {
+            "nome": nome, "hash": hash_arquivo, "textos": textos, "metadados": metadados,
+            "vetores": [None] * len(textos), "faltando": len(textos)
+        }
+        if not textos:
+            ao_concluir_documento(documentos.pop(nome))
+        for posicao, texto in enumerate(textos):
+            lote.append((nome, posicao, texto))
+            if len(lote) >= tamanho_lote:
+                processar_lote()
+
+    while True:
+        item = fila.get()
+        if item is _FIM:
+            break
+        if "erro" in estatisticas:
+            # Continua esvaziando a fila para o produtor não ficar bloqueado
+            continue
+        try:
+            adicionar_documento(item)
+        except Exception as e:
+            estatisticas["erro"] = e
+    if "erro" not in estatisticas:
+        processar_lote()
+
+def indexar(pasta_pdfs, pasta_indice=PASTA_INDICE, workers=None, tamanho_lote=64, tamanho_fila=8):
+    workers = workers or os.cpu_count() or 1
+    arquivos_pdf = listar_pdfs(pasta_pdfs)
+    embeddings = get_embeddings()
+    os.makedirs(pasta_indice, exist_ok=True)
+
+    manifesto = ler_manifesto(pasta_indice)
+    atuais, removidos, alterados = calcular_diferencas(manifesto, arquivos_pdf)
+    vectors = abrir_indice(manifesto, embeddings, pasta_indice)
+    remover_documentos(vectors, manifesto, removidos + alterados, pasta_indice)
+
+    estatisticas = {"paginas": 0, "chunks": 0, "documentos": 0, "tempo_embeddings": 0.0, "falhas": []}
+    estado = {"vectors": vectors}
+
+    def ao_concluir_documento(doc):
+        estado["vectors"] = registrar_documento(
+            estado["vectors"], embeddings, manifesto, doc["nome"], doc["hash"],
+            doc["textos"], doc["metadados"], doc["vetores"], pasta_indice
+        )
+        estatisticas["documentos"] += 1
+
+    fila = queue.Queue(maxsize=tamanho_fila)
+    inicio = time.time()
+    consumidor = threading.Thread(target=_consumir, args=(fila, tamanho_lote, ao_concluir_documento, estatisticas))
+    consumidor.start()
+    try:
+        _produzir([(nome, atuais[nome]) for nome in alterados], fila, workers, estatisticas)
+    finally:
+        consumidor.join()
+    if "erro" in estatisticas:
+        raise estatisticas["erro"]
+
+    # Os PDFs que falharam ficam fora do manifesto e são tentados de novo na próxima execução
+    falhas = {nome for nome, _ in estatisticas["falhas"]}
+    salvar_indice(estado["vectors"], manifesto, [a for a in arquivos_pdf if os.path.basename(a) not in falhas], pasta_indice)
+    estatisticas["removidos"] = len(removidos)
+    estatisticas["tempo_total"] = time.time() - inicio
+    return estatisticas
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Indexa os PDFs jurídicos no índice FAISS.")
+    parser.add_argument("--pasta", default="pdfs", help="Pasta com os PDFs")
+    parser.add_argument("--indice", default=PASTA_INDICE, help="Pasta do índice FAISS")
+    parser.add_argument("--workers", type=int, default=None, help="Processos para leitura dos PDFs")
+    parser.add_argument("--lote", type=int, default=64, help="Chunks por chamada de embeddings")
+    parser.add_argument("--fila", type=int, default=8, help="Documentos aguardando embeddings")
+    args = parser.parse_args(argv)
+
+    e = indexar(args.pasta, args.indice, args.workers, args.lote, args.fila)
+    tempo = max(e["tempo_total"], 1e-9)
+    print(f"Documentos indexados: {e['documentos']} (removidos: {e['removidos']})")
+    print(f"Páginas: {e['paginas']} | Chunks: {e['chunks']}")
+    print(f"Tempo total: {tempo:.2f}s (embeddings: {e['tempo_embeddings']:.2f}s)")
+    print(f"Páginas/s: {e['paginas'] / tempo:.1f} | Chunks/s: {e['chunks'] / tempo:.1f}")
+    for nome, erro in e["falhas"]:
+        print(f"Falha ao ler {nome}: {erro}", file=sys.stderr)
+    return 1 if e["falhas"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
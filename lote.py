@@ -0,0 +1,181 @@
+# lote.py
+# Geração de documentos de denúncia em lote a partir de um JSONL com um caso por linha:
+#   {"id": "opcional", "victim_name": "...", "relato": "..."}
+#
+#   python lote.py casos.jsonl --saida saida_lote --casos-simultaneos 2 --casos-por-minuto 10
+#
+# O progresso fica em <saida>/status.jsonl. Ao rodar de novo com a mesma saída,
+# os casos concluídos são pulados e os que já têm texto gerado só renderizam o PDF.
+
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+ARQUIVO_STATUS = "status.jsonl"
+# IDs só com esses caracteres viram o nome do arquivo como estão
+_ID_SEGURO = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+class LimitadorTaxa:
+    """Libera no máximo `por_minuto` inícios por minuto, espaçados igualmente."""
+
+    def __init__(self, por_minuto):
+        self.intervalo = 60.0 / por_minuto if por_minuto else 0.0
+        self._proximo = 0.0
+        self._lock = threading.Lock()
+
+    def aguardar(self):
+        if not self.intervalo:
+            return
+        with self._lock:
+            agora = time.monotonic()
+            espera = self._proximo - agora
+            self._proximo = max(agora, self._proximo) + self.intervalo
+        if espera > 0:
+            time.sleep(espera)
+
+class RegistroStatus:
+    """Manifesto append-only: a última linha de cada ID é o estado atual."""
+
+    def __init__(self, pasta):
+        self.caminho = os.path.join(pasta, ARQUIVO_STATUS)
+        self._lock = threading.Lock()
+
+    def ler(self):
+        estados = {}
+        if os.path.exists(self.caminho):
+            with open(self.caminho, encoding="utf-8") as f:
+                for linha in f:
+                    try:
+                        registro = json.loads(linha)
+                    except json.JSONDecodeError:
+                        # Última linha incompleta de uma execução interrompida
+                        continue
+                    estados[registro["id"]] = registro
+        return estados
+
+    def registrar(self, **registro):
+        registro["registrado_em"] = time.time()
+        with self._lock:
+            with open(self.caminho, "a", encoding="utf-8") as f:
+                f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+# IDs repetidos recebem um sufixo ("caso", "caso-2", ...), para cada caso ter os seus
+# arquivos e a sua linha no status
+def ler_casos(caminho):
+    casos = []
+    vistos = set()
+    with open(caminho, encoding="utf-8") as f:
+        for numero, linha in enumerate(f, start=1):
+            if not linha.strip():
+                continue
+            caso = json.loads(linha)
+            id_caso = str(caso.get("id") or f"{numero:05d}")
+            if id_caso in vistos:
+                original, sufixo = id_caso, 2
+                while f"{original}-{sufixo}" in vistos:
+                    sufixo += 1
+                id_caso = f"{original}-{sufixo}"
+                print(f"Linha {numero}: ID {original!r} repetido, usando {id_caso!r}", file=sys.stderr)
+            vistos.add(id_caso)
+            caso["id"] = id_caso
+            casos.append(caso)
+    return casos
+
+# Nome de arquivo do caso. O ID vem do JSONL de entrada: fora do padrão seguro
+# ("../x", "a/b"), vira um nome limpo com um hash do ID, sempre dentro da pasta de saída.
+# O ID original fica só no status.jsonl.
+def nome_arquivo(id_caso):
+    if _ID_SEGURO.fullmatch(id_caso):
+        return id_caso
+    limpo = re.sub(r"[^A-Za-z0-9_-]+", "_", id_caso).strip("_")[:40]
+    return f"{limpo or 'caso'}-{hashlib.sha256(id_caso.encode('utf-8')).hexdigest()[:12]}"
+
+def _escrever_atomico(caminho, dados, modo="wb"):
+    with open(caminho + ".tmp", modo) as f:
+        f.write(dados)
+    os.replace(caminho + ".tmp", caminho)
+
+# Executado no pool de processos
+def _renderizar_pdf(caminho_texto, caminho_pdf):
+    from pdf_dossie import gerar_pdf_conteudo
+    with open(caminho_texto, encoding="utf-8") as f:
+        texto = f.read()
+    _escrever_atomico(caminho_pdf, gerar_pdf_conteudo(texto))
+    return caminho_pdf
+
+def processar_lote(arquivo_casos, pasta_saida, casos_simultaneos=2, casos_por_minuto=10, processos_pdf=None):
+    from utils import executar_crew_denuncia
+
+    os.makedirs(pasta_saida, exist_ok=True)
+    registro = RegistroStatus(pasta_saida)
+    estados = registro.ler()
+    limitador = LimitadorTaxa(casos_por_minuto)
+    resumo = {"concluidos": 0, "pulados": 0, "erros": 0}
+    lock_resumo = threading.Lock()
+
+    def contar(chave):
+        with lock_resumo:
+            resumo[chave] += 1
+
+    with ProcessPoolExecutor(max_workers=processos_pdf) as pool_pdf:
+        def processar(caso):
+            id_caso = caso["id"]
+            caminho_texto = os.path.join(pasta_saida, f"{nome_arquivo(id_caso)}.txt")
+            caminho_pdf = os.path.join(pasta_saida, f"{nome_arquivo(id_caso)}.pdf")
+            estado = estados.get(id_caso, {}).get("status")
+
+            if estado == "concluido" and os.path.exists(caminho_pdf):
+                contar("pulados")
+                return
+            inicio = time.time()
+            # Com o texto já gerado (inclusive de um caso concluído cujo PDF sumiu), só o PDF é refeito
+            texto_pronto = estado in ("texto_gerado", "concluido") and os.path.exists(caminho_texto)
+            try:
+                if not texto_pronto:
+                    limitador.aguardar()
+                    resultado = executar_crew_denuncia(caso["victim_name"], caso["relato"])
+                    _escrever_atomico(caminho_texto, str(resultado), "w")
+                    registro.registrar(id=id_caso, status="texto_gerado", texto=os.path.basename(caminho_texto))
+                pool_pdf.submit(_renderizar_pdf, caminho_texto, caminho_pdf).result()
+                registro.registrar(
+                    id=id_caso, status="concluido", pdf=os.path.basename(caminho_pdf),
+                    tempo_s=round(time.time() - inicio, 3)
+                )
+                contar("concluidos")
+            except Exception as e:
+                registro.registrar(id=id_caso, status="erro", erro=str(e))
+                contar("erros")
+
+        with ThreadPoolExecutor(max_workers=casos_simultaneos) as pool_casos:
+            list(pool_casos.map(processar, ler_casos(arquivo_casos)))
+
+    return resumo
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera documentos de denúncia em lote a partir de um JSONL.")
+    parser.add_argument("casos", help="Arquivo JSONL com victim_name e relato em cada linha")
+    parser.add_argument("--saida", default="saida_lote", help="Pasta para os PDFs e o status.jsonl")
+    parser.add_argument("--casos-simultaneos", type=int, default=2, help="Crews executando ao mesmo tempo")
+    parser.add_argument("--casos-por-minuto", type=float, default=10, help="Limite de crews iniciados por minuto (0 = sem limite)")
+    parser.add_argument("--processos-pdf", type=int, default=None, help="Processos para renderizar os PDFs")
+    args = parser.parse_args(argv)
+
+    inicio = time.time()
+    resumo = processar_lote(args.casos, args.saida, args.casos_simultaneos, args.casos_por_minuto, args.processos_pdf)
+    print(
+        f"Concluídos: {resumo['concluidos']} | Já existentes: {resumo['pulados']} | "
+        f"Erros: {resumo['erros']} | Tempo: {time.time() - inicio:.1f}s"
+    )
+    print(f"Status por caso em {os.path.join(args.saida, ARQUIVO_STATUS)}")
+    return 1 if resumo["erros"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+# pdf_dossie.py
+# Geração dos PDFs de dossiê em memória, com quebra de página automática
+# e cabeçalho, rodapé e numeração "Página X de Y" em todas as páginas.
+
+import io
+from datetime import datetime
+from xml.sax.saxutils import escape
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.pdfgen import canvas
+from reportlab.platypus import BaseDocTemplate, Frame, PageTemplate, Paragraph
+
+LARGURA, ALTURA = A4
+COR_PRINCIPAL = colors.HexColor('#5e17eb')
+COR_SECUNDARIA = colors.HexColor('#718096')
+
+# Estilos criados uma única vez e reaproveitados em todas as chamadas
+ESTILO_NORMAL = ParagraphStyle(
+    'CustomNormal',
+    parent=getSampleStyleSheet()['Normal'],
+    fontSize=11,
+    leading=16,
+    textColor=colors.black,
+    spaceAfter=10
+)
+
+# Canvas que guarda as páginas até o fim para saber o total e escrever "Página X de Y"
+class CanvasNumerado(canvas.Canvas):
+    def __init__(self, *args, autor="Sistema", **kwargs):
+        super().__init__(*args, **kwargs)
+        self.autor = autor
+        self._paginas = []
+
+    def showPage(self):
+        self._paginas.append(dict(self.__dict__))
+        self._startPage()
+
+    def save(self):
+        total = len(self._paginas)
+        for estado in self._paginas:
+            self.__dict__.update(estado)
+            self._desenhar_rodape(total)
+            super().showPage()
+        super().save()
+
+    def _desenhar_rodape(self, total):
+        self.saveState()
+        self.setStrokeColor(COR_SECUNDARIA)
+        self.line(50, 50, LARGURA - 50, 50)
+        self.setFillColor(COR_SECUNDARIA)
+        self.setFont("Helvetica", 8)
+        self.drawString(50, 35, f"Autor: {self.autor}")
+        self.drawRightString(LARGURA - 50, 35, f"Página {self._pageNumber} de {total}")
+        self.restoreState()
+
+def _cabecalho(titulo, data_atual):
+    def desenhar(c, doc):
+        c.saveState()
+        c.setFillColor(COR_PRINCIPAL)
+        c.rect(0, ALTURA - 80, LARGURA, 80, fill=True, stroke=False)
+        c.setFillColor(colors.white)
+        c.setFont("Helvetica-Bold", 24 if doc.page == 1 else 14)
+        c.drawString(50, ALTURA - 50, titulo)
+        c.setFont("Helvetica", 10)
+        c.drawString(LARGURA - 150, ALTURA - 50, f"Data: {data_atual}")
+        c.restoreState()
+    return desenhar
+
+def _paragrafos(conteudo):
+    return [
+        Paragraph(escape(paragrafo).replace('\n', '<br/>'), ESTILO_NORMAL)
+        for paragrafo in conteudo.split('\n\n') if paragrafo.strip()
+    ]
+
+# Função para gerar conteúdo PDF
+def gerar_pdf_conteudo(conteudo, titulo="Dossiê de Denúncia de Violência Doméstica", autor="Sistema"):
+    buffer = io.BytesIO()
+    doc = BaseDocTemplate(
+        buffer,
+        pagesize=A4,
+        title=titulo,
+        author=autor,
+        leftMargin=50,
+        rightMargin=50,
+        topMargin=90,
+        bottomMargin=70
+    )
+    frame = Frame(50, 70, LARGURA - 100, ALTURA - 160, leftPadding=0, bottomPadding=0, rightPadding=0, topPadding=0)
+    data_atual = datetime.now().strftime("%d/%m/%Y")
+    doc.addPageTemplates([PageTemplate(id="dossie", frames=[frame], onPage=_cabecalho(titulo, data_atual))])
+    doc.build(_paragrafos(str(conteudo)), canvasmaker=lambda *args, **kwargs: CanvasNumerado(*args, autor=autor, **kwargs))
+    return buffer.getvalue()
@@ -0,0 +1,284 @@
+# rastreamento.py
+# Rastreamento de latência e tokens por crew, tarefa, chamada de LLM, busca
+# no índice e ferramenta. Ativado com RASTREAMENTO_ARQUIVO=traces.jsonl ou
+# configurar(); desativado, span() devolve um objeto nulo e o handler do LLM
+# não registra nada.
+#
+# Resumo de um arquivo de traces:
+#   python rastreamento.py traces.jsonl
+
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import threading
+import contextvars
+from collections import defaultdict, deque
+
+ARQUIVO_RASTREAMENTO = os.environ.get("RASTREAMENTO_ARQUIVO")
+# Quantas durações recentes são guardadas por (tipo, nome) para os percentis
+JANELA_METRICAS = 1000
+
+_span_atual = contextvars.ContextVar("span_atual", default=None)
+
+class Coletor:
+    def __init__(self, arquivo=None):
+        self.arquivo = arquivo
+        self._duracoes = defaultdict(lambda: deque(maxlen=JANELA_METRICAS))
+        self._tokens = defaultdict(int)
+        self._lock = threading.Lock()
+        self._saida = open(arquivo, "a", encoding="utf-8", buffering=1) if arquivo else None
+
+    def registrar(self, registro):
+        chave = (registro["tipo"], registro["nome"])
+        with self._lock:
+            self._duracoes[chave].append(registro["duracao_ms"])
+            self._tokens[chave] += registro["atributos"].get("tokens_total", 0)
+            if self._saida:
+                self._saida.write(json.dumps(registro, ensure_ascii=False, default=str) + "\n")
+
+    def metricas(self):
+        with self._lock:
+            return {
+                f"{tipo}:{nome}": _resumir(list(duracoes), self._tokens[(tipo, nome)])
+                for (tipo, nome), duracoes in self._duracoes.items()
+            }
+
+    def fechar(self):
+        if self._saida:
+            self._saida.close()
+            self._saida = None
+
+def _percentil(valores_ordenados, p):
+    if not valores_ordenados:
+        return 0.0
+    # Método nearest-rank
+    posicao = max(math.ceil(p / 100 * len(valores_ordenados)) - 1, 0)
+    return valores_ordenados[posicao]
+
+def _resumir(duracoes, tokens):
+    duracoes = sorted(duracoes)
+    return {
+        "n": len(duracoes),
+        "p50_ms": _percentil(duracoes, 50),
+        "p95_ms": _percentil(duracoes, 95),
+        "total_ms": sum(duracoes),
+        "tokens": tokens
+    }
+
+_coletor = Coletor(ARQUIVO_RASTREAMENTO) if ARQUIVO_RASTREAMENTO else None
+
+def ativo():
+    return _coletor is not None
+
+# Liga o rastreamento em tempo de execução (arquivo=None mantém só as métricas em memória)
+def configurar(arquivo=None):
+    global _coletor
+    desativar()
+    _coletor = Coletor(arquivo)
+
+def desativar():
+    global _coletor
+    if _coletor is not None:
+        _coletor.fechar()
+    _coletor = None
+
+def metricas():
+    return _coletor.metricas() if _coletor else {}
+
+def registrar_span(tipo, nome, inicio, duracao_s, pai=None, erro=None, **atributos):
+    if _coletor is None:
+        return
+    pai = pai if pai is not None else _span_atual.get()
+    _coletor.registrar({
+        "trace_id": pai.trace_id if pai else uuid.uuid4().hex,
+        "span_id": uuid.uuid4().hex[:16],
+        "pai_id": pai.span_id if pai else None,
+        "tipo": tipo,
+        "nome": nome,
+        "inicio": inicio,
+        "duracao_ms": duracao_s * 1000,
+        "erro": erro,
+        "atributos": atributos
+    })
+
+class _SpanNulo:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def definir(self, **atributos):
+        pass
+
+SPAN_NULO = _SpanNulo()
+
+class Span:
+    def __init__(self, tipo, nome, atributos):
+        self.tipo = tipo
+        self.nome = nome
+        self.atributos = atributos
+
+    def __enter__(self):
+        pai = _span_atual.get()
+        self.pai = pai
+        self.trace_id = pai.trace_id if pai else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.inicio = time.time()
+        self._inicio = time.perf_counter()
+        self._token = _span_atual.set(self)
+        return self
+
+    def __exit__(self, tipo_exc, exc, tb):
+        duracao = time.perf_counter() - self._inicio
+        _span_atual.reset(self._token)
+        if _coletor is not None:
+            _coletor.registrar({
+                "trace_id": self.trace_id,
+                "span_id": self.span_id,
+                "pai_id": self.pai.span_id if self.pai else None,
+                "tipo": self.tipo,
+                "nome": self.nome,
+                "inicio": self.inicio,
+                "duracao_ms": duracao * 1000,
+                "erro": repr(exc) if exc else None,
+                "atributos": self.atributos
+            })
+        return False
+
+    def definir(self, **atributos):
+        self.atributos.update(atributos)
+
+# Uso: with span("crew", "denuncia"): ...
+def span(tipo, nome, **atributos):
+    if _coletor is None:
+        return SPAN_NULO
+    return Span(tipo, nome, atributos)
+
+class MarcadorTarefas:
+    """
+    Gera spans de tarefas de um crew sequencial: cada tarefa vai do fim da
+    anterior (ou do kickoff) até o seu callback de conclusão.
+    """
+
+    def __init__(self):
+        self.iniciar()
+
+    # Chamado logo antes do kickoff, dentro do span do crew
+    def iniciar(self):
+        self._ultimo = time.perf_counter()
+        self._ultimo_ts = time.time()
+
+    def concluir(self, nome):
+        if _coletor is None:
+            return
+        agora = time.perf_counter()
+        registrar_span("task", nome, self._ultimo_ts, agora - self._ultimo)
+        self._ultimo = agora
+        self._ultimo_ts = time.time()
+
+def _criar_handler():
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class HandlerRastreamento(BaseCallbackHandler):
+        """Registra spans de chamadas de LLM e de buscas no índice feitas pelo LangChain."""
+
+        def __init__(self):
+            self._inicios = {}
+
+        def _iniciar(self, run_id, tipo, nome):
+            # Fica anexado ao LLM mesmo com o rastreamento desligado (configurar() pode vir depois)
+            if _coletor is None:
+                return
+            self._inicios[run_id] = (tipo, nome, time.time(), time.perf_counter(), _span_atual.get())
+
+        def _finalizar(self, run_id, erro=None, **atributos):
+            inicio = self._inicios.pop(run_id, None)
+            if inicio is None:
+                return
+            tipo, nome, inicio_ts, inicio_perf, pai = inicio
+            registrar_span(tipo, nome, inicio_ts, time.perf_counter() - inicio_perf, pai=pai, erro=erro, **atributos)
+
+        def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+            self._iniciar(run_id, "llm", _nome_modelo(serialized, kwargs))
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+            self._iniciar(run_id, "llm", _nome_modelo(serialized, kwargs))
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            self._finalizar(run_id, **_tokens_da_resposta(response))
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            self._finalizar(run_id, erro=repr(error))
+
+        def on_retriever_start(self, serialized, query, *, run_id, **kwargs):
+            self._iniciar(run_id, "retrieval", "indice_faiss")
+
+        def on_retriever_end(self, documents, *, run_id, **kwargs):
+            self._finalizar(run_id, documentos=len(documents))
+
+        def on_retriever_error(self, error, *, run_id, **kwargs):
+            self._finalizar(run_id, erro=repr(error))
+
+    return HandlerRastreamento()
+
+def _nome_modelo(serialized, kwargs):
+    parametros = kwargs.get("invocation_params") or {}
+    return parametros.get("model_name") or parametros.get("model") or (serialized or {}).get("name") or "llm"
+
+def _tokens_da_resposta(response):
+    uso = (response.llm_output or {}).get("token_usage") or {}
+    if not uso:
+        try:
+            uso = response.generations[0][0].message.usage_metadata or {}
+        except (AttributeError, IndexError):
+            uso = {}
+    entrada = uso.get("prompt_tokens", uso.get("input_tokens", 0))
+    saida = uso.get("completion_tokens", uso.get("output_tokens", 0))
+    return {"tokens_entrada": entrada, "tokens_saida": saida, "tokens_total": uso.get("total_tokens", entrada + saida)}
+
+_handler = None
+_lock_handler = threading.Lock()
+
+# Handler único do processo. Para objetos criados uma vez e guardados em cache (o LLM),
+# que precisam registrar spans se o rastreamento for ligado depois.
+def handler():
+    global _handler
+    if _handler is None:
+        with _lock_handler:
+            if _handler is None:
+                _handler = _criar_handler()
+    return _handler
+
+# Callbacks do LangChain para uma execução (config das chains); vazio se desativado
+def callbacks():
+    if _coletor is None:
+        return []
+    return [handler()]
+
+def resumir_arquivo(caminho):
+    duracoes = defaultdict(list)
+    tokens = defaultdict(int)
+    with open(caminho, encoding="utf-8") as f:
+        for linha in f:
+            registro = json.loads(linha)
+            chave = f"{registro['tipo']}:{registro['nome']}"
+            duracoes[chave].append(registro["duracao_ms"])
+            tokens[chave] += registro["atributos"].get("tokens_total", 0)
+    return {chave: _resumir(valores, tokens[chave]) for chave, valores in duracoes.items()}
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print("Uso: python rastreamento.py traces.jsonl")
+        return 2
+    print(f"{'span':<45} {'n':>6} {'p50 (ms)':>10} {'p95 (ms)':>10} {'tokens':>8}")
+    for chave, m in sorted(resumir_arquivo(argv[0]).items()):
+        print(f"{chave:<45} {m['n']:>6} {m['p50_ms']:>10.1f} {m['p95_ms']:>10.1f} {m['tokens']:>8}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
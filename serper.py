@@ -0,0 +1,106 @@
+# serper.py
+# Cliente HTTP da API do Serper: sessão com pool de conexões, timeout,
+# tentativas com backoff e cache dos resultados por endereço.
+
+import os
+import re
+import time
+import threading
+import unicodedata
+from collections import OrderedDict
+
+URL_SERPER = "https://google.serper.dev/search"
+TIMEOUT = (3.05, 10)  # (conexão, leitura) em segundos
+TENTATIVAS = 3
+BACKOFF = 0.5
+CACHE_TTL = float(os.environ.get("SERPER_CACHE_TTL", str(6 * 3600)))
+CACHE_MAX_ITENS = int(os.environ.get("SERPER_CACHE_MAX_ITENS", "2000"))
+
+_sessao = None
+_lock_sessao = threading.Lock()
+
+# Sessão compartilhada pelo processo, reaproveitando conexões TLS com o Serper
+def get_sessao():
+    global _sessao
+    if _sessao is None:
+        with _lock_sessao:
+            if _sessao is None:
+                # requests só é importado na primeira busca; a busca offline não precisa dele
+                import requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+
+                retry = Retry(
+                    total=TENTATIVAS,
+                    backoff_factor=BACKOFF,
+                    status_forcelist=(429, 500, 502, 503, 504),
+                    allowed_methods=frozenset(["POST"]),
+                    respect_retry_after_header=True
+                )
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+                sessao = requests.Session()
+                sessao.mount("https://", adapter)
+                sessao.mount("http://", adapter)
+                _sessao = sessao
+    return _sessao
+
+# "Rua MMDC, 80 - Butantã" e "rua mmdc 80 butanta" viram a mesma chave
+def normalizar_endereco(endereco):
+    texto = unicodedata.normalize("NFKD", endereco.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    texto = re.sub(r"[^a-z0-9]+", " ", texto)
+    return " ".join(texto.split())
+
+class CacheTTL:
+    def __init__(self, ttl=CACHE_TTL, max_itens=CACHE_MAX_ITENS):
+        self.ttl = ttl
+        self.max_itens = max_itens
+        self.acertos = 0
+        self.falhas = 0
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None or time.time() - item[1] > self.ttl:
+                self._itens.pop(chave, None)
+                self.falhas += 1
+                return None
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return item[0]
+
+    def guardar(self, chave, valor):
+        with self._lock:
+            self._itens[chave] = (valor, time.time())
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+cache_locais = CacheTTL()
+
+# Busca os locais ("places") do Serper para a consulta de delegacias perto do endereço.
+# Erros de rede/HTTP são propagados como requests.exceptions.RequestException.
+def buscar_locais(endereco_busca):
+    chave = normalizar_endereco(endereco_busca)
+    places = cache_locais.obter(chave)
+    if places is not None:
+        return places
+
+    headers = {
+        "X-API-KEY": os.environ.get("SERPER_API_KEY"),
+        "Content-Type": "application/json"
+    }
+    payload = {"q": f"delegacia de polícia perto de {endereco_busca}", "gl": "br", "hl": "pt"}
+    url = os.environ.get("SERPER_URL", URL_SERPER)
+    response = get_sessao().post(url, headers=headers, json=payload, timeout=TIMEOUT)
+    response.raise_for_status()
+
+    places = response.json().get('places', [])
+    cache_locais.guardar(chave, places)
+    return places
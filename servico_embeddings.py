@@ -0,0 +1,87 @@
+# servico_embeddings.py
+# Um único modelo de embeddings por processo, com codificação em lotes
+# tanto na indexação quanto nas consultas do chat.
+
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from langchain_core.embeddings import Embeddings
+
+MODELO_EMBEDDINGS = "sentence-transformers/all-MiniLM-L6-v2"
+TAMANHO_LOTE = int(os.environ.get("EMBEDDINGS_TAMANHO_LOTE", "64"))
+# Tempo máximo (ms) que uma consulta espera por outras para formar um lote
+ESPERA_LOTE_MS = float(os.environ.get("EMBEDDINGS_ESPERA_LOTE_MS", "5"))
+
+class ServicoEmbeddings(Embeddings):
+    def __init__(self, modelo=MODELO_EMBEDDINGS, tamanho_lote=TAMANHO_LOTE, espera_lote_ms=ESPERA_LOTE_MS, embeddings=None):
+        self.modelo = modelo
+        self.tamanho_lote = tamanho_lote
+        self.espera_lote = espera_lote_ms / 1000
+        self._embeddings = embeddings
+        self._lock_modelo = threading.Lock()
+        self._fila = queue.Queue()
+        self._thread = None
+        self._lock_thread = threading.Lock()
+
+    # O modelo só é carregado no primeiro uso
+    @property
+    def embeddings(self):
+        if self._embeddings is None:
+            with self._lock_modelo:
+                if self._embeddings is None:
+                    from langchain_community.embeddings import HuggingFaceEmbeddings
+                    self._embeddings = HuggingFaceEmbeddings(
+                        model_name=self.modelo,
+                        model_kwargs={'device': 'cpu'},
+                        encode_kwargs={'batch_size': self.tamanho_lote}
+                    )
+        return self._embeddings
+
+    def embed_documents(self, texts):
+        vetores = []
+        for inicio in range(0, len(texts), self.tamanho_lote):
+            vetores.extend(self.embeddings.embed_documents(list(texts[inicio:inicio + self.tamanho_lote])))
+        return vetores
+
+    # Consultas simultâneas de várias sessões são agrupadas em uma única chamada ao modelo
+    def embed_query(self, text):
+        self._iniciar_thread()
+        futuro = Future()
+        self._fila.put((text, futuro))
+        return futuro.result()
+
+    def _iniciar_thread(self):
+        if self._thread is None:
+            with self._lock_thread:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._processar_consultas, daemon=True)
+                    self._thread.start()
+
+    def _processar_consultas(self):
+        while True:
+            pendentes = [self._fila.get()]
+            try:
+                while len(pendentes) < self.tamanho_lote:
+                    pendentes.append(self._fila.get(timeout=self.espera_lote))
+            except queue.Empty:
+                pass
+            try:
+                vetores = self.embeddings.embed_documents([texto for texto, _ in pendentes])
+                for (_, futuro), vetor in zip(pendentes, vetores):
+                    futuro.set_result(vetor)
+            except Exception as e:
+                for _, futuro in pendentes:
+                    futuro.set_exception(e)
+
+_servico = None
+_lock_servico = threading.Lock()
+
+# Instância compartilhada pelo processo (sessões do Streamlit, CLI de ingestão, etc.)
+def get_servico_embeddings():
+    global _servico
+    if _servico is None:
+        with _lock_servico:
+            if _servico is None:
+                _servico = ServicoEmbeddings()
+    return _servico
@@ -0,0 +1,92 @@
+# servidores_locais.py
+# Servidores locais que imitam APIs externas, para testes e benchmarks sem rede.
+#
+#   with ServidorSerperLocal(falhas_iniciais=2) as servidor:
+#       os.environ["SERPER_URL"] = servidor.url
+#       buscar_delegacias_proximas.run("Rua MMDC, 80, Butantã")
+
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PLACES_PADRAO = [
+    {"title": "1ª Delegacia de Defesa da Mulher - Centro", "address": "R. Dr. Bittencourt Rodrigues, 200 - Sé, São Paulo - SP", "cid": "1"},
+    {"title": "3ª Delegacia de Defesa da Mulher - Oeste", "address": "Av. Corifeu de Azevedo Marques, 4300 - Butantã, São Paulo - SP", "cid": "2"},
+    {"title": "14º Distrito Policial - Pinheiros", "address": "R. Dep. Lacerda Franco, 372 - Pinheiros, São Paulo - SP", "cid": "3"},
+    {"title": "Padaria Central", "address": "Av. Paulista, 1000 - Bela Vista, São Paulo - SP", "cid": "4"}
+]
+
+class ServidorSerperLocal:
+    """
+    Imita o endpoint de busca do Serper.
+
+    Parâmetros:
+    places (list): Locais devolvidos em toda busca.
+    latencia (float): Atraso, em segundos, antes de cada resposta.
+    falhas_iniciais (int): Quantidade de requisições iniciais que recebem HTTP 503.
+    """
+
+    def __init__(self, places=None, latencia=0.0, falhas_iniciais=0):
+        self.places = PLACES_PADRAO if places is None else places
+        self.latencia = latencia
+        self.falhas_restantes = falhas_iniciais
+        self.requisicoes = []
+        self._lock = threading.Lock()
+        self._servidor = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, porta = self._servidor.server_address[:2]
+        return f"http://{host}:{porta}/search"
+
+    def _criar_handler(self):
+        dono = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                tamanho = int(self.headers.get("Content-Length", 0))
+                corpo = json.loads(self.rfile.read(tamanho) or b"{}")
+                with dono._lock:
+                    dono.requisicoes.append(corpo)
+                    falhar = dono.falhas_restantes > 0
+                    if falhar:
+                        dono.falhas_restantes -= 1
+                if dono.latencia:
+                    time.sleep(dono.latencia)
+                if falhar:
+                    self._responder(503, {"message": "indisponível"})
+                else:
+                    self._responder(200, {"searchParameters": corpo, "places": dono.places})
+
+            def _responder(self, status, dados):
+                conteudo = json.dumps(dados).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(conteudo)))
+                self.end_headers()
+                self.wfile.write(conteudo)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def iniciar(self):
+        self._servidor = ThreadingHTTPServer(("127.0.0.1", 0), self._criar_handler())
+        self._thread = threading.Thread(target=self._servidor.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self):
+        if self._servidor:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+            self._servidor = None
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.parar()
@@ -0,0 +1,257 @@
+# sessoes.py
+# Estado do chat guardado no servidor, fora do st.session_state. Cada sessão
+# guarda só o essencial: as mensagens como tuplas (papel, texto), o resumo do
+# histórico e uma referência à retrieval chain compartilhada. O
+# HistoricoConversa é remontado a cada turno a partir disso.
+#
+# A memória é limitada. Acima de SESSOES_MAX_MEMORIA sessões, e para as
+# sessões paradas há mais de SESSOES_OCIOSA segundos, a sessão sai da memória
+# e vai para um SQLite local, comprimida e cifrada com Fernet. Ela volta quando
+# a pessoa retoma a conversa. A chave vem de SESSOES_CHAVE (gerada com
+# `python sessoes.py --gerar-chave`). Sem ela, usa uma chave só do processo, e
+# o que foi gravado fica ilegível depois que o processo termina.
+
+import os
+import sys
+import json
+import time
+import zlib
+import uuid
+import sqlite3
+import threading
+from collections import OrderedDict
+from historico import HistoricoConversa
+
+SESSOES_MAX_MEMORIA = int(os.environ.get("SESSOES_MAX_MEMORIA", "2000"))
+SESSOES_OCIOSA_SEGUNDOS = float(os.environ.get("SESSOES_OCIOSA", str(15 * 60)))
+ARQUIVO_SESSOES = os.environ.get("SESSOES_ARQUIVO", "sessoes.sqlite")
+# Sessões gravadas em disco e não retomadas nesse prazo são apagadas
+TTL_DISCO_SEGUNDOS = float(os.environ.get("SESSOES_TTL", str(24 * 3600)))
+CHAVE_CIFRA = os.environ.get("SESSOES_CHAVE")
+# Intervalo mínimo entre duas limpezas das sessões expiradas em disco
+INTERVALO_LIMPEZA_DISCO = 60.0
+
+MENSAGEM_INICIAL = (
+    "assistant",
+    "Olá! Sou Maria, sua assistente virtual, aqui para apoiar na luta contra a violência contra a mulher. Em que posso ajudar você?"
+)
+
+class Sessao:
+    """
+    Estado de uma conversa. As mensagens são tuplas (papel, texto), bem menores
+    que um dicionário por mensagem. Os papéis são sempre os mesmos objetos str.
+
+    Parâmetros:
+    id_sessao (str): Identificador da sessão.
+    mensagens (list): Tuplas (papel, texto), da mais antiga à mais nova.
+    resumo (str): Resumo das mensagens antigas (HistoricoConversa.resumo).
+    compactadas (int): Quantas das primeiras mensagens já estão no resumo.
+    """
+
+    __slots__ = ("id", "mensagens", "resumo", "compactadas", "chain", "acessada_em")
+
+    def __init__(self, id_sessao, mensagens=None, resumo="", compactadas=0):
+        self.id = id_sessao
+        self.mensagens = mensagens if mensagens is not None else [MENSAGEM_INICIAL]
+        self.resumo = resumo
+        self.compactadas = compactadas
+        # Referência à retrieval chain compartilhada; não vai para o disco
+        self.chain = None
+        self.acessada_em = time.time()
+
+    def adicionar(self, papel, texto):
+        self.mensagens.append((sys.intern(papel), texto))
+
+    # Mensagens no formato do Streamlit e da API ({"role", "content"})
+    def mensagens_dict(self, inicio=0, fim=None):
+        return [{"role": papel, "content": texto} for papel, texto in self.mensagens[inicio:fim]]
+
+    # Remonta o histórico com orçamento de tokens; as mensagens já resumidas são ignoradas
+    def historico(self, **kwargs):
+        return HistoricoConversa(self.mensagens_dict(), resumo=self.resumo, compactadas=self.compactadas, **kwargs)
+
+    # Guarda o resumo depois de HistoricoConversa.compactar()
+    def atualizar_historico(self, historico):
+        self.resumo = historico.resumo
+        self.compactadas = historico.compactadas
+
+    def serializar(self):
+        return json.dumps({"m": self.mensagens, "r": self.resumo, "c": self.compactadas}, ensure_ascii=False).encode("utf-8")
+
+    @classmethod
+    def desserializar(cls, id_sessao, dados):
+        valor = json.loads(dados.decode("utf-8"))
+        mensagens = [(sys.intern(papel), texto) for papel, texto in valor["m"]]
+        return cls(id_sessao, mensagens, valor["r"], valor["c"])
+
+# Bytes ocupados pela sessão: o objeto, a lista, as tuplas e os textos. Os papéis
+# são compartilhados entre as sessões e a chain é de todo o processo, então não entram.
+def memoria_sessao(sessao):
+    total = sys.getsizeof(sessao) + sys.getsizeof(sessao.id) + sys.getsizeof(sessao.resumo) + sys.getsizeof(sessao.mensagens)
+    for mensagem in sessao.mensagens:
+        total += sys.getsizeof(mensagem) + sys.getsizeof(mensagem[1])
+    return total
+
+class ArmazemSessoes:
+    """
+    Sessões do chat com memória limitada: as mais antigas e as ociosas vão para o disco.
+
+    Parâmetros:
+    max_sessoes (int): Sessões mantidas em memória.
+    ociosa (float): Segundos sem acesso até a sessão ir para o disco.
+    arquivo (str): Banco SQLite das sessões em disco (":memory:" para não gravar nada).
+    ttl_disco (float): Segundos até uma sessão em disco ser apagada.
+    chave_cifra (str): Chave Fernet; sem ela, é gerada uma chave válida só neste processo.
+    """
+
+    def __init__(self, max_sessoes=SESSOES_MAX_MEMORIA, ociosa=SESSOES_OCIOSA_SEGUNDOS, arquivo=ARQUIVO_SESSOES,
+                 ttl_disco=TTL_DISCO_SEGUNDOS, chave_cifra=CHAVE_CIFRA):
+        from cryptography.fernet import Fernet
+
+        self.max_sessoes = max_sessoes
+        self.ociosa = ociosa
+        self.ttl_disco = ttl_disco
+        self.chave_propria = not chave_cifra
+        chave_cifra = chave_cifra or Fernet.generate_key()
+        self._fernet = Fernet(chave_cifra.encode() if isinstance(chave_cifra, str) else chave_cifra)
+        self._memoria = OrderedDict()
+        self.gravadas = 0
+        self.restauradas = 0
+        self.perdidas = 0
+        self._ultima_limpeza = 0.0
+        self._lock = threading.Lock()
+        self._conexao = sqlite3.connect(arquivo, check_same_thread=False, isolation_level=None)
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.execute(
+            "CREATE TABLE IF NOT EXISTS sessoes (id TEXT PRIMARY KEY, dados BLOB NOT NULL, gravada_em REAL NOT NULL)"
+        )
+        self._conexao.execute("CREATE INDEX IF NOT EXISTS sessoes_gravacao ON sessoes (gravada_em)")
+
+    # Devolve a sessão (da memória, do disco ou nova) e a marca como a mais recente
+    def obter(self, id_sessao=None):
+        id_sessao = id_sessao or uuid.uuid4().hex
+        agora = time.time()
+        with self._lock:
+            sessao = self._memoria.get(id_sessao)
+            if sessao is None:
+                sessao = self._carregar(id_sessao) or Sessao(id_sessao)
+                self._memoria[id_sessao] = sessao
+            else:
+                self._memoria.move_to_end(id_sessao)
+            sessao.acessada_em = agora
+            self._despejar(agora)
+        return sessao
+
+    # Chamado ao fim de um turno: se a sessão foi para o disco no meio dele, volta
+    # para a memória com as mensagens novas
+    def salvar(self, sessao):
+        with self._lock:
+            if sessao.id not in self._memoria:
+                self._conexao.execute("DELETE FROM sessoes WHERE id = ?", (sessao.id,))
+                self._memoria[sessao.id] = sessao
+            self._memoria.move_to_end(sessao.id)
+            sessao.acessada_em = time.time()
+            self._despejar(sessao.acessada_em)
+
+    def remover(self, id_sessao):
+        with self._lock:
+            self._memoria.pop(id_sessao, None)
+            self._conexao.execute("DELETE FROM sessoes WHERE id = ?", (id_sessao,))
+
+    def _carregar(self, id_sessao):
+        from cryptography.fernet import InvalidToken
+
+        linha = self._conexao.execute("SELECT dados, gravada_em FROM sessoes WHERE id = ?", (id_sessao,)).fetchone()
+        if linha is None:
+            return None
+        self._conexao.execute("DELETE FROM sessoes WHERE id = ?", (id_sessao,))
+        if time.time() - linha[1] > self.ttl_disco:
+            return None
+        try:
+            dados = zlib.decompress(self._fernet.decrypt(linha[0]))
+        except InvalidToken:
+            # Gravada com outra chave (outro processo, sem SESSOES_CHAVE)
+            self.perdidas += 1
+            return None
+        self.restauradas += 1
+        return Sessao.desserializar(id_sessao, dados)
+
+    def _gravar(self, sessao, agora):
+        dados = self._fernet.encrypt(zlib.compress(sessao.serializar()))
+        self._conexao.execute("INSERT OR REPLACE INTO sessoes (id, dados, gravada_em) VALUES (?, ?, ?)", (sessao.id, dados, agora))
+        self.gravadas += 1
+
+    # A ordem do OrderedDict é a do último acesso: as primeiras são as mais antigas
+    # e as ociosas, então basta olhar o começo
+    def _despejar(self, agora):
+        while self._memoria:
+            id_sessao, sessao = next(iter(self._memoria.items()))
+            if len(self._memoria) <= self.max_sessoes and agora - sessao.acessada_em < self.ociosa:
+                break
+            del self._memoria[id_sessao]
+            self._gravar(sessao, agora)
+        if agora - self._ultima_limpeza > INTERVALO_LIMPEZA_DISCO:
+            self._ultima_limpeza = agora
+            self._conexao.execute("DELETE FROM sessoes WHERE gravada_em < ?", (agora - self.ttl_disco,))
+
+    # Grava no disco as sessões ociosas mesmo sem novos acessos (por exemplo, periodicamente)
+    def despejar_ociosas(self):
+        with self._lock:
+            self._despejar(time.time())
+
+    def estatisticas(self):
+        with self._lock:
+            tamanhos = [memoria_sessao(s) for s in self._memoria.values()]
+            mensagens = sum(len(s.mensagens) for s in self._memoria.values())
+            em_disco, bytes_disco = self._conexao.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(dados)), 0) FROM sessoes").fetchone()
+            return {
+                "em_memoria": len(tamanhos),
+                "max_sessoes": self.max_sessoes,
+                "bytes_memoria": sum(tamanhos),
+                "bytes_por_sessao": sum(tamanhos) / len(tamanhos) if tamanhos else 0.0,
+                "maior_sessao": max(tamanhos, default=0),
+                "mensagens_em_memoria": mensagens,
+                "em_disco": em_disco,
+                "bytes_disco": bytes_disco,
+                "gravadas": self.gravadas,
+                "restauradas": self.restauradas,
+                "perdidas": self.perdidas,
+                "chave_propria": self.chave_propria
+            }
+
+    def fechar(self):
+        with self._lock:
+            self._conexao.close()
+
+_armazem = None
+_lock_armazem = threading.Lock()
+
+# Armazém compartilhado por todas as sessões do processo
+def get_armazem_sessoes():
+    global _armazem
+    if _armazem is None:
+        with _lock_armazem:
+            if _armazem is None:
+                _armazem = ArmazemSessoes()
+    return _armazem
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Administra as sessões do chat gravadas em disco.")
+    parser.add_argument("--arquivo", default=ARQUIVO_SESSOES)
+    parser.add_argument("--gerar-chave", action="store_true", help="Mostra uma nova chave Fernet para SESSOES_CHAVE")
+    parser.add_argument("--limpar", action="store_true", help="Apaga todas as sessões gravadas")
+    args = parser.parse_args(argv)
+
+    if args.gerar_chave:
+        from cryptography.fernet import Fernet
+        print(Fernet.generate_key().decode())
+        return 0
+    armazem = ArmazemSessoes(arquivo=args.arquivo)
+    if args.limpar:
+        armazem._conexao.execute("DELETE FROM sessoes")
+    print(json.dumps(armazem.estatisticas(), indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
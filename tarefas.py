@@ -0,0 +1,159 @@
+# tarefas.py
+# Fila de tarefas em segundo plano para gerar relatórios e denúncias sem
+# prender a sessão do Streamlit enquanto os agentes trabalham.
+
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_WORKERS = int(os.environ.get("TAREFAS_MAX_WORKERS", "4"))
+MAX_PENDENTES = int(os.environ.get("TAREFAS_MAX_PENDENTES", "50"))
+# Resultados não baixados são descartados depois desse tempo (segundos)
+TTL_RESULTADOS = float(os.environ.get("TAREFAS_TTL_RESULTADOS", "3600"))
+
+ETAPAS = OrderedDict([
+    ("analise_juridica", "Análise jurídica concluída"),
+    ("redacao", "Redação do documento concluída"),
+    ("pdf", "PDF gerado")
+])
+
+class FilaCheia(Exception):
+    pass
+
+class GerenciadorTarefas:
+    # Os crews de cada tarefa disputam as vagas de utils.MAX_CREWS_SIMULTANEOS,
+    # compartilhadas com a API e com os trechos dos relatórios longos
+    def __init__(self, max_workers=MAX_WORKERS, max_pendentes=MAX_PENDENTES, ttl_resultados=TTL_RESULTADOS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tarefa")
+        self.max_pendentes = max_pendentes
+        self.ttl_resultados = ttl_resultados
+        self._tarefas = {}
+        self._lock = threading.Lock()
+
+    def _pendentes(self):
+        return sum(1 for t in self._tarefas.values() if t["status"] in ("na_fila", "executando"))
+
+    def pendentes(self):
+        with self._lock:
+            return self._pendentes()
+
+    # Remove resultados já baixados e os que ficaram esquecidos além do TTL
+    def _limpar(self):
+        agora = time.time()
+        for id_tarefa in [
+            i for i, t in self._tarefas.items()
+            if t["baixado"] or (t["concluido_em"] and agora - t["concluido_em"] > self.ttl_resultados)
+        ]:
+            del self._tarefas[id_tarefa]
+
+    # Enfileira `executar(marcar_etapa)`, que deve devolver o texto do documento.
+    # Devolve o ID da tarefa.
+    def submeter(self, tipo, executar):
+        with self._lock:
+            self._limpar()
+            if self._pendentes() >= self.max_pendentes:
+                raise FilaCheia("Muitas solicitações em andamento. Tente novamente em alguns minutos.")
+            id_tarefa = uuid.uuid4().hex
+            self._tarefas[id_tarefa] = {
+                "id": id_tarefa,
+                "tipo": tipo,
+                "status": "na_fila",
+                "etapas": {etapa: False for etapa in ETAPAS},
+                "resultado": None,
+                "erro": None,
+                "criado_em": time.time(),
+                "concluido_em": None,
+                "baixado": False
+            }
+        self._executor.submit(self._executar, id_tarefa, executar)
+        return id_tarefa
+
+    def _marcar_etapa(self, id_tarefa, etapa):
+        with self._lock:
+            tarefa = self._tarefas.get(id_tarefa)
+            if tarefa is not None:
+                tarefa["etapas"][etapa] = True
+
+    def _executar(self, id_tarefa, executar):
+        from pdf_dossie import gerar_pdf_conteudo
+
+        def marcar_etapa(etapa):
+            self._marcar_etapa(id_tarefa, etapa)
+
+        try:
+            with self._lock:
+                self._tarefas[id_tarefa]["status"] = "executando"
+            texto = executar(marcar_etapa)
+            # Se o crew não avisou as etapas (ex.: sem callbacks), marca ao terminar
+            marcar_etapa("analise_juridica")
+            marcar_etapa("redacao")
+            pdf_data = gerar_pdf_conteudo(str(texto))
+            marcar_etapa("pdf")
+            with self._lock:
+                tarefa = self._tarefas[id_tarefa]
+                tarefa["resultado"] = pdf_data
+                tarefa["status"] = "concluido"
+                tarefa["concluido_em"] = time.time()
+        except Exception as e:
+            with self._lock:
+                tarefa = self._tarefas[id_tarefa]
+                tarefa["erro"] = str(e)
+                tarefa["status"] = "erro"
+                tarefa["concluido_em"] = time.time()
+
+    # Cópia do estado da tarefa (sem o PDF), ou None se ela não existir mais
+    def status(self, id_tarefa):
+        with self._lock:
+            tarefa = self._tarefas.get(id_tarefa)
+            if tarefa is None:
+                return None
+            copia = {k: v for k, v in tarefa.items() if k != "resultado"}
+            copia["etapas"] = dict(tarefa["etapas"])
+            return copia
+
+    def progresso(self, id_tarefa):
+        status = self.status(id_tarefa)
+        if status is None:
+            return 0.0
+        return sum(status["etapas"].values()) / len(status["etapas"])
+
+    def resultado(self, id_tarefa):
+        with self._lock:
+            tarefa = self._tarefas.get(id_tarefa)
+            return tarefa["resultado"] if tarefa else None
+
+    # Chamado quando o usuário baixa o PDF; o resultado é liberado na próxima limpeza
+    def marcar_baixado(self, id_tarefa):
+        with self._lock:
+            tarefa = self._tarefas.get(id_tarefa)
+            if tarefa is not None:
+                tarefa["baixado"] = True
+
+_gerenciador = None
+_lock_gerenciador = threading.Lock()
+
+# Gerenciador compartilhado pelo processo
+def get_gerenciador_tarefas():
+    global _gerenciador
+    if _gerenciador is None:
+        with _lock_gerenciador:
+            if _gerenciador is None:
+                _gerenciador = GerenciadorTarefas()
+    return _gerenciador
+
+def submeter_relatorio(chat_history):
+    from utils import executar_crew_relatorio
+    return get_gerenciador_tarefas().submeter(
+        "relatorio",
+        lambda marcar_etapa: executar_crew_relatorio(chat_history, ao_concluir_tarefa=marcar_etapa)
+    )
+
+def submeter_denuncia(victim_name, conversation_text):
+    from utils import executar_crew_denuncia
+    return get_gerenciador_tarefas().submeter(
+        "denuncia",
+        lambda marcar_etapa: executar_crew_denuncia(victim_name, conversation_text, ao_concluir_tarefa=marcar_etapa)
+    )
@@ -1,24 +1,36 @@
 # utils.py
 
+# crewai, crewai_tools, langchain_groq e reportlab levam segundos para importar;
+# são carregados só quando um crew, o LLM ou um PDF é usado pela primeira vez.
+
 import os
-import requests
-import tempfile
-from datetime import datetime
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
-from reportlab.platypus import Paragraph, Frame
+import copy
+import functools
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from crewai import Agent, Task, Crew
-from langchain_groq import ChatGroq
-from crewai_tools import tool
 import streamlit as st
+from historico import contar_tokens, dividir_em_trechos
+from rastreamento import span, handler as handler_rastreamento, MarcadorTarefas
 
 # Carregar variáveis de ambiente
 load_dotenv()
 groq_api_key = os.environ.get("GROQ_API_KEY")
 
+# Históricos maiores que isso (em tokens) são analisados em trechos; o modelo tem 8192 de contexto
+LIMITE_TOKENS_HISTORICO = int(os.environ.get("RELATORIO_LIMITE_TOKENS", "3000"))
+TOKENS_POR_TRECHO = int(os.environ.get("RELATORIO_TOKENS_TRECHO", "2000"))
+# Quantos trechos o jurista analisa ao mesmo tempo (cada um ainda espera uma vaga de crew)
+MAX_TRECHOS_SIMULTANEOS = int(os.environ.get("RELATORIO_MAX_TRECHOS", "4"))
+# Rodadas de consolidação das análises antes de cortá-las para caber no redator
+MAX_RODADAS_CONSOLIDACAO = 3
+# Quantos crews podem chamar o Groq ao mesmo tempo no processo inteiro: tarefas em
+# segundo plano, rotas da API, lote e os trechos dos relatórios longos passam por aqui.
+# TAREFAS_MAX_CREWS é o nome antigo da variável, de quando o limite era só das tarefas.
+MAX_CREWS_SIMULTANEOS = int(os.environ.get("CREWS_MAX_SIMULTANEOS", os.environ.get("TAREFAS_MAX_CREWS", "2")))
+_limite_crews = threading.BoundedSemaphore(MAX_CREWS_SIMULTANEOS)
+
 # Função para carregar PDFs
 def carregar_pdfs(pasta="pdfs"):
     if not os.path.exists(pasta):
@@ -32,18 +44,21 @@ def carregar_pdfs(pasta="pdfs"):
         st.error(f"Erro: Nenhum arquivo PDF encontrado na pasta '{pasta}'.")
         return []
 
-# Função de configuração do LLM
+# Função de configuração do LLM; as respostas passam pelo cache em disco (cache_llm.py)
 @st.cache_resource
 def get_llm():
-    return ChatGroq(
+    from langchain_groq import ChatGroq
+    from cache_llm import com_cache
+    llm = ChatGroq(
         temperature=0,
         model_name="llama3-70b-8192",
         api_key=groq_api_key
     )
+    # O LLM fica em cache: o handler vai sempre, e só registra quando o rastreamento está ligado
+    return com_cache(llm, callbacks=[handler_rastreamento()])
 
 # Função para buscar delegacias
-@tool
-def buscar_delegacias_proximas(endereco_busca: str) -> str:
+def _buscar_delegacias_proximas(endereco_busca: str) -> str:
     """
     Busca delegacias de polícia próximas a um endereço fornecido.
 
@@ -53,20 +68,12 @@ def buscar_delegacias_proximas(endereco_busca: str) -> str:
     Retorno:
     str: Lista de delegacias encontradas ou uma mensagem de erro caso ocorra uma falha na requisição.
     """
-    api_key = os.environ.get("SERPER_API_KEY")
-    url = "https://google.serper.dev/search"
-    headers = {
-        "X-API-KEY": api_key,
-        "Content-Type": "application/json"
-    }
-    payload = {"q": f"delegacia de polícia perto de {endereco_busca}", "gl": "br", "hl": "pt"}
+    import requests
+    from serper import buscar_locais
 
     try:
-        response = requests.post(url, headers=headers, json=payload)
-        response.raise_for_status()
-        
-        results = response.json()
-        places = results.get('places', [])
+        with span("tool", "buscar_delegacias_proximas"):
+            places = buscar_locais(endereco_busca)
         output = ""
 
         if places:
@@ -85,17 +92,80 @@ def buscar_delegacias_proximas(endereco_busca: str) -> str:
     
     except requests.exceptions.RequestException as e:
         return f"Erro na busca: {str(e)}"
-# Função para executar o crew de localização
-def executar_crew_localizacao(endereco):
-    llm = get_llm()
+
+# A ferramenta do crewai é criada no primeiro uso
+@functools.lru_cache(maxsize=None)
+def get_ferramenta_delegacias():
+    from crewai_tools import tool
+    return tool("buscar_delegacias_proximas")(_buscar_delegacias_proximas)
+
+# Mantém `from utils import buscar_delegacias_proximas, gerar_pdf_conteudo` sem carregar crewai/reportlab na importação
+def __getattr__(nome):
+    if nome == "buscar_delegacias_proximas":
+        return get_ferramenta_delegacias()
+    if nome == "gerar_pdf_conteudo":
+        from pdf_dossie import gerar_pdf_conteudo
+        return gerar_pdf_conteudo
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
+
+# Callback de Task: registra o span da tarefa e avisa a conclusão da etapa (usado para mostrar progresso)
+def _callback_etapa(marcador, ao_concluir_tarefa, etapa):
+    def callback(output):
+        marcador.concluir(etapa)
+        if ao_concluir_tarefa is not None:
+            ao_concluir_tarefa(etapa)
+    return callback
+
+# Executa o crew dentro de um span de rastreamento
+def _executar_crew(nome, crew, marcador, inputs):
+    with span("crew", nome):
+        marcador.iniciar()
+        return crew.kickoff(inputs=inputs)
+
+# Agentes usados pelos modelos de crew
+def _agente_jurista(llm):
+    from crewai import Agent
+    return Agent(
+        llm=llm,
+        role="Especialista em Lei Maria da Penha",
+        goal="Classificar violações e recomendar medidas legais apropriadas",
+        backstory="Jurista especializado em violência de gênero há 15 anos.",
+        allow_delegation=False,
+        verbose=True
+    )
+
+def _agente_relatorio(llm):
+    from crewai import Agent
+    return Agent(
+        llm=llm,
+        role="Agente de Geração de Relatórios",
+        goal="Criar um relatório detalhado e estruturado com base no histórico de conversa do chat",
+        backstory="Especialista em análise de conversas e geração de relatórios técnicos, com foco em casos de violência contra a mulher.",
+        allow_delegation=False,
+        verbose=True
+    )
+
+FORMATO_RELATORIO = """
+        Use o seguinte formato:
+        - Informações Gerais
+        - Detalhes do Caso
+        - Leis Infringidas
+        - Medidas Protetivas
+        - Observações Adicionais
+        """
+
+# Modelos de crew: Agents e Tasks com as entradas como placeholders ({endereco},
+# {conversation}...). Devolvem (crew, etapa de cada tarefa).
+def _modelo_localizacao(llm):
+    from crewai import Agent, Task, Crew
     identificador = Agent(
         llm=llm,
         role="Identificador de Delegacias",
-        goal=f"Localizar quais são as delegacias mais próximas de {endereco}",
-        backstory=f"Conhece a região do endereço ({endereco}) muito bem e pode auxiliar a vítima",
+        goal="Localizar quais são as delegacias mais próximas de {endereco}",
+        backstory="Conhece a região do endereço ({endereco}) muito bem e pode auxiliar a vítima",
         allow_delegation=False,
         verbose=True,
-        tools=[buscar_delegacias_proximas]
+        tools=[get_ferramenta_delegacias()]
     )
     escritor = Agent(
         llm=llm,
@@ -105,33 +175,22 @@ def executar_crew_localizacao(endereco):
         allow_delegation=False,
         verbose=True
     )
-    identificar_delegacias = Task(description=f"Liste as delegacias mais próximas da vítima localizada em {endereco}.", expected_output="Uma lista com as localidades mais próximas.", agent=identificador)
+    identificar_delegacias = Task(description="Liste as delegacias mais próximas da vítima localizada em {endereco}.", expected_output="Uma lista com as localidades mais próximas.", agent=identificador)
     escrita = Task(description="Escreva uma mensagem recomendando que a pessoa preste queixa e liste as delegacias mais próximas", expected_output="Uma lista de delegacias, e uma recomendacao inicial para prestacação de queixa", agent=escritor)
     crew = Crew(agents=[identificador, escritor], tasks=[identificar_delegacias, escrita], verbose=2)
+    return crew, ["identificar_delegacias", "escrita"]
 
-    return crew.kickoff(inputs={"endereco": endereco})
-
-# Função para executar o crew de denúncia
-def executar_crew_denuncia(victim_name, conversation_text):
-    llm = get_llm()
-    
+def _modelo_denuncia(llm):
+    from crewai import Agent, Task, Crew
     escritor = Agent(
         llm=llm,
         role="Redator Jurídico Especializado em Denúncias",
         goal="Transformar relatos e evidências em um documento formal",
-        backstory=f"Redator jurídico ajudando {victim_name}.",
-        allow_delegation=False,
-        verbose=True
-    )
-    
-    jurista = Agent(
-        llm=llm,
-        role="Especialista em Lei Maria da Penha",
-        goal="Classificar violações e recomendar medidas legais apropriadas",
-        backstory=f"Jurista especializado em violência de gênero há 15 anos.",
+        backstory="Redator jurídico ajudando {victim_name}.",
         allow_delegation=False,
         verbose=True
     )
+    jurista = _agente_jurista(llm)
 
     analisar_violencia = Task(
         description="Analise o relato ({conversation}) e classifique o ocorrido conforme a Lei Maria da Penha.",
@@ -145,49 +204,23 @@ def executar_crew_denuncia(victim_name, conversation_text):
         1. Resumo da situação relatada
         2. Descrição dos Acontecimentos e legislação violada
         3. Medidas protetivas, direitos a serem reinvindicados
-        com base em {conversation} e no relatório jurídico
-        Use o seguinte formato:
-        - Informações Gerais
-        - Detalhes do Caso
-        - Leis Infringidas
-        - Medidas Protetivas
-        - Observações Adicionais
-        """,
+        com base em {conversation} e no relatório jurídico""" + FORMATO_RELATORIO,
         expected_output="Relatório estruturado com todas as seções solicitadas.",
         agent=escritor
     )
-    
-    crew = Crew(
-        agents=[jurista, escritor],
-        tasks=[analisar_violencia, escrita],
-        verbose=2
-    )
 
-    return crew.kickoff(inputs={
-        "victim_name": victim_name,
-        "conversation": conversation_text
-    })
+    crew = Crew(agents=[jurista, escritor], tasks=[analisar_violencia, escrita], verbose=2)
+    return crew, ["analise_juridica", "redacao"]
 
-# Função para executar o crew de geração de relatórios com histórico da conversa
-def executar_crew_relatorio(chat_history):
-    llm = get_llm()
-
-    jurista = Agent(
-        llm=llm,
-        role="Especialista em Lei Maria da Penha",
-        goal="Classificar violações e recomendar medidas legais apropriadas",
-        backstory=f"Jurista especializado em violência de gênero há 15 anos.",
-        allow_delegation=False,
-        verbose=True
-    )
+def _modelo_relatorio(llm):
+    from crewai import Task, Crew
+    jurista = _agente_jurista(llm)
+    agente_relatorio = _agente_relatorio(llm)
 
-    agente_relatorio = Agent(
-        llm=llm,
-        role="Agente de Geração de Relatórios",
-        goal="Criar um relatório detalhado e estruturado com base no histórico de conversa do chat {chat_history}",
-        backstory="Especialista em análise de conversas e geração de relatórios técnicos, com foco em casos de violência contra a mulher.",
-        allow_delegation=False,
-        verbose=True
+    analisar_violencia = Task(
+        description="Analise a conversa {chat_history} e, conforme a lei Maria da Penha, classifique as violações e recomende medidas protetivas.",
+        expected_output="Relatório jurídico com classificação de violações e medidas legais recomendadas",
+        agent=jurista
     )
 
     tarefa_relatorio = Task(
@@ -196,85 +229,195 @@ def executar_crew_relatorio(chat_history):
         1. Resumo da situação relatada
         2. Descrição dos Acontecimentos e legislação violada
         3. Medidas protetivas, direitos a serem reinvindicados
-        com base em {chat_history} e no relatório jurídico
-        Use o seguinte formato:
-        - Informações Gerais
-        - Detalhes do Caso
-        - Leis Infringidas
-        - Medidas Protetivas
-        - Observações Adicionais
-        """,
+        com base em {chat_history} e no relatório jurídico""" + FORMATO_RELATORIO,
         expected_output="Relatório estruturado com todas as seções solicitadas.",
         agent=agente_relatorio
     )
 
-    analisar_violencia = Task(
-        description="Analise a conversa {chat_history} e, conforme a lei maria da penha, classifique as violações e recomende medidas protetivas legais que devem ser reinvindicadas",
-        expected_output="Relatório jurídico com classificação de violações e medidas legais recomendadas",
+    crew = Crew(agents=[jurista, agente_relatorio], tasks=[analisar_violencia, tarefa_relatorio], verbose=2)
+    return crew, ["analise_juridica", "redacao"]
+
+# Etapa "map" dos históricos longos: o jurista analisa um trecho da conversa
+def _modelo_analise_trecho(llm):
+    from crewai import Task, Crew
+    jurista = _agente_jurista(llm)
+    analisar_trecho = Task(
+        description="""
+        Este é o trecho {parte} de {total} de uma conversa com uma vítima de violência:
+        {trecho}
+        Liste os fatos relatados neste trecho (pessoas envolvidas, tipos de violência, datas, locais e riscos)
+        e, conforme a lei Maria da Penha, classifique as violações e recomende medidas protetivas.
+        """,
+        expected_output="Fatos do trecho e relatório jurídico com classificação de violações e medidas legais recomendadas",
         agent=jurista
     )
-    analisar_violencia = Task(
-        description="Analise a conversa {chat_history} e, conforme a lei Maria da Penha, classifique as violações e recomende medidas protetivas.",
-        expected_output="Relatório jurídico com classificação de violações e medidas legais recomendadas",
-        agent=jurista
+    return Crew(agents=[jurista], tasks=[analisar_trecho], verbose=2), ["analise_trecho"]
+
+# Etapa "reduce": o relatório é escrito a partir das análises de todos os trechos
+def _modelo_redacao_relatorio(llm):
+    from crewai import Task, Crew
+    agente_relatorio = _agente_relatorio(llm)
+    tarefa_relatorio = Task(
+        description="""
+        A conversa foi analisada em trechos por um jurista. Com base nas análises abaixo,
+        crie um relatório detalhado que inclua:
+        1. Resumo da situação relatada
+        2. Descrição dos Acontecimentos e legislação violada
+        3. Medidas protetivas, direitos a serem reinvindicados
+        Análises dos trechos:
+        {analises}""" + FORMATO_RELATORIO,
+        expected_output="Relatório estruturado com todas as seções solicitadas.",
+        agent=agente_relatorio
     )
+    return Crew(agents=[agente_relatorio], tasks=[tarefa_relatorio], verbose=2), ["redacao"]
 
-    crew = Crew(
-        agents=[jurista, agente_relatorio],
-        tasks=[analisar_violencia, tarefa_relatorio],
-        verbose=2
+# Etapa intermediária dos históricos muito longos: o jurista junta as análises de
+# trechos consecutivos em uma só, até todas caberem no prompt do redator
+def _modelo_consolidacao_analises(llm):
+    from crewai import Task, Crew
+    jurista = _agente_jurista(llm)
+    consolidar = Task(
+        description="""
+        Estas são as análises jurídicas de {partes} de uma conversa com uma vítima de violência:
+        {analises}
+        Junte-as em uma única análise, sem repetir informações. Mantenha todos os fatos relatados
+        (pessoas envolvidas, tipos de violência, datas, locais e riscos), a classificação das violações
+        conforme a lei Maria da Penha e as medidas protetivas recomendadas.
+        """,
+        expected_output="Análise jurídica única com os fatos, a classificação das violações e as medidas legais recomendadas",
+        agent=jurista
     )
+    return Crew(agents=[jurista], tasks=[consolidar], verbose=2), ["consolidacao"]
 
-    return crew.kickoff(inputs={"chat_history": chat_history})
+_MODELOS_CREW = {
+    "localizacao": _modelo_localizacao,
+    "denuncia": _modelo_denuncia,
+    "relatorio": _modelo_relatorio,
+    "analise_trecho": _modelo_analise_trecho,
+    "consolidacao_analises": _modelo_consolidacao_analises,
+    "redacao_relatorio": _modelo_redacao_relatorio
+}
+# nome -> (llm, crew, etapas); montados uma vez por processo (e de novo se o LLM mudar)
+_modelos_montados = {}
+_lock_modelos = threading.Lock()
 
-# Função para gerar conteúdo PDF
-def gerar_pdf_conteudo(conteudo, titulo="Dossiê de Denúncia de Violência Doméstica", autor="Sistema"):
-    buffer = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-    largura, altura = A4
-    c = canvas.Canvas(buffer.name, pagesize=A4)
-    
-    cor_principal = colors.HexColor('#5e17eb')
-    cor_secundaria = colors.HexColor('#718096')
-    
-    def adicionar_cabecalho():
-        c.setFillColor(cor_principal)
-        c.rect(0, altura - 80, largura, 80, fill=True)
-        c.setFillColor(colors.white)
-        c.setFont("Helvetica-Bold", 24)
-        c.drawString(50, altura - 50, titulo)
-        data_atual = datetime.now().strftime("%d/%m/%Y")
-        c.setFont("Helvetica", 10)
-        c.drawString(largura - 150, altura - 50, f"Data: {data_atual}")
-    
-    def adicionar_rodape():
-        c.setStrokeColor(cor_secundaria)
-        c.line(50, 50, largura - 50, 50)
-        c.setFillColor(cor_secundaria)
-        c.setFont("Helvetica", 8)
-        c.drawString(50, 35, f"Autor: {autor}")
-        c.drawString(largura - 150, 35, f"Página 1")
-    
-    def formatar_conteudo():
-        styles = getSampleStyleSheet()
-        estilo_normal = ParagraphStyle(
-            'CustomNormal',
-            parent=styles['Normal'],
-            fontSize=11,
-            leading=16,
-            textColor=colors.black,
-            spaceAfter=10
-        )
-        frame = Frame(50, 70, largura - 100, altura - 160, leftPadding=0, bottomPadding=0, rightPadding=0, topPadding=0)
-        story = [Paragraph(paragrafo.replace('\n', '<br/>'), estilo_normal) for paragrafo in conteudo.split('\n\n') if paragrafo.strip()]
-        frame.addFromList(story, c)
-    
-    adicionar_cabecalho()
-    formatar_conteudo()
-    adicionar_rodape()
-    c.save()
-    buffer.seek(0)
-    
-    with open(buffer.name, "rb") as f:
-        pdf_data = f.read()
-    
-    return pdf_data
+# Cópia do LLM com uma lista de callbacks própria. O crewai mexe nos callbacks
+# do LLM de cada Agent (acrescenta o contador de tokens; Agent.copy() os apaga),
+# e a cópia rasa do pydantic compartilha os atributos com o original: sem isso,
+# o LLM de get_llm() perderia o handler de rastreamento.
+def _copiar_llm(llm, callbacks=()):
+    # llm.copy(update=...) não serve: descarta os campos com exclude=True (tags, metadata...)
+    copia = copy.copy(llm)
+    object.__setattr__(copia, "__dict__", {**llm.__dict__, "callbacks": list(callbacks)})
+    object.__setattr__(copia, "__fields_set__", set(llm.__fields_set__) | {"callbacks"})
+    return copia
+
+# Cópia de um modelo de crew pronta para um kickoff. O modelo não é executado
+# diretamente porque o kickoff altera Agents e Tasks (entradas interpoladas,
+# saídas), o que quebraria execuções simultâneas.
+def _instanciar_crew(nome, marcador, ao_concluir_tarefa=None):
+    llm = get_llm()
+    with _lock_modelos:
+        montado = _modelos_montados.get(nome)
+        if montado is None or montado[0] is not llm:
+            montado = (llm, *_MODELOS_CREW[nome](_copiar_llm(llm)))
+            _modelos_montados[nome] = montado
+        _, modelo, etapas = montado
+        # As cópias dos agentes de um modelo compartilham a lista de callbacks
+        # do LLM do modelo; ela só é lida e trocada aqui, dentro do lock
+        crew = modelo.copy()
+        for agente in crew.agents:
+            # Mantém o contador de tokens do crewai que Agent.copy() acabou de pôr
+            agente.llm = _copiar_llm(llm, [*(agente.llm.callbacks or []), handler_rastreamento()])
+    for tarefa, etapa in zip(crew.tasks, etapas):
+        tarefa.callback = _callback_etapa(marcador, ao_concluir_tarefa, etapa)
+    return crew
+
+def _executar_modelo(nome, inputs, ao_concluir_tarefa=None):
+    marcador = MarcadorTarefas()
+    crew = _instanciar_crew(nome, marcador, ao_concluir_tarefa)
+    # Um crew nunca executa outro, então a vaga não precisa ser reentrante
+    with _limite_crews:
+        return _executar_crew(nome, crew, marcador, inputs)
+
+# Função para executar o crew de localização
+def executar_crew_localizacao(endereco):
+    return _executar_modelo("localizacao", {"endereco": endereco})
+
+# Função para executar o crew de denúncia
+def executar_crew_denuncia(victim_name, conversation_text, ao_concluir_tarefa=None):
+    return _executar_modelo("denuncia", {
+        "victim_name": victim_name,
+        "conversation": conversation_text
+    }, ao_concluir_tarefa)
+
+# Executa um modelo de crew para cada entrada, em paralelo, e devolve os resultados na ordem
+def _executar_em_paralelo(nome, lista_inputs):
+    with ThreadPoolExecutor(max_workers=max(min(MAX_TRECHOS_SIMULTANEOS, len(lista_inputs)), 1), thread_name_prefix="trecho") as executor:
+        # Cada thread recebe uma cópia do contexto, para os spans ficarem dentro do crew "relatorio"
+        futuros = [executor.submit(contextvars.copy_context().run, _executar_modelo, nome, inputs) for inputs in lista_inputs]
+        return [str(f.result()) for f in futuros]
+
+# Análises como (primeiro trecho, último trecho, texto), na ordem da conversa
+def _analisar_trechos(trechos):
+    resultados = _executar_em_paralelo("analise_trecho", [
+        {"parte": parte, "total": len(trechos), "trecho": trecho} for parte, trecho in enumerate(trechos, start=1)
+    ])
+    return [(parte, parte, texto) for parte, texto in enumerate(resultados, start=1)]
+
+def _rotulo(inicio, fim, total):
+    return f"Trecho {inicio}/{total}" if inicio == fim else f"Trechos {inicio} a {fim} de {total}"
+
+def _juntar_analises(analises, total):
+    return "\n\n".join(f"{_rotulo(inicio, fim, total)}:\n{texto}" for inicio, fim, texto in analises)
+
+# Agrupa análises consecutivas até limite_tokens, com pelo menos duas por grupo
+# para que cada rodada de consolidação diminua a quantidade de análises
+def _agrupar_analises(analises, total, limite_tokens):
+    grupos, atual, tamanho = [], [], 0
+    for analise in analises:
+        tokens = contar_tokens(_juntar_analises([analise], total))
+        if len(atual) >= 2 and tamanho + tokens > limite_tokens:
+            grupos.append(atual)
+            atual, tamanho = [], 0
+        atual.append(analise)
+        tamanho += tokens
+    if len(atual) == 1 and grupos:
+        grupos[-1].append(atual[0])
+    elif atual:
+        grupos.append(atual)
+    return grupos
+
+# Reduz as análises em etapas até caberem em limite_tokens: grupos de análises
+# consecutivas são consolidados pelo jurista, em paralelo. Se ainda não couberem
+# depois de MAX_RODADAS_CONSOLIDACAO rodadas, cada análise é cortada na sua parte.
+def _reduzir_analises(analises, total, limite_tokens):
+    for _ in range(MAX_RODADAS_CONSOLIDACAO):
+        if contar_tokens(_juntar_analises(analises, total)) <= limite_tokens:
+            return _juntar_analises(analises, total)
+        grupos = _agrupar_analises(analises, total, TOKENS_POR_TRECHO)
+        resultados = _executar_em_paralelo("consolidacao_analises", [
+            {"partes": _rotulo(grupo[0][0], grupo[-1][1], total).lower(), "analises": _juntar_analises(grupo, total)}
+            for grupo in grupos
+        ])
+        analises = [(grupo[0][0], grupo[-1][1], texto) for grupo, texto in zip(grupos, resultados)]
+    if contar_tokens(_juntar_analises(analises, total)) > limite_tokens:
+        parte = max(limite_tokens // len(analises) - 10, 1)
+        analises = [(inicio, fim, texto[:parte * 4]) for inicio, fim, texto in analises]
+    return _juntar_analises(analises, total)
+
+# Função para executar o crew de geração de relatórios com histórico da conversa.
+# Históricos acima de LIMITE_TOKENS_HISTORICO não cabem no contexto do modelo junto
+# com o prompt dos agentes: são divididos em trechos analisados em paralelo pelo
+# jurista, as análises são consolidadas até caberem no mesmo limite, e o relatório
+# é escrito a partir delas.
+def executar_crew_relatorio(chat_history, ao_concluir_tarefa=None):
+    if contar_tokens(chat_history) <= LIMITE_TOKENS_HISTORICO:
+        return _executar_modelo("relatorio", {"chat_history": chat_history}, ao_concluir_tarefa)
+
+    with span("crew", "relatorio"):
+        trechos = dividir_em_trechos(chat_history, TOKENS_POR_TRECHO)
+        analises = _reduzir_analises(_analisar_trechos(trechos), len(trechos), LIMITE_TOKENS_HISTORICO)
+        if ao_concluir_tarefa is not None:
+            ao_concluir_tarefa("analise_juridica")
+        return _executar_modelo("redacao_relatorio", {"analises": analises}, ao_concluir_tarefa)